@@ -1,13 +1,237 @@
 import requests
 import base64
+import json
 import logging
-from typing import List, Dict, Any
-from anki_tts.config import ANKI_CONNECT_URL
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Iterator, Optional, Sequence, Tuple, Union
+from requests.adapters import HTTPAdapter
+from anki_tts.config import (
+    ANKI_CONNECT_URL,
+    ANKI_CONNECT_TIMEOUT,
+    ANKI_CONNECT_ACTION_TIMEOUTS,
+    NOTES_INFO_CHUNK_SIZE,
+)
+from anki_tts import metrics
+from anki_tts.retry import RetryPolicy
+
+# Raw bytes encoded per body chunk. A multiple of 3, so chunks concatenate
+# into one valid base64 string without inner padding.
+BASE64_CHUNK_BYTES = 48 * 1024
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+class Base64Audio:
+    """
+    Raw audio to be sent base64-encoded, without building the encoded string.
+
+    Put it anywhere a base64 string belongs in AnkiConnect params; JSONBody
+    encodes it chunk by chunk while the request is sent.
+    """
+
+    __slots__ = ("data",)
+
+    def __init__(self, data: Union[bytes, bytearray, memoryview]) -> None:
+        self.data = memoryview(data).cast("B")
+
+    def __len__(self) -> int:
+        """Length of the base64 encoding."""
+        return 4 * ((len(self.data) + 2) // 3)
+
+
+def _iter_json(value: Any) -> Iterator[Union[str, Base64Audio]]:
+    """Yield value as JSON text pieces, with Base64Audio values left in place."""
+    if isinstance(value, Base64Audio):
+        yield value
+    elif isinstance(value, dict):
+        yield "{"
+        for i, (key, item) in enumerate(value.items()):
+            yield (", " if i else "") + json.dumps(key if isinstance(key, str) else str(key)) + ": "
+            yield from _iter_json(item)
+        yield "}"
+    elif isinstance(value, (list, tuple)):
+        yield "["
+        for i, item in enumerate(value):
+            if i:
+                yield ", "
+            yield from _iter_json(item)
+        yield "]"
+    else:
+        yield json.dumps(value)
+
+
+class JSONBody:
+    """
+    A JSON request body that streams its Base64Audio values.
+
+    Everything but the audio is serialized up front, which is small. The
+    audio is base64-encoded one chunk at a time as requests sends the body,
+    so each upload holds only its raw bytes plus one encoded chunk, instead
+    of the encoded string, the serialized JSON text and its UTF-8 bytes.
+    The body knows its length, so it goes out with a Content-Length header
+    rather than chunked, and it can be iterated again when a request is
+    retried.
+    """
+
+    def __init__(self, payload: Any) -> None:
+        """
+        Args:
+            payload: A JSON-serializable value that may contain Base64Audio.
+
+        Raises:
+            TypeError: If the payload holds a value JSON cannot encode.
+        """
+        self._segments: List[Union[bytes, Base64Audio]] = []
+        pending: List[str] = []
+        for piece in _iter_json(payload):
+            if isinstance(piece, str):
+                pending.append(piece)
+                continue
+            self._segments.append("".join(pending).encode("utf-8"))
+            self._segments.append(piece)
+            pending = []
+        self._segments.append("".join(pending).encode("utf-8"))
+
+    def __len__(self) -> int:
+        return sum(len(segment) + (2 if isinstance(segment, Base64Audio) else 0) for segment in self._segments)
+
+    def __iter__(self) -> Iterator[bytes]:
+        for segment in self._segments:
+            if isinstance(segment, bytes):
+                if segment:
+                    yield segment
+                continue
+            yield b'"'
+            # Encoding is interleaved with sending, so only the time spent
+            # encoding is added up and recorded as one "base64" sample.
+            encoding = 0.0
+            data = segment.data
+            for start in range(0, len(data), BASE64_CHUNK_BYTES):
+                started = time.perf_counter()
+                chunk = base64.b64encode(data[start:start + BASE64_CHUNK_BYTES])
+                encoding += time.perf_counter() - started
+                yield chunk
+            registry = metrics.get_metrics()
+            if registry is not None:
+                registry.observe("base64", encoding)
+            yield b'"'
+
+
+class AnkiConnectClient:
+    """
+    AnkiConnect API client that reuses HTTP connections.
+
+    Requests go through one requests.Session, so consecutive calls share a
+    keep-alive connection to AnkiConnect instead of opening a new TCP
+    connection each time. Transient failures (connection resets, timeouts,
+    Anki being briefly busy) are retried according to a RetryPolicy. The
+    client can be shared between threads.
+    """
+
+    def __init__(
+        self,
+        url: str = ANKI_CONNECT_URL,
+        timeout: float = ANKI_CONNECT_TIMEOUT,
+        action_timeouts: Optional[Dict[str, float]] = None,
+        pool_maxsize: int = 4,
+        retry_policy: Optional[RetryPolicy] = None,
+    ) -> None:
+        """
+        Args:
+            url: AnkiConnect endpoint.
+            timeout: Request timeout in seconds for actions without an
+                entry in action_timeouts.
+            action_timeouts: Per-action timeouts in seconds, e.g. a longer
+                one for "multi". Defaults to ANKI_CONNECT_ACTION_TIMEOUTS.
+            pool_maxsize: Maximum number of pooled connections, i.e. how
+                many threads can talk to AnkiConnect at once without
+                opening throwaway connections.
+            retry_policy: Policy for retrying transient errors. Default
+                RetryPolicy(); pass RetryPolicy(max_attempts=1) to disable.
+        """
+        self.url = url
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.timeout = timeout
+        self.action_timeouts = dict(ANKI_CONNECT_ACTION_TIMEOUTS if action_timeouts is None else action_timeouts)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def timeout_for(self, action: str) -> float:
+        """Return the request timeout in seconds for an action."""
+        return self.action_timeouts.get(action, self.timeout)
+
+    def invoke(self, action: str, **params: Any) -> Any:
+        """
+        Send a request to the AnkiConnect API.
+
+        Args:
+            action: The AnkiConnect action name.
+            **params: Additional parameters for the action.
+
+        Returns:
+            The 'result' field from the AnkiConnect response.
+
+        Raises:
+            RuntimeError: If AnkiConnect returns an error.
+            requests.RequestException: If the HTTP request fails.
+        """
+        request_json = {"action": action, "version": 6, "params": params}
+        try:
+            with metrics.timer(action):
+                return self.retry_policy.call(self._post, action, request_json)
+        except Exception as e:
+            logging.error(f"Failed to call AnkiConnect action {action}: {e}")
+            raise
+
+    def _post(self, action: str, request_json: Dict[str, Any]) -> Any:
+        response = self.session.post(
+            self.url, data=JSONBody(request_json), headers=_JSON_HEADERS, timeout=self.timeout_for(action)
+        )
+        response.raise_for_status()
+        result = response.json()
+        if result.get("error") is not None:
+            raise RuntimeError(f"AnkiConnect error: {result['error']}")
+        return result["result"]
+
+    def close(self) -> None:
+        """Close pooled connections."""
+        self.session.close()
+
+    def __enter__(self) -> "AnkiConnectClient":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+_default_client: Optional[AnkiConnectClient] = None
+_default_client_lock = threading.Lock()
+
+
+def get_default_client() -> AnkiConnectClient:
+    """Return the shared client used by the module-level functions, creating it on first use."""
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = AnkiConnectClient()
+        return _default_client
+
+
+def set_default_client(client: AnkiConnectClient) -> None:
+    """Replace the shared client used by the module-level functions."""
+    global _default_client
+    with _default_client_lock:
+        _default_client = client
 
 
 def invoke(action: str, **params: Any) -> Any:
     """
-    Send a request to the AnkiConnect API.
+    Send a request to the AnkiConnect API using the default client.
 
     Args:
         action: The AnkiConnect action name.
@@ -20,30 +244,89 @@ def invoke(action: str, **params: Any) -> Any:
         RuntimeError: If AnkiConnect returns an error.
         requests.RequestException: If the HTTP request fails.
     """
-    request_json = {"action": action, "version": 6, "params": params}
-    try:
-        response = requests.post(ANKI_CONNECT_URL, json=request_json, timeout=30)
-        response.raise_for_status()
-        result = response.json()
-        if result.get("error") is not None:
-            raise RuntimeError(f"AnkiConnect error: {result['error']}")
-        return result["result"]
-    except Exception as e:
-        logging.error(f"Failed to call AnkiConnect action {action}: {e}")
-        raise
+    return get_default_client().invoke(action, **params)
+
+
+def escape_search_text(text: str, field_name: bool = False) -> str:
+    """
+    Escape characters Anki's search syntax treats specially, for use inside quotes.
+
+    Args:
+        text: A literal deck, tag or note type name, or a field name.
+        field_name: If True, also escape colons, which would otherwise end
+            the field name in a "field:value" search.
+
+    Returns:
+        The escaped text.
+    """
+    special = r'[\\"*_:]' if field_name else r'[\\"*_]'
+    return re.sub(f"({special})", r"\\\1", text)
+
+
+def build_note_query(
+    deck_name: str,
+    text_field: Optional[str] = None,
+    audio_field: Optional[str] = None,
+    missing_audio_only: bool = False,
+    tags: Optional[Sequence[str]] = None,
+    note_types: Optional[Sequence[str]] = None,
+) -> str:
+    """
+    Build an Anki search query selecting the notes in a deck that need audio.
+
+    Args:
+        deck_name: Name of the Anki deck.
+        text_field: If set, only match notes where this field is non-empty.
+        audio_field: Field checked by missing_audio_only.
+        missing_audio_only: If True, only match notes whose audio_field does
+            not already contain a [sound:...] tag.
+        tags: If set, only match notes carrying at least one of these tags.
+        note_types: If set, only match notes of one of these note types.
+
+    Returns:
+        A query string suitable for the findNotes action.
+    """
+    clauses = [f'"deck:{escape_search_text(deck_name)}"']
+    if text_field:
+        clauses.append(f'"{escape_search_text(text_field, field_name=True)}:_*"')
+    if missing_audio_only and audio_field:
+        clauses.append(f'-"{escape_search_text(audio_field, field_name=True)}:*[sound:*"')
+    for prefix, values in (("tag", tags), ("note", note_types)):
+        if values:
+            terms = [f'"{prefix}:{escape_search_text(value)}"' for value in values]
+            clauses.append(terms[0] if len(terms) == 1 else "(" + " OR ".join(terms) + ")")
+    return " ".join(clauses)
 
 
-def get_notes_from_deck(deck_name: str) -> List[int]:
+def get_notes_from_deck(
+    deck_name: str,
+    text_field: Optional[str] = None,
+    audio_field: Optional[str] = None,
+    missing_audio_only: bool = False,
+    tags: Optional[Sequence[str]] = None,
+    note_types: Optional[Sequence[str]] = None,
+) -> List[int]:
     """
-    Get note IDs from a given deck.
+    Get note IDs from a given deck, optionally filtered inside Anki.
+
+    Filtering is pushed into the findNotes query (see build_note_query), so
+    notes that need no work are never downloaded.
 
     Args:
         deck_name: Name of the Anki deck.
+        text_field: If set, skip notes where this field is empty.
+        audio_field: Field checked by missing_audio_only.
+        missing_audio_only: If True, skip notes that already have audio in
+            audio_field.
+        tags: If set, only include notes with at least one of these tags.
+        note_types: If set, only include notes of these note types.
 
     Returns:
         A list of note IDs belonging to the deck.
     """
-    return invoke("findNotes", query=f'deck:"{deck_name}"')
+    query = build_note_query(deck_name, text_field, audio_field, missing_audio_only, tags, note_types)
+    logging.debug(f"findNotes query: {query}")
+    return invoke("findNotes", query=query)
 
 
 def get_note_info(note_ids: List[int]) -> List[Dict[str, Any]]:
@@ -61,31 +344,389 @@ def get_note_info(note_ids: List[int]) -> List[Dict[str, Any]]:
     return invoke("notesInfo", notes=note_ids)
 
 
-def add_audio_to_note(note_id: int, field_name: str, filename: str, audio_data: bytes) -> Any:
+def iter_note_info(
+    note_ids: Sequence[int],
+    chunk_size: int = NOTES_INFO_CHUNK_SIZE,
+    prefetch: bool = True,
+) -> Iterator[Dict[str, Any]]:
     """
-    Attach audio to a note field in Anki.
+    Yield note information lazily, fetching notesInfo one chunk at a time.
+
+    Only about two chunks are held in memory at once, and the first notes are
+    available as soon as the first chunk arrives rather than after the whole
+    deck has been downloaded.
 
     Args:
-        note_id: The ID of the Anki note.
-        field_name: The field in the note to associate the audio with.
-        filename: The filename to assign to the audio in Anki.
-        audio_data: Raw audio data as bytes.
+        note_ids: Anki note IDs, in the order notes should be yielded.
+        chunk_size: Number of notes per notesInfo request. Must be >= 1.
+        prefetch: If True, request the next chunk in a background thread
+            while the caller works through the current one.
+
+    Yields:
+        Note information dictionaries, in note_ids order.
+
+    Raises:
+        ValueError: If chunk_size is less than 1.
+    """
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be >= 1, got {chunk_size}")
+    chunks = [note_ids[i:i + chunk_size] for i in range(0, len(note_ids), chunk_size)]
+    if not prefetch:
+        for chunk in chunks:
+            yield from get_note_info(list(chunk))
+        return
+
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="notesInfo")
+    try:
+        future = executor.submit(get_note_info, list(chunks[0])) if chunks else None
+        for i in range(len(chunks)):
+            notes = future.result()
+            if i + 1 < len(chunks):
+                future = executor.submit(get_note_info, list(chunks[i + 1]))
+            yield from notes
+    finally:
+        # Runs on early exit too (e.g. the caller stopped at max_cards), so a
+        # queued prefetch is dropped instead of downloaded for nothing.
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def get_media_file_names(pattern: str = "*") -> List[str]:
+    """
+    List the files in Anki's media folder.
+
+    Args:
+        pattern: Glob pattern the names must match, e.g. "tts_*.mp3".
 
     Returns:
-        The response from AnkiConnect after updating the note.
+        The matching filenames.
+    """
+    return invoke("getMediaFilesNames", pattern=pattern)
+
+
+def _update_note_action(note_id: int, field_name: str, filename: str, audio_data: bytes) -> Dict[str, Any]:
     """
-    b64_audio = base64.b64encode(audio_data).decode("utf-8")
-    return invoke(
-        "updateNote",
-        note={
+    Return the updateNote params that replace a field's content with audio.
+
+    The audio stays raw bytes (see Base64Audio) until the request is sent.
+    As with _store_media_action(), deleteExisting keeps the requested name
+    when Anki already holds a different file under it, so the field and any
+    MediaManifest entry refer to the new audio.
+    """
+    return {
+        "note": {
             "id": note_id,
             "fields": {field_name: ""},
             "audio": [
                 {
                     "filename": filename,
-                    "data": b64_audio,
+                    "data": Base64Audio(audio_data),
                     "fields": [field_name],
+                    "deleteExisting": True,
                 }
             ],
         },
-    )
+    }
+
+
+def add_audio_to_note(note_id: int, field_name: str, filename: str, audio_data: bytes) -> Any:
+    """
+    Attach audio to a note field in Anki.
+
+    Args:
+        note_id: The ID of the Anki note.
+        field_name: The field in the note to associate the audio with.
+        filename: The filename to assign to the audio in Anki.
+        audio_data: Raw audio data as bytes.
+
+    Returns:
+        The response from AnkiConnect after updating the note.
+    """
+    return invoke("updateNote", **_update_note_action(note_id, field_name, filename, audio_data))
+
+
+def _store_media_action(
+    filename: str,
+    path: Optional[str] = None,
+    audio_data: Optional[bytes] = None,
+) -> Dict[str, Any]:
+    """Return the storeMediaFile params that put a local file or raw audio into Anki's media folder."""
+    # deleteExisting keeps the requested name: Anki would otherwise rename a
+    # new file that clashes with an existing one, and the sound tag written
+    # alongside would point at the old audio.
+    if path is not None:
+        return {"filename": filename, "path": os.path.abspath(path), "deleteExisting": True}
+    return {"filename": filename, "data": Base64Audio(audio_data), "deleteExisting": True}
+
+
+def _sound_field_action(note_id: int, field_name: str, filename: str) -> Dict[str, Any]:
+    """Return the updateNoteFields params that make a field play filename."""
+    return {"note": {"id": note_id, "fields": {field_name: f"[sound:{filename}]"}}}
+
+
+def add_audio_file_to_note(
+    note_id: int,
+    field_name: str,
+    filename: str,
+    path: Optional[str] = None,
+    audio_data: Optional[bytes] = None,
+) -> Any:
+    """
+    Store a media file in Anki, then set a note field to play it.
+
+    With path, AnkiConnect reads the file from disk itself, so no audio
+    crosses HTTP; this only works when Anki runs on the same machine and can
+    read path. Otherwise audio_data is sent inline.
+
+    Args:
+        note_id: The ID of the Anki note.
+        field_name: The field in the note to associate the audio with.
+        filename: The filename to assign to the audio in Anki.
+        path: Local file holding the audio.
+        audio_data: Raw audio data as bytes, used when path is None.
+
+    Returns:
+        The response from AnkiConnect after updating the note.
+    """
+    invoke("storeMediaFile", **_store_media_action(filename, path, audio_data))
+    return set_audio_field(note_id, field_name, filename)
+
+
+def set_audio_field(note_id: int, field_name: str, filename: str) -> Any:
+    """
+    Set a note field to play a file already in Anki's media folder.
+
+    Args:
+        note_id: The ID of the Anki note.
+        field_name: The field to replace with a [sound:...] reference.
+        filename: The media file to reference.
+
+    Returns:
+        The response from AnkiConnect after updating the note.
+    """
+    return invoke("updateNoteFields", **_sound_field_action(note_id, field_name, filename))
+
+
+# (note ID, error) for one queued update; error is None on success.
+UpdateOutcome = Tuple[int, Optional[Exception]]
+
+
+def _multi_errors(actions: List[Dict[str, Any]]) -> List[Optional[Exception]]:
+    """
+    Send actions as one `multi` call and return one error (or None) per action.
+
+    Actions failing with a transient error, such as Anki being briefly busy,
+    are sent again in a smaller `multi` under the default client's
+    RetryPolicy, like any other AnkiConnect call. If a call fails as a whole
+    (after its own retries), the actions it carried fail with it.
+    """
+    errors: List[Optional[Exception]] = [None] * len(actions)
+    sent: List[int] = []
+
+    def send(indices: List[int]) -> List[Optional[Exception]]:
+        sent[:] = indices
+        results = invoke("multi", actions=[actions[i] for i in indices])
+        if not isinstance(results, list) or len(results) != len(indices):
+            raise RuntimeError(f"AnkiConnect multi returned an unexpected result for {len(indices)} updates: {results!r}")
+        item_errors: List[Optional[Exception]] = []
+        for item in results:
+            error = item.get("error") if isinstance(item, dict) else None
+            item_errors.append(RuntimeError(f"AnkiConnect error: {error}") if error is not None else None)
+        for i, error in zip(indices, item_errors):
+            errors[i] = error
+        return item_errors
+
+    try:
+        return get_default_client().retry_policy.call_each(send, len(actions))
+    except Exception as e:
+        for i in sent:
+            errors[i] = e
+        return errors
+
+
+def _action(name: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    return {"action": name, "version": 6, "params": params}
+
+
+class NoteUpdateBatcher:
+    """
+    Queue audio updates and send them to AnkiConnect in `multi` batches.
+
+    A batch is sent once it holds max_notes updates, or before an update
+    would push its base64 payload past max_bytes. Every flush returns one
+    outcome per queued update, in the order they were added (references
+    moved behind their store aside), so callers can account for each note
+    individually. Updates can carry their audio
+    inline (add) or as a local file Anki reads itself (add_file).
+    """
+
+    def __init__(self, max_notes: int = 20, max_bytes: int = 16 * 1024 * 1024) -> None:
+        """
+        Args:
+            max_notes: Maximum updates per `multi` call. Must be >= 1.
+            max_bytes: Maximum total base64 audio payload per call. A single
+                update larger than this is sent on its own. Must be >= 1.
+
+        Raises:
+            ValueError: If either limit is less than 1.
+        """
+        if max_notes < 1:
+            raise ValueError(f"max_notes must be >= 1, got {max_notes}")
+        if max_bytes < 1:
+            raise ValueError(f"max_bytes must be >= 1, got {max_bytes}")
+        self.max_notes = max_notes
+        self.max_bytes = max_bytes
+        self._note_ids: List[int] = []
+        self._actions: List[Dict[str, Any]] = []
+        # storeMediaFile action preceding each update, or None for inline audio.
+        self._stores: List[Optional[Dict[str, Any]]] = []
+        # Media file each add_reference() update relies on, else None.
+        self._references: List[Optional[str]] = []
+        self._payload_bytes = 0
+
+    def __len__(self) -> int:
+        """Number of updates waiting to be sent."""
+        return len(self._actions)
+
+    def add(self, note_id: int, field_name: str, filename: str, audio_data: bytes) -> List[UpdateOutcome]:
+        """
+        Queue an audio update, sending batches as the limits are reached.
+
+        Args:
+            note_id: The ID of the Anki note.
+            field_name: The field in the note to associate the audio with.
+            filename: The filename to assign to the audio in Anki.
+            audio_data: Raw audio data as bytes.
+
+        Returns:
+            Outcomes for every update sent by this call (possibly none).
+        """
+        params = _update_note_action(note_id, field_name, filename, audio_data)
+        payload_bytes = len(params["note"]["audio"][0]["data"])
+        return self._queue(note_id, _action("updateNote", params), None, None, payload_bytes)
+
+    def add_file(
+        self,
+        note_id: int,
+        field_name: str,
+        filename: str,
+        path: Optional[str] = None,
+        audio_data: Optional[bytes] = None,
+    ) -> List[UpdateOutcome]:
+        """
+        Queue an update that stores a media file first (see add_audio_file_to_note).
+
+        Args:
+            note_id: The ID of the Anki note.
+            field_name: The field in the note to associate the audio with.
+            filename: The filename to assign to the audio in Anki.
+            path: Local file holding the audio. It must stay in place until
+                the batch is flushed.
+            audio_data: Raw audio data as bytes, used when path is None.
+
+        Returns:
+            Outcomes for every update sent by this call (possibly none).
+        """
+        params = _store_media_action(filename, path, audio_data)
+        payload_bytes = len(params["data"]) if "data" in params else 0
+        update = _action("updateNoteFields", _sound_field_action(note_id, field_name, filename))
+        return self._queue(note_id, update, _action("storeMediaFile", params), None, payload_bytes)
+
+    def add_reference(self, note_id: int, field_name: str, filename: str) -> List[UpdateOutcome]:
+        """
+        Queue an update that points a field at an already stored media file.
+
+        If the file is stored by an add_file() update still queued and that
+        fails, this update fails with it instead of leaving a dangling
+        reference. Should that store start a new batch, this update moves
+        along with it.
+
+        Args:
+            note_id: The ID of the Anki note.
+            field_name: The field to replace with a [sound:...] reference.
+            filename: The media file to reference.
+
+        Returns:
+            Outcomes for every update sent by this call (possibly none).
+        """
+        update = _action("updateNoteFields", _sound_field_action(note_id, field_name, filename))
+        return self._queue(note_id, update, None, filename, 0)
+
+    def _queue(
+        self,
+        note_id: int,
+        action: Dict[str, Any],
+        store: Optional[Dict[str, Any]],
+        reference: Optional[str],
+        payload_bytes: int,
+    ) -> List[UpdateOutcome]:
+        outcomes: List[UpdateOutcome] = []
+        held: List[Tuple[int, Dict[str, Any], Optional[Dict[str, Any]], Optional[str], int]] = []
+        if self._actions and self._payload_bytes + payload_bytes > self.max_bytes:
+            if store is not None:
+                # References to the file this update stores move to the new
+                # batch with it, so they are never sent ahead of a store that
+                # may fail.
+                held = self._take_references(store["params"]["filename"])
+            outcomes.extend(self.flush())
+        self._append(note_id, action, store, reference, payload_bytes)
+        for entry in held:
+            self._append(*entry)
+        if len(self._actions) >= self.max_notes:
+            outcomes.extend(self.flush())
+        return outcomes
+
+    def _append(
+        self,
+        note_id: int,
+        action: Dict[str, Any],
+        store: Optional[Dict[str, Any]],
+        reference: Optional[str],
+        payload_bytes: int,
+    ) -> None:
+        self._note_ids.append(note_id)
+        self._actions.append(action)
+        self._stores.append(store)
+        self._references.append(reference)
+        self._payload_bytes += payload_bytes
+
+    def _take_references(self, filename: str) -> List[Tuple[int, Dict[str, Any], None, str, int]]:
+        """Remove the queued add_reference() updates for filename and return them."""
+        taken = [i for i, reference in enumerate(self._references) if reference == filename]
+        entries = [(self._note_ids[i], self._actions[i], None, filename, 0) for i in taken]
+        for i in reversed(taken):
+            del self._note_ids[i], self._actions[i], self._stores[i], self._references[i]
+        return entries
+
+    def flush(self) -> List[UpdateOutcome]:
+        """
+        Send all queued updates, in a single `multi` call for inline audio.
+
+        Media files of queued add_file() updates are stored by one `multi`
+        call first, and only notes whose file was stored get their field
+        updated, so no field ends up pointing at a missing file. A failure of
+        a call as a whole is reported against every note in it.
+
+        Returns:
+            One (note ID, error) pair per queued update, in queue order.
+        """
+        if not self._actions:
+            return []
+        note_ids, actions, stores, references = self._note_ids, self._actions, self._stores, self._references
+        self._note_ids, self._actions, self._stores, self._references, self._payload_bytes = [], [], [], [], 0
+
+        errors: List[Optional[Exception]] = [None] * len(note_ids)
+        stored = [i for i, store in enumerate(stores) if store is not None]
+        if stored:
+            failed_files: Dict[str, Exception] = {}
+            for i, error in zip(stored, _multi_errors([stores[i] for i in stored])):
+                errors[i] = error
+                if error is not None:
+                    failed_files[stores[i]["params"]["filename"]] = error
+            for i, filename in enumerate(references):
+                if filename in failed_files:
+                    errors[i] = RuntimeError(f"Media file {filename} was not stored: {failed_files[filename]}")
+        pending = [i for i in range(len(note_ids)) if errors[i] is None]
+        if pending:
+            for i, error in zip(pending, _multi_errors([actions[i] for i in pending])):
+                errors[i] = error
+        return list(zip(note_ids, errors))
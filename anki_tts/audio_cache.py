@@ -0,0 +1,171 @@
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+# Budget for the in-memory cache used when no cache directory is configured.
+# It only needs to hold audio long enough to share it between duplicate notes
+# in the same run, so it is kept small.
+MEMORY_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+_CACHE_SUFFIX = ".audio"
+
+
+class AudioCache:
+    """
+    Content-addressed store for synthesized audio with size-based LRU eviction.
+
+    Entries are keyed by an opaque hex digest (see gcloud_tts.audio_cache_key).
+    With a directory the cache persists across runs: each entry is one file,
+    written atomically, and its modification time doubles as the LRU clock.
+    Without a directory the cache lives in memory for the current run only.
+
+    The cache is safe to share between worker threads.
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = MEMORY_CACHE_MAX_BYTES) -> None:
+        """
+        Open (or create) an audio cache.
+
+        Args:
+            directory: Directory for persistent entries. None keeps entries in
+                memory only.
+            max_bytes: Total size above which least recently used entries are
+                evicted. Must be >= 1.
+
+        Raises:
+            ValueError: If max_bytes is less than 1.
+        """
+        if max_bytes < 1:
+            raise ValueError(f"max_bytes must be >= 1, got {max_bytes}")
+        self.directory = os.path.expanduser(directory) if directory else None
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # key -> size in bytes, least recently used first
+        self._sizes: "OrderedDict[str, int]" = OrderedDict()
+        self._memory: Dict[str, bytes] = {}
+        self._total_bytes = 0
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            self._load_index()
+
+    @property
+    def total_bytes(self) -> int:
+        """Total size of all cached entries in bytes."""
+        return self._total_bytes
+
+    def __len__(self) -> int:
+        return len(self._sizes)
+
+    def __contains__(self, key: str) -> bool:
+        """Return True if key is cached, without counting a hit or miss."""
+        with self._lock:
+            return key in self._sizes
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Return cached audio for key, or None on a miss.
+
+        A hit marks the entry as most recently used.
+        """
+        with self._lock:
+            if key not in self._sizes:
+                self.misses += 1
+                return None
+            data = self._read(key)
+            if data is None:
+                # File vanished underneath us (e.g. cleared by hand).
+                self._forget(key)
+                self.misses += 1
+                return None
+            self._sizes.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key: str, data: bytes) -> None:
+        """Store audio under key, evicting old entries if over budget."""
+        with self._lock:
+            if key in self._sizes:
+                self._forget(key)
+            self._write(key, data)
+            self._sizes[key] = len(data)
+            self._total_bytes += len(data)
+            self._evict()
+
+    def path_for(self, key: str) -> Optional[str]:
+        """Return the file backing key, or None for memory caches and misses."""
+        if not self.directory or key not in self:
+            return None
+        return self._path(key)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + _CACHE_SUFFIX)
+
+    def _load_index(self) -> None:
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(_CACHE_SUFFIX):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, name[: -len(_CACHE_SUFFIX)], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._sizes[key] = size
+            self._total_bytes += size
+        logging.debug(f"Loaded audio cache index: {len(self._sizes)} entries, {self._total_bytes} bytes.")
+        self._evict()
+
+    def _read(self, key: str) -> Optional[bytes]:
+        if not self.directory:
+            return self._memory.get(key)
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # bump LRU position for the next run
+            return data
+        except OSError:
+            return None
+
+    def _write(self, key: str, data: bytes) -> None:
+        if not self.directory:
+            self._memory[key] = data
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temp file in the same directory and rename it into place
+        # so a crash never leaves a truncated entry behind.
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def _forget(self, key: str) -> None:
+        self._total_bytes -= self._sizes.pop(key)
+        if not self.directory:
+            self._memory.pop(key, None)
+            return
+        try:
+            os.unlink(self._path(key))
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        while self._total_bytes > self.max_bytes and self._sizes:
+            key = next(iter(self._sizes))
+            logging.debug(f"Evicting audio cache entry {key}.")
+            self._forget(key)
@@ -13,6 +13,18 @@ load_dotenv()  # Load values from .env if present
 # =========================
 ANKI_CONNECT_URL = os.getenv("ANKI_CONNECT_URL", "http://localhost:8765")
 
+# Request timeout in seconds, plus per-action overrides for actions that can
+# legitimately take longer on large collections.
+ANKI_CONNECT_TIMEOUT = float(os.getenv("ANKI_CONNECT_TIMEOUT", "30"))
+ANKI_CONNECT_ACTION_TIMEOUTS = {
+    "findNotes": 60.0,
+    "notesInfo": 120.0,
+    "multi": 120.0,
+}
+
+# Notes fetched per notesInfo request when streaming a deck.
+NOTES_INFO_CHUNK_SIZE = int(os.getenv("NOTES_INFO_CHUNK_SIZE", "500"))
+
 # =========================
 # TTS defaults
 # =========================
@@ -23,3 +35,62 @@ DEFAULT_VOICES = {
     "en-GB": os.getenv("VOICE_EN", "en-GB-Wavenet-F"),
     "fr-FR": os.getenv("VOICE_FR", "fr-FR-Wavenet-F"),
 }
+
+# Client-side quota limits for Google TTS. Unset means unlimited; quota
+# errors are still backed off adaptively either way.
+TTS_REQUESTS_PER_MINUTE = float(os.getenv("TTS_REQUESTS_PER_MINUTE", "0")) or None
+TTS_CHARACTERS_PER_MINUTE = float(os.getenv("TTS_CHARACTERS_PER_MINUTE", "0")) or None
+
+# Typical seconds per Google TTS request, used by --plan to estimate how long
+# a run will take.
+TTS_EXPECTED_LATENCY = float(os.getenv("TTS_EXPECTED_LATENCY", "0.4"))
+
+# Audio Google TTS returns. Unset options keep Google's defaults. OGG_OPUS is
+# typically several times smaller than MP3 for the same speech, and a lower
+# sample rate shrinks it further.
+TTS_AUDIO_ENCODING = os.getenv("TTS_AUDIO_ENCODING", "MP3")
+TTS_SAMPLE_RATE = int(os.getenv("TTS_SAMPLE_RATE", "0")) or None
+TTS_SPEAKING_RATE = float(os.getenv("TTS_SPEAKING_RATE", "0")) or None
+# Comma-separated effects profiles, e.g. "handset-class-device".
+TTS_EFFECTS_PROFILE = [profile.strip() for profile in os.getenv("TTS_EFFECTS_PROFILE", "").split(",") if profile.strip()]
+
+# =========================
+# Local TTS engine
+# =========================
+# Command --backend local runs once per text, with the text on stdin and the
+# audio on stdout (or in the file named by {output}). {voice} is --voice,
+# or the language code when no voice is given.
+LOCAL_TTS_COMMAND = os.getenv("LOCAL_TTS_COMMAND", "espeak-ng --stdin --stdout -v {voice}")
+LOCAL_TTS_FORMAT = os.getenv("LOCAL_TTS_FORMAT", "wav")
+
+# =========================
+# Audio post-processing
+# =========================
+# Levels used by --postprocess: "trim" cuts leading and trailing audio
+# quieter than POSTPROCESS_SILENCE_DBFS, "normalize" scales each clip to an
+# RMS level of POSTPROCESS_LOUDNESS_DBFS. "opus" pipes the audio through
+# OPUS_TRANSCODE_COMMAND, which reads any format on stdin and writes Ogg Opus
+# to stdout.
+POSTPROCESS_SILENCE_DBFS = float(os.getenv("POSTPROCESS_SILENCE_DBFS", "-50"))
+POSTPROCESS_LOUDNESS_DBFS = float(os.getenv("POSTPROCESS_LOUDNESS_DBFS", "-20"))
+OPUS_TRANSCODE_COMMAND = os.getenv(
+    "OPUS_TRANSCODE_COMMAND",
+    "ffmpeg -hide_banner -loglevel error -i pipe:0 -c:a libopus -b:a 32k -f ogg pipe:1",
+)
+
+# =========================
+# Retries
+# =========================
+# Transient TTS and AnkiConnect errors are retried with exponential backoff.
+# RETRY_MAX_ATTEMPTS counts the first try; RETRY_TIME_BUDGET caps the seconds
+# spent retrying a single call.
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "5"))
+RETRY_TIME_BUDGET = float(os.getenv("RETRY_TIME_BUDGET", "120"))
+
+# =========================
+# Audio cache
+# =========================
+# Directory for the persistent audio cache. Unset disables it; duplicate texts
+# are then only shared within a single run.
+AUDIO_CACHE_DIR = os.getenv("AUDIO_CACHE_DIR") or None
+AUDIO_CACHE_MAX_MB = int(os.getenv("AUDIO_CACHE_MAX_MB", "1024"))
@@ -1,21 +1,70 @@
+from __future__ import annotations
+
+import asyncio
+import json
 import logging
 import os
-from typing import Optional
-from google.cloud import texttospeech
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from types import ModuleType
+from typing import TYPE_CHECKING, Awaitable, Callable, Generic, List, Optional, Sequence, Tuple, TypeVar, Union
+from anki_tts import metrics
 from anki_tts.config import DEFAULT_VOICES, DEFAULT_LANGUAGE
+from anki_tts.rate_limit import QuotaLimiter
+from anki_tts.retry import RetryPolicy
+from anki_tts.tts_backend import BackendCapabilities, text_cache_keyer
 
-def init_tts_client() -> texttospeech.TextToSpeechClient:
-    """
-    Initialize a Google Cloud Text-to-Speech client.
+if TYPE_CHECKING:
+    from google.cloud import texttospeech
 
-    Returns:
-        A TextToSpeechClient instance.
+# Google TTS rejects requests whose input is longer than this many bytes.
+MAX_INPUT_BYTES = 5000
+# Upper bound on the pieces of one long text synthesized at the same time.
+MAX_PIECE_WORKERS = 4
+# Supported AudioEncoding names and the file extension of the audio each
+# returns. LINEAR16 audio comes with a WAV header.
+AUDIO_ENCODINGS = {"MP3": "mp3", "OGG_OPUS": "ogg", "LINEAR16": "wav"}
+# AudioEncoding enum values, for serializing AudioSettings without texttospeech.
+_AUDIO_ENCODING_VALUES = {"LINEAR16": 1, "MP3": 2, "OGG_OPUS": 3}
+# Speaking rates Google TTS accepts; 1.0 is the voice's normal speed.
+MIN_SPEAKING_RATE = 0.25
+MAX_SPEAKING_RATE = 4.0
 
-    Raises:
-        EnvironmentError: If GOOGLE_APPLICATION_CREDENTIALS is not set
-            or points to a non-existent file.
-        Exception: If client initialization fails.
+# Sentence ends: Japanese/CJK terminators (no space needed after them) and
+# Latin ones followed by whitespace, so "3.14" or "e.g." mid-sentence stay
+# whole. Closing quotes and brackets stay with their sentence.
+_SENTENCE_END = re.compile(r"[。．！？!?…]+[」』）)\]\"'’”]*\s*|[.]+[\"'’”)\]]*\s+|\n+")
+# Fallback split points inside an overlong sentence.
+_CLAUSE_END = re.compile(r"[、，,;；:：]\s*|\s+")
+
+T = TypeVar("T")
+
+
+def _texttospeech() -> ModuleType:
+    """
+    Return google.cloud.texttospeech, importing it on first use.
+
+    The import pulls in grpc and protobuf and dominates CLI startup, so it is
+    deferred until something actually builds a request or a client.
     """
+    module = globals().get("texttospeech")
+    if module is None:
+        from google.cloud import texttospeech as module
+        globals()["texttospeech"] = module
+    return module
+
+
+def __getattr__(name: str) -> object:
+    # Keeps gcloud_tts.texttospeech available (and patchable) as before.
+    if name == "texttospeech":
+        return _texttospeech()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _check_credentials() -> str:
+    """Return GOOGLE_APPLICATION_CREDENTIALS, raising EnvironmentError if unusable."""
     credentials_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
 
     if not credentials_path:
@@ -28,56 +77,694 @@ def init_tts_client() -> texttospeech.TextToSpeechClient:
         raise EnvironmentError(
             f"GOOGLE_APPLICATION_CREDENTIALS path does not exist: {credentials_path}"
         )
+    return credentials_path
+
+
+def init_tts_client() -> texttospeech.TextToSpeechClient:
+    """
+    Initialize a Google Cloud Text-to-Speech client.
+
+    Returns:
+        A TextToSpeechClient instance.
+
+    Raises:
+        EnvironmentError: If GOOGLE_APPLICATION_CREDENTIALS is not set
+            or points to a non-existent file.
+        Exception: If client initialization fails.
+    """
+    credentials_path = _check_credentials()
 
     try:
-        client = texttospeech.TextToSpeechClient()
+        client = _texttospeech().TextToSpeechClient()
         logging.info(f"Initialized Google TTS client using credentials at: {credentials_path}")
         return client
     except Exception as e:
         logging.error(f"Failed to initialize Google TTS client: {e}")
         raise
 
+
+def init_async_tts_client() -> texttospeech.TextToSpeechAsyncClient:
+    """
+    Initialize an asyncio Google Cloud Text-to-Speech client.
+
+    Call this from the event loop the client will be used on.
+
+    Returns:
+        A TextToSpeechAsyncClient instance.
+
+    Raises:
+        EnvironmentError: If GOOGLE_APPLICATION_CREDENTIALS is not set
+            or points to a non-existent file.
+        Exception: If client initialization fails.
+    """
+    credentials_path = _check_credentials()
+
+    try:
+        client = _texttospeech().TextToSpeechAsyncClient()
+        logging.info(f"Initialized async Google TTS client using credentials at: {credentials_path}")
+        return client
+    except Exception as e:
+        logging.error(f"Failed to initialize async Google TTS client: {e}")
+        raise
+
+
+class LazyClient(Generic[T]):
+    """
+    Create a client on first use, once, however many threads ask for it.
+
+    Runs that turn out to have nothing to synthesize then never load grpc or
+    check credentials. If the factory fails, later callers get the same error
+    instead of retrying it for every note.
+    """
+
+    def __init__(self, factory: Callable[[], T]) -> None:
+        """
+        Args:
+            factory: Creates the client, e.g. init_tts_client.
+        """
+        self._factory = factory
+        self._client: Optional[T] = None
+        self._error: Optional[Exception] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> T:
+        """
+        Return the client, creating it on the first call.
+
+        Raises:
+            Exception: Whatever the factory raised, on this and every later call.
+        """
+        with self._lock:
+            if self._client is None:
+                if self._error is not None:
+                    raise self._error
+                try:
+                    self._client = self._factory()
+                except Exception as e:
+                    self._error = e
+                    raise
+            return self._client
+
+
+def resolve_voice_name(language_code: str, voice_name: Optional[str] = None) -> str:
+    """Return voice_name, or the configured default voice for language_code."""
+    if voice_name:
+        return voice_name
+    return DEFAULT_VOICES.get(language_code, DEFAULT_VOICES[DEFAULT_LANGUAGE])
+
+
+@dataclass(frozen=True)
+class AudioSettings:
+    """
+    What audio Google TTS should return, e.g. AudioSettings("OGG_OPUS", 24000).
+
+    Plain values rather than an AudioConfig, so the file extension is known
+    without loading texttospeech. Options left unset are not sent, and Google
+    applies its own defaults.
+    """
+
+    # AudioEncoding name, one of AUDIO_ENCODINGS.
+    encoding: str = "MP3"
+    # Output sample rate in Hz, or None for the voice's native rate.
+    sample_rate_hertz: Optional[int] = None
+    # Speed relative to the voice's normal rate, from MIN_SPEAKING_RATE to
+    # MAX_SPEAKING_RATE, or None for 1.0.
+    speaking_rate: Optional[float] = None
+    # Audio profiles applied in order, e.g. ("handset-class-device",).
+    effects_profile: Tuple[str, ...] = ()
+
+    def __post_init__(self) -> None:
+        if self.encoding not in AUDIO_ENCODINGS:
+            raise ValueError(f"encoding must be one of {', '.join(AUDIO_ENCODINGS)}, got {self.encoding!r}")
+        if self.sample_rate_hertz is not None and self.sample_rate_hertz < 1:
+            raise ValueError(f"sample_rate_hertz must be >= 1, got {self.sample_rate_hertz}")
+        if self.speaking_rate is not None and not MIN_SPEAKING_RATE <= self.speaking_rate <= MAX_SPEAKING_RATE:
+            raise ValueError(
+                f"speaking_rate must be between {MIN_SPEAKING_RATE} and {MAX_SPEAKING_RATE}, got {self.speaking_rate}"
+            )
+        object.__setattr__(self, "effects_profile", tuple(self.effects_profile))
+
+    @property
+    def extension(self) -> str:
+        """File extension of the audio, e.g. "mp3"."""
+        return AUDIO_ENCODINGS[self.encoding]
+
+
+def build_audio_config(settings: Optional[AudioSettings] = None) -> texttospeech.AudioConfig:
+    """
+    Return the AudioConfig used for synthesis.
+
+    Args:
+        settings: Encoding and tuning to request. Default None requests MP3
+            with Google's defaults.
+    """
+    if settings is None:
+        settings = AudioSettings()
+    texttospeech = _texttospeech()
+    options = {}
+    if settings.sample_rate_hertz is not None:
+        options["sample_rate_hertz"] = settings.sample_rate_hertz
+    if settings.speaking_rate is not None:
+        options["speaking_rate"] = settings.speaking_rate
+    if settings.effects_profile:
+        options["effects_profile_id"] = list(settings.effects_profile)
+    return texttospeech.AudioConfig(
+        audio_encoding=texttospeech.AudioEncoding[settings.encoding], **options
+    )
+
+
+def audio_cache_key(
+    text: str,
+    language_code: str,
+    voice_name: Optional[str],
+    audio_config: texttospeech.AudioConfig,
+) -> str:
+    """
+    Return a stable hex digest identifying the audio a request would produce.
+
+    The text is Unicode-normalized and whitespace-collapsed first, so inputs
+    that only differ in invisible ways share an entry.
+
+    Args:
+        text: The input text to synthesize.
+        language_code: Language code for synthesis.
+        voice_name: Voice name; None resolves to the configured default.
+        audio_config: The AudioConfig the request would use.
+
+    Returns:
+        A SHA-256 hex digest.
+    """
+    return audio_cache_keyer(language_code, voice_name, audio_config)(text)
+
+
+def audio_cache_keyer(
+    language_code: str,
+    voice_name: Optional[str],
+    audio_config: texttospeech.AudioConfig,
+) -> Callable[[str], str]:
+    """
+    Return a function mapping text to audio_cache_key(text, language_code, voice_name, audio_config).
+
+    Serializing the AudioConfig costs several times more than hashing the
+    text, so callers keying many texts with the same settings should build
+    one keyer and reuse it.
+
+    Args:
+        language_code: Language code for synthesis.
+        voice_name: Voice name; None resolves to the configured default.
+        audio_config: The AudioConfig the requests would use.
+
+    Returns:
+        A function taking the input text and returning its cache key.
+    """
+    return text_cache_keyer(_cache_key_params(language_code, voice_name, audio_config))
+
+
+def _cache_key_params(
+    language_code: str,
+    voice_name: Optional[str],
+    audio_config: texttospeech.AudioConfig,
+) -> Tuple[str, ...]:
+    config_json = _texttospeech().AudioConfig.to_json(audio_config, sort_keys=True, indent=None)
+    return (language_code, resolve_voice_name(language_code, voice_name), config_json)
+
+
+def _settings_json(settings: AudioSettings) -> str:
+    """
+    Return what AudioConfig.to_json() gives for build_audio_config(settings).
+
+    Built from the plain settings, so cache keys can be computed, and runs
+    served from the cache completed, without loading texttospeech and grpc.
+    """
+    return json.dumps(
+        {
+            "audioEncoding": _AUDIO_ENCODING_VALUES[settings.encoding],
+            "effectsProfileId": list(settings.effects_profile),
+            "pitch": 0.0,
+            "sampleRateHertz": settings.sample_rate_hertz or 0,
+            "speakingRate": float(settings.speaking_rate or 0.0),
+            "volumeGainDb": 0.0,
+        },
+        sort_keys=True,
+    )
+
+
+def _build_request(
+    text: str,
+    language_code: str,
+    voice_name: Optional[str],
+    audio_config: Optional[texttospeech.AudioConfig],
+) -> Tuple[texttospeech.SynthesisInput, texttospeech.VoiceSelectionParams, texttospeech.AudioConfig]:
+    """Return the (input, voice, audio_config) arguments for synthesize_speech."""
+    texttospeech = _texttospeech()
+    synthesis_input = texttospeech.SynthesisInput(text=text)
+
+    voice = texttospeech.VoiceSelectionParams(
+        language_code=language_code,
+        name=resolve_voice_name(language_code, voice_name),
+    )
+
+    if audio_config is None:
+        audio_config = build_audio_config()
+    return synthesis_input, voice, audio_config
+
+
+def _utf8_len(text: str) -> int:
+    return len(text.encode("utf-8"))
+
+
+def _split_after(text: str, pattern: re.Pattern) -> List[str]:
+    """Split text after every match of pattern, keeping the separators."""
+    parts = []
+    start = 0
+    for match in pattern.finditer(text):
+        if match.end() > start:
+            parts.append(text[start:match.end()])
+            start = match.end()
+    if start < len(text):
+        parts.append(text[start:])
+    return parts
+
+
+def _split_units(text: str, max_bytes: int) -> List[str]:
+    """Split text into sentence, clause or character runs of at most max_bytes."""
+    units = []
+    for sentence in _split_after(text, _SENTENCE_END):
+        if _utf8_len(sentence) <= max_bytes:
+            units.append(sentence)
+            continue
+        for clause in _split_after(sentence, _CLAUSE_END):
+            if _utf8_len(clause) <= max_bytes:
+                units.append(clause)
+                continue
+            run = ""
+            for char in clause:
+                if run and _utf8_len(run + char) > max_bytes:
+                    units.append(run)
+                    run = ""
+                run += char
+            units.append(run)
+    return units
+
+
+def split_text(text: str, max_bytes: int = MAX_INPUT_BYTES) -> List[str]:
+    """
+    Split text into as few pieces as possible that each fit in one request.
+
+    Pieces end at sentence boundaries (Japanese 。！？ as well as Latin . ! ?)
+    where possible, then at clause boundaries (、 , ; or spaces), and only as a
+    last resort mid-clause.
+
+    Args:
+        text: The input text.
+        max_bytes: Maximum UTF-8 size of a piece (default: MAX_INPUT_BYTES).
+
+    Returns:
+        [text] if it already fits, otherwise the pieces in order.
+    """
+    if _utf8_len(text) <= max_bytes:
+        return [text]
+    pieces = []
+    current = ""
+    for unit in _split_units(text, max_bytes):
+        if current and _utf8_len(current + unit) > max_bytes:
+            pieces.append(current)
+            current = ""
+        current += unit
+    pieces.append(current)
+    return [piece.strip() for piece in pieces if piece.strip()]
+
+
+def _id3v2_size(data: bytes) -> int:
+    """Return the length of a leading ID3v2 tag, or 0 if there is none."""
+    if len(data) < 10 or data[:3] != b"ID3":
+        return 0
+    size = (data[6] & 0x7F) << 21 | (data[7] & 0x7F) << 14 | (data[8] & 0x7F) << 7 | (data[9] & 0x7F)
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def concat_mp3(parts: Sequence[bytes]) -> bytes:
+    """
+    Join MP3 clips into one by concatenating their frames, without re-encoding.
+
+    MP3 frames are self-contained, so clips with the same encoding settings
+    can be played back to back once the ID3 tags between them are removed.
+    Only the first clip's leading ID3v2 tag and the last clip's trailing
+    ID3v1 tag are kept.
+    """
+    frames = []
+    for index, data in enumerate(parts):
+        start = _id3v2_size(data) if index > 0 else 0
+        end = len(data)
+        if index < len(parts) - 1 and end - start >= 128 and data[end - 128:end - 125] == b"TAG":
+            end -= 128
+        frames.append(data[start:end])
+    return b"".join(frames)
+
+
+def _check_splittable(audio_config: Optional[texttospeech.AudioConfig]) -> None:
+    if audio_config is not None and audio_config.audio_encoding != _texttospeech().AudioEncoding.MP3:
+        raise ValueError(f"Texts over {MAX_INPUT_BYTES} bytes can only be split for MP3 output")
+
+
+def _synthesize_one(
+    text: str,
+    client: texttospeech.TextToSpeechClient,
+    language_code: str,
+    voice_name: Optional[str],
+    audio_config: Optional[texttospeech.AudioConfig],
+) -> bytes:
+    synthesis_input, voice, audio_config = _build_request(text, language_code, voice_name, audio_config)
+
+    try:
+        with metrics.timer("synthesis"):
+            response = client.synthesize_speech(
+                input=synthesis_input, voice=voice, audio_config=audio_config
+            )
+    except Exception as e:
+        logging.error(f"TTS synthesis failed for text '{text[:30]}...': {e}")
+        raise
+
+    _count_synthesis(text, response.audio_content)
+    return response.audio_content
+
+
+def _count_synthesis(text: str, audio: bytes) -> None:
+    metrics.count("tts_requests")
+    metrics.count("characters_billed", len(text))
+    metrics.count("bytes_synthesized", len(audio))
+
+
 def synthesize_audio(
     text: str,
     client: texttospeech.TextToSpeechClient,
     language_code: str = "ja-JP",
     voice_name: Optional[str] = None,
+    audio_config: Optional[texttospeech.AudioConfig] = None,
 ) -> bytes:
     """
     Generate speech audio from text using Google TTS.
 
+    Text over MAX_INPUT_BYTES is split with split_text(); the pieces are
+    synthesized concurrently and joined with concat_mp3().
+
     Args:
         text: The input text to synthesize.
         client: An initialized TextToSpeechClient instance.
         language_code: Language code for synthesis (default: "ja-JP").
         voice_name: Optional specific voice name; defaults to project defaults.
+        audio_config: Optional AudioConfig; defaults to build_audio_config().
 
     Returns:
         The synthesized audio content as bytes.
 
     Raises:
+        ValueError: If text needs splitting and audio_config is not MP3.
         Exception: If synthesis fails.
     """
-    if not voice_name:
-        voice_name = DEFAULT_VOICES.get(language_code, DEFAULT_VOICES[DEFAULT_LANGUAGE])
+    pieces = split_text(text)
+    if len(pieces) == 1:
+        return _synthesize_one(text, client, language_code, voice_name, audio_config)
 
-    synthesis_input = texttospeech.SynthesisInput(text=text)
+    _check_splittable(audio_config)
+    logging.debug(f"Splitting {_utf8_len(text)}-byte text into {len(pieces)} requests")
+    with ThreadPoolExecutor(max_workers=min(len(pieces), MAX_PIECE_WORKERS)) as pool:
+        clips = list(pool.map(
+            lambda piece: _synthesize_one(piece, client, language_code, voice_name, audio_config), pieces
+        ))
+    return concat_mp3(clips)
 
-    voice = texttospeech.VoiceSelectionParams(
-        language_code=language_code,
-        name=voice_name,
-    )
 
-    audio_config = texttospeech.AudioConfig(
-        audio_encoding=texttospeech.AudioEncoding.MP3
-    )
+class GoogleTTSBackend:
+    """
+    Google Cloud Text-to-Speech as a TTSBackend.
 
-    try:
-        response = client.synthesize_speech(
-            input=synthesis_input, voice=voice, audio_config=audio_config
+    The client is created when the first text is synthesized (see
+    LazyClient), so a backend that never synthesizes never loads grpc.
+    """
+
+    def __init__(
+        self,
+        client: Optional[Union[texttospeech.TextToSpeechClient, LazyClient]] = None,
+        settings: Optional[AudioSettings] = None,
+        concurrency: int = 8,
+    ) -> None:
+        """
+        Args:
+            client: TextToSpeechClient, or a LazyClient creating one. Default
+                None initializes one with init_tts_client() on first use.
+            settings: Audio to request; its encoding sets the audio format.
+                The AudioConfig is built on first use. Default None requests
+                MP3.
+            concurrency: Requests in flight in synthesize_many(). Must be
+                >= 1. Default 8.
+
+        Raises:
+            ValueError: If concurrency is less than 1.
+        """
+        if concurrency < 1:
+            raise ValueError(f"concurrency must be >= 1, got {concurrency}")
+        if client is None:
+            client = LazyClient(init_tts_client)
+        if settings is None:
+            settings = AudioSettings()
+        self._client = client
+        self.settings = settings
+        self._audio_config: Optional[texttospeech.AudioConfig] = None
+        self._concurrency = concurrency
+        self.capabilities = BackendCapabilities(
+            name="google",
+            audio_format=settings.extension,
+            max_input_bytes=MAX_INPUT_BYTES,
+            # Only MP3 pieces can be joined (see concat_mp3).
+            splits_long_texts=settings.encoding == "MP3",
+            billed=True,
+        )
+
+    @property
+    def client(self) -> texttospeech.TextToSpeechClient:
+        """The client, created on first access when given a LazyClient."""
+        return self._client.get() if isinstance(self._client, LazyClient) else self._client
+
+    @property
+    def audio_config(self) -> texttospeech.AudioConfig:
+        """The AudioConfig every request uses."""
+        if self._audio_config is None:
+            self._audio_config = build_audio_config(self.settings)
+        return self._audio_config
+
+    def cache_key_params(self, language_code: str, voice_name: Optional[str]) -> Tuple[str, ...]:
+        return (language_code, resolve_voice_name(language_code, voice_name), _settings_json(self.settings))
+
+    def check(self) -> None:
+        """Create the client now, raising EnvironmentError if credentials are unusable."""
+        self.client
+
+    def synthesize(self, text: str, language_code: str = "ja-JP", voice_name: Optional[str] = None) -> bytes:
+        """See synthesize_audio()."""
+        return synthesize_audio(
+            text, self.client, language_code=language_code, voice_name=voice_name, audio_config=self.audio_config
         )
+
+    def synthesize_many(self, texts: Sequence[str], language_code: str = "ja-JP", voice_name: Optional[str] = None) -> List[bytes]:
+        """Synthesize texts with up to `concurrency` requests in flight; see synthesize_audio()."""
+        with ThreadPoolExecutor(max_workers=self._concurrency) as pool:
+            return list(pool.map(lambda text: self.synthesize(text, language_code, voice_name), texts))
+
+
+async def synthesize_audio_async(
+    text: str,
+    client: texttospeech.TextToSpeechAsyncClient,
+    language_code: str = "ja-JP",
+    voice_name: Optional[str] = None,
+    audio_config: Optional[texttospeech.AudioConfig] = None,
+    semaphore: Optional[asyncio.Semaphore] = None,
+) -> bytes:
+    """
+    Generate speech audio from text using the asyncio Google TTS client.
+
+    Text over MAX_INPUT_BYTES is split and joined as in synthesize_audio(),
+    with the pieces requested concurrently.
+
+    Args:
+        text: The input text to synthesize.
+        client: An initialized TextToSpeechAsyncClient instance.
+        language_code: Language code for synthesis (default: "ja-JP").
+        voice_name: Optional specific voice name; defaults to project defaults.
+        audio_config: Optional AudioConfig; defaults to build_audio_config().
+        semaphore: Optional semaphore held for the duration of each request,
+            to bound how many requests are in flight at once.
+
+    Returns:
+        The synthesized audio content as bytes.
+
+    Raises:
+        ValueError: If text needs splitting and audio_config is not MP3.
+        Exception: If synthesis fails.
+    """
+    pieces = split_text(text)
+    if len(pieces) > 1:
+        _check_splittable(audio_config)
+        logging.debug(f"Splitting {_utf8_len(text)}-byte text into {len(pieces)} requests")
+        clips = await asyncio.gather(*(
+            synthesize_audio_async(piece, client, language_code, voice_name, audio_config, semaphore)
+            for piece in pieces
+        ))
+        return concat_mp3(clips)
+
+    synthesis_input, voice, audio_config = _build_request(text, language_code, voice_name, audio_config)
+
+    try:
+        if semaphore is None:
+            with metrics.timer("synthesis"):
+                response = await client.synthesize_speech(
+                    input=synthesis_input, voice=voice, audio_config=audio_config
+                )
+        else:
+            async with semaphore:
+                with metrics.timer("synthesis"):
+                    response = await client.synthesize_speech(
+                        input=synthesis_input, voice=voice, audio_config=audio_config
+                    )
     except Exception as e:
         logging.error(f"TTS synthesis failed for text '{text[:30]}...': {e}")
         raise
 
+    _count_synthesis(text, response.audio_content)
     return response.audio_content
+
+
+async def synthesize_many_async(
+    texts: Sequence[str],
+    client: texttospeech.TextToSpeechAsyncClient,
+    concurrency: int = 32,
+    language_code: str = "ja-JP",
+    voice_name: Optional[str] = None,
+    audio_config: Optional[texttospeech.AudioConfig] = None,
+) -> List[bytes]:
+    """
+    Synthesize several texts concurrently, at most concurrency at a time.
+
+    Args:
+        texts: The input texts to synthesize.
+        client: An initialized TextToSpeechAsyncClient instance.
+        concurrency: Maximum number of requests in flight. Must be >= 1.
+        language_code: Language code for synthesis (default: "ja-JP").
+        voice_name: Optional specific voice name; defaults to project defaults.
+        audio_config: Optional AudioConfig; defaults to build_audio_config().
+
+    Returns:
+        The synthesized audio for each text, in input order.
+
+    Raises:
+        ValueError: If concurrency is less than 1.
+        Exception: The first synthesis failure, if any.
+    """
+    if concurrency < 1:
+        raise ValueError(f"concurrency must be >= 1, got {concurrency}")
+    semaphore = asyncio.Semaphore(concurrency)
+    return list(await asyncio.gather(*(
+        synthesize_audio_async(text, client, language_code, voice_name, audio_config, semaphore)
+        for text in texts
+    )))
+
+
+class AsyncTTSRunner:
+    """
+    Run synthesize_audio_async on a background event loop.
+
+    Lets synchronous code keep hundreds of requests in flight from a single
+    thread: submit() schedules a request on the loop and returns a
+    concurrent.futures.Future, so callers can treat it like a thread pool.
+    """
+
+    def __init__(
+        self,
+        concurrency: int,
+        client_factory: Callable[[], texttospeech.TextToSpeechAsyncClient] = init_async_tts_client,
+        limiter: Optional[QuotaLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+    ) -> None:
+        """
+        Args:
+            concurrency: Maximum number of requests in flight. Must be >= 1.
+            client_factory: Creates the async client; called on the event
+                loop, as grpc.aio requires, when the first request starts.
+            limiter: Optional QuotaLimiter every request goes through.
+            retry_policy: Optional RetryPolicy for transient errors.
+
+        Raises:
+            ValueError: If concurrency is less than 1.
+        """
+        if concurrency < 1:
+            raise ValueError(f"concurrency must be >= 1, got {concurrency}")
+        self.limiter = limiter
+        self.retry_policy = retry_policy
+        self._client = LazyClient(client_factory)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="tts-async", daemon=True)
+        self._thread.start()
+
+        async def start() -> None:
+            self._semaphore = asyncio.Semaphore(concurrency)
+
+        try:
+            asyncio.run_coroutine_threadsafe(start(), self._loop).result()
+        except BaseException:
+            self.close()
+            raise
+
+    def submit(
+        self,
+        text: str,
+        language_code: str = "ja-JP",
+        voice_name: Optional[str] = None,
+        audio_config: Optional[texttospeech.AudioConfig] = None,
+    ) -> Future:
+        """
+        Schedule a synthesis and return a Future for its audio bytes.
+
+        The first request creates the client; if that fails, every returned
+        Future fails with the factory's error.
+        """
+        async def request() -> bytes:
+            client = self._client.get()  # on the loop thread
+            return await synthesize_audio_async(text, client, language_code, voice_name, audio_config, self._semaphore)
+
+        def limited_request() -> Awaitable[bytes]:
+            if self.limiter is None:
+                return request()
+            return self.limiter.acall(request, len(text), len(split_text(text)))
+
+        coroutine = limited_request() if self.retry_policy is None else self.retry_policy.acall(limited_request)
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+    def check(self) -> None:
+        """Create the client now, raising the factory's error, e.g. EnvironmentError without credentials."""
+        async def create() -> None:
+            self._client.get()
+
+        asyncio.run_coroutine_threadsafe(create(), self._loop).result()
+
+    def close(self) -> None:
+        """Cancel requests still in flight and stop the event loop."""
+        if self._loop.is_closed():
+            return
+
+        async def cancel_pending() -> None:
+            tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        asyncio.run_coroutine_threadsafe(cancel_pending(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def __enter__(self) -> "AsyncTTSRunner":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
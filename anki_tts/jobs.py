@@ -0,0 +1,125 @@
+import json
+import os
+from dataclasses import dataclass, fields
+from typing import Any, Dict, List, Optional
+from anki_tts.config import DEFAULT_LANGUAGE
+
+
+@dataclass(frozen=True)
+class TTSJob:
+    """One deck/field pair to add audio to, as listed in a job file."""
+
+    deck: str
+    text_field: str
+    audio_field: str
+    language: str = DEFAULT_LANGUAGE
+    voice: Optional[str] = None
+    overwrite: bool = False
+    tags: Optional[List[str]] = None
+    note_types: Optional[List[str]] = None
+    max_cards: Optional[int] = None
+    # TTS backend name, e.g. "local"; None means Google.
+    backend: Optional[str] = None
+
+    def describe(self) -> str:
+        """Return a short human-readable summary of the job."""
+        via = f" via {self.backend}" if self.backend else ""
+        return f"deck '{self.deck}' ({self.text_field} → {self.audio_field}, {self.voice or self.language}{via})"
+
+
+_JOB_OPTIONS = {f.name for f in fields(TTSJob)}
+_REQUIRED_OPTIONS = ("deck", "text_field", "audio_field")
+
+
+def _parse_file(path: str) -> Any:
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".json":
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    if extension == ".toml":
+        try:
+            import tomllib
+        except ImportError:  # Python < 3.11
+            try:
+                import tomli as tomllib
+            except ImportError:
+                raise ValueError("Reading TOML job files needs Python 3.11+ or the 'tomli' package.")
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+    if extension in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError("Reading YAML job files needs the 'PyYAML' package.")
+        with open(path, encoding="utf-8") as f:
+            return yaml.safe_load(f)
+    raise ValueError(f"Unsupported job file type '{extension}'; use .json, .toml, .yaml or .yml")
+
+
+def _build_job(options: Dict[str, Any], number: int, path: str) -> TTSJob:
+    unknown = sorted(set(options) - _JOB_OPTIONS)
+    if unknown:
+        raise ValueError(f"Job {number} in {path}: unknown option(s) {', '.join(unknown)}")
+    missing = [name for name in _REQUIRED_OPTIONS if not options.get(name)]
+    if missing:
+        raise ValueError(f"Job {number} in {path}: missing {', '.join(missing)}")
+    max_cards = options.get("max_cards")
+    if max_cards is not None and (not isinstance(max_cards, int) or max_cards < 1):
+        raise ValueError(f"Job {number} in {path}: max_cards must be >= 1, got {max_cards}")
+    for name in ("tags", "note_types"):
+        if isinstance(options.get(name), str):
+            options[name] = [options[name]]
+    return TTSJob(**options)
+
+
+def load_jobs(path: str, defaults: Optional[Dict[str, Any]] = None) -> List[TTSJob]:
+    """
+    Read a JSON, TOML or YAML job file.
+
+    The file holds either a list of jobs, or a mapping with a "jobs" list and
+    an optional "defaults" mapping applied to every job. Each job takes the
+    TTSJob options (deck, text_field, audio_field, language, voice,
+    overwrite, tags, note_types, max_cards, backend). In TOML, write jobs as
+    [[jobs]] tables.
+
+    Args:
+        path: The job file. Its extension selects the format.
+        defaults: Options applied before the file's own defaults, e.g. from
+            the command line.
+
+    Returns:
+        The jobs in file order.
+
+    Raises:
+        ValueError: If the file type is unsupported, a parser is not
+            installed, or a job is invalid.
+        OSError: If the file cannot be read.
+    """
+    data = _parse_file(path)
+    base = {key: value for key, value in (defaults or {}).items() if value is not None}
+    if isinstance(data, dict):
+        base.update(data.get("defaults") or {})
+        data = data.get("jobs")
+    if not isinstance(data, list) or not data:
+        raise ValueError(f"{path} does not list any jobs")
+    jobs = []
+    for number, entry in enumerate(data, 1):
+        if not isinstance(entry, dict):
+            raise ValueError(f"Job {number} in {path}: expected a mapping of options")
+        jobs.append(_build_job({**base, **entry}, number, path))
+    return jobs
+
+
+def schedule_jobs(jobs: List[TTSJob]) -> List[TTSJob]:
+    """
+    Order jobs so those sharing a backend, language and voice run back to back.
+
+    Audio is only reusable between jobs that synthesize with the same
+    backend, language and voice, so grouping them keeps texts that recur across decks
+    fresh in the audio cache. Groups, and jobs within a group, keep their
+    file order.
+    """
+    groups: Dict[tuple, List[TTSJob]] = {}
+    for job in jobs:
+        groups.setdefault((job.backend or "google", job.language, job.voice), []).append(job)
+    return [job for group in groups.values() for job in group]
@@ -0,0 +1,112 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, List, Set, Tuple
+
+
+class RunJournal:
+    """
+    Append-only JSONL record of notes that already received audio.
+
+    Each line records one completed note: its ID, audio field, the cache key of
+    the audio and the media filename it was stored under. Lines are buffered
+    and written with a single fsync per batch, so journaling costs next to
+    nothing per note; a crash loses at most the last unsynced batch, whose
+    notes are simply redone on resume.
+
+    Usage:
+        with RunJournal("run.jsonl", resume=True) as journal:
+            process_deck(..., journal=journal)
+    """
+
+    def __init__(
+        self,
+        path: str,
+        resume: bool = False,
+        sync_every: int = 256,
+        sync_interval: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        Args:
+            path: Journal file path.
+            resume: If True, load the notes recorded by an earlier run and
+                append to the file; otherwise start a new, empty journal.
+            sync_every: Write and fsync once this many records are buffered.
+                Must be >= 1.
+            sync_interval: Also write and fsync when a record arrives this many
+                seconds after the last sync.
+            clock: Monotonic time source, replaceable in tests.
+
+        Raises:
+            ValueError: If sync_every is less than 1.
+            OSError: If the journal file cannot be opened.
+        """
+        if sync_every < 1:
+            raise ValueError(f"sync_every must be >= 1, got {sync_every}")
+        self.path = path
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self._clock = clock
+        self._done: Set[Tuple[int, str]] = set()
+        self._buffer: List[str] = []
+        self._lock = threading.Lock()
+        if resume and os.path.exists(path):
+            self._load()
+        self._file = open(path, "a" if resume else "w", encoding="utf-8")
+        self._last_sync = clock()
+
+    def _load(self) -> None:
+        with open(self.path, encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                try:
+                    entry = json.loads(line)
+                    self._done.add((int(entry["note"]), entry["field"]))
+                except (ValueError, KeyError, TypeError):
+                    # Most likely the tail of a write cut short by a crash.
+                    logging.warning(f"Ignoring unreadable line {line_number} in journal {self.path}")
+        logging.info(f"Loaded {len(self._done)} completed note(s) from journal {self.path}")
+
+    def __len__(self) -> int:
+        return len(self._done)
+
+    def is_done(self, note_id: int, audio_field: str) -> bool:
+        """Return True if note_id's audio_field is recorded as completed."""
+        return (note_id, audio_field) in self._done
+
+    def record(self, note_id: int, audio_field: str, key: str, filename: str) -> None:
+        """Buffer a completed note, syncing to disk if a batch is due."""
+        line = json.dumps({"note": note_id, "field": audio_field, "key": key, "file": filename}, separators=(",", ":"))
+        with self._lock:
+            self._done.add((note_id, audio_field))
+            self._buffer.append(line + "\n")
+            if len(self._buffer) >= self.sync_every or self._clock() - self._last_sync >= self.sync_interval:
+                self._sync()
+
+    def flush(self) -> None:
+        """Write and fsync any buffered records."""
+        with self._lock:
+            self._sync()
+
+    def _sync(self) -> None:
+        if self._buffer:
+            self._file.write("".join(self._buffer))
+            self._buffer.clear()
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self._last_sync = self._clock()
+
+    def close(self) -> None:
+        """Flush buffered records and close the file."""
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+
+    def __enter__(self) -> "RunJournal":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
@@ -0,0 +1,97 @@
+import json
+import logging
+import os
+import threading
+from typing import Dict, Optional
+
+
+class MediaManifest:
+    """
+    Persistent record of which audio each media file uploaded to Anki holds.
+
+    Maps media filenames to the cache key (see gcloud_tts.audio_cache_key)
+    of the audio stored under them, so a later run can tell whether a file
+    Anki already has is the one it would upload, without downloading it.
+    The file is append-only JSONL where the last line for a filename wins;
+    it is rewritten compactly on open once superseded lines outnumber the
+    live ones.
+
+    Usage:
+        with MediaManifest("media.jsonl") as manifest:
+            process_deck(..., manifest=manifest, reuse_media=True)
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Args:
+            path: Manifest file path. Created if missing.
+
+        Raises:
+            OSError: If the manifest file cannot be opened.
+        """
+        self.path = path
+        self._keys: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        lines = self._load() if os.path.exists(path) else 0
+        if lines > 2 * len(self._keys):
+            self._compact()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def _load(self) -> int:
+        lines = 0
+        with open(self.path, encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                lines += 1
+                try:
+                    entry = json.loads(line)
+                    self._keys[str(entry["file"])] = str(entry["key"])
+                except (ValueError, KeyError, TypeError):
+                    # Most likely the tail of a write cut short by a crash.
+                    logging.warning(f"Ignoring unreadable line {line_number} in media manifest {self.path}")
+        logging.info(f"Loaded {len(self._keys)} media file(s) from manifest {self.path}")
+        return lines
+
+    def _compact(self) -> None:
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for filename, key in self._keys.items():
+                f.write(self._line(filename, key))
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def _line(filename: str, key: str) -> str:
+        return json.dumps({"file": filename, "key": key}, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def get(self, filename: str) -> Optional[str]:
+        """Return the cache key of the audio last stored as filename, or None."""
+        return self._keys.get(filename)
+
+    def record(self, filename: str, key: str) -> None:
+        """Note that filename now holds the audio with this cache key."""
+        with self._lock:
+            if self._keys.get(filename) == key:
+                return
+            self._keys[filename] = key
+            self._file.write(self._line(filename, key))
+
+    def flush(self) -> None:
+        """Write buffered records to disk."""
+        with self._lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        """Flush buffered records and close the file."""
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+
+    def __enter__(self) -> "MediaManifest":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
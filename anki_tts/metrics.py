@@ -0,0 +1,260 @@
+import bisect
+import itertools
+import json
+import math
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+# Histogram bucket bounds in seconds, spanning fast local AnkiConnect calls
+# to slow TTS requests.
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Samples kept for percentiles; beyond this a uniform random subset is kept.
+RESERVOIR_SIZE = 2048
+
+
+class Histogram:
+    """
+    Thread-safe latency histogram in seconds, in bounded memory.
+
+    Count, sum and the cumulative counts for `bounds` are exact. Percentiles
+    come from a uniform reservoir sample of at most `reservoir_size`
+    samples, so they are exact until that many samples have been added and
+    close estimates after. Readers copy under the lock and sort outside it,
+    so a scrape never holds up the threads recording samples.
+    """
+
+    def __init__(self, bounds: Sequence[float] = LATENCY_BUCKETS, reservoir_size: int = RESERVOIR_SIZE) -> None:
+        """
+        Args:
+            bounds: Ascending bucket upper bounds in seconds.
+            reservoir_size: Samples kept for percentiles. Must be >= 1.
+
+        Raises:
+            ValueError: If reservoir_size is less than 1.
+        """
+        if reservoir_size < 1:
+            raise ValueError(f"reservoir_size must be >= 1, got {reservoir_size}")
+        self.bounds = tuple(bounds)
+        self._bucket_index = {bound: i for i, bound in enumerate(self.bounds)}
+        # Samples per bucket; the last slot counts samples above every bound.
+        self._buckets = [0] * (len(self.bounds) + 1)
+        self._reservoir: List[float] = []
+        self._reservoir_size = reservoir_size
+        self._count = 0
+        self._total = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        bucket = bisect.bisect_left(self.bounds, seconds)
+        with self._lock:
+            self._count += 1
+            self._total += seconds
+            self._buckets[bucket] += 1
+            if len(self._reservoir) < self._reservoir_size:
+                self._reservoir.append(seconds)
+            else:
+                slot = random.randrange(self._count)
+                if slot < self._reservoir_size:
+                    self._reservoir[slot] = seconds
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def total(self) -> float:
+        return self._total
+
+    def percentile(self, q: float) -> float:
+        """Return the nearest-rank q-th percentile (0-100), or 0.0 if empty."""
+        with self._lock:
+            samples = list(self._reservoir)
+        if not samples:
+            return 0.0
+        samples.sort()
+        rank = max(1, math.ceil(q / 100 * len(samples)))
+        return samples[rank - 1]
+
+    def bucket_counts(self, bounds: Optional[Sequence[float]] = None) -> Tuple[List[int], float, int]:
+        """
+        Return cumulative sample counts at or below each bound, plus sum and count.
+
+        Args:
+            bounds: Ascending upper bounds in seconds, each one of the
+                histogram's bounds. Default None uses all of them.
+
+        Raises:
+            ValueError: If a bound is not one of the histogram's bounds.
+        """
+        if bounds is None:
+            bounds = self.bounds
+        missing = [bound for bound in bounds if bound not in self._bucket_index]
+        if missing:
+            raise ValueError(f"Bounds {missing} are not among the histogram's bounds {list(self.bounds)}")
+        with self._lock:
+            buckets = list(self._buckets)
+            total, count = self._total, self._count
+        cumulative = list(itertools.accumulate(buckets))
+        return [cumulative[self._bucket_index[bound]] for bound in bounds], total, count
+
+
+# (name, sorted label pairs) identifying one counter.
+CounterKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+def format_counter_key(key: CounterKey) -> str:
+    """Return 'name' or 'name{label=value,...}' for a counter key."""
+    name, labels = key
+    if not labels:
+        return name
+    return name + "{" + ",".join(f"{label}={value}" for label, value in labels) + "}"
+
+
+class Metrics:
+    """
+    Per-stage timings and counters for one run.
+
+    Stages are timed with timer() and summarized as count, total and
+    p50/p95/p99 latency, and the number of blocks currently inside each stage
+    is tracked as in_flight. Counters accumulate totals such as bytes
+    synthesized, optionally split by labels. Code deep in the call stack
+    records into whichever registry is active (see use_metrics()), through
+    the module-level timer() and count() helpers.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter) -> None:
+        """
+        Args:
+            clock: Time source in seconds, replaceable in tests.
+        """
+        self._clock = clock
+        self.started = clock()
+        self.stages: Dict[str, Histogram] = {}
+        self.in_flight: Dict[str, int] = {}
+        self.counters: Dict[CounterKey, int] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """Record one sample for stage."""
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self.stages.setdefault(stage, Histogram())
+        histogram.add(seconds)
+
+    @contextmanager
+    def timer(self, stage: str) -> Iterator[None]:
+        """Time the enclosed block as one sample of stage."""
+        with self._lock:
+            self.in_flight[stage] = self.in_flight.get(stage, 0) + 1
+        start = self._clock()
+        try:
+            yield
+        finally:
+            self.observe(stage, self._clock() - start)
+            with self._lock:
+                self.in_flight[stage] -= 1
+
+    def count(self, name: str, n: int = 1, **labels: str) -> None:
+        """Add n to the counter name, or to its labelled series."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    def counter(self, name: str, **labels: str) -> int:
+        """Return the current value of a counter (0 if never counted)."""
+        return self.counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds since the registry was created."""
+        return self._clock() - self.started
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return a JSON-serializable summary of all stages and counters."""
+        elapsed = self.elapsed
+        with self._lock:
+            counters = sorted((format_counter_key(key), value) for key, value in self.counters.items())
+        return {
+            "elapsed_seconds": round(elapsed, 6),
+            "stages": {
+                stage: {
+                    "count": histogram.count,
+                    "total_seconds": round(histogram.total, 6),
+                    "p50_ms": round(histogram.percentile(50) * 1000, 3),
+                    "p95_ms": round(histogram.percentile(95) * 1000, 3),
+                    "p99_ms": round(histogram.percentile(99) * 1000, 3),
+                }
+                for stage, histogram in sorted(self.stages.items())
+            },
+            "counters": dict(counters),
+            "throughput_per_second": {
+                name: round(value / elapsed, 3) if elapsed > 0 else 0.0
+                for name, value in counters
+            },
+        }
+
+    def format_table(self) -> List[str]:
+        """Return the summary as lines of a plain-text table."""
+        summary = self.to_dict()
+        lines = [f"{'Stage':<14}{'Count':>8}{'Total s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"]
+        for stage, row in summary["stages"].items():
+            lines.append(
+                f"{stage:<14}{row['count']:>8}{row['total_seconds']:>10.2f}"
+                f"{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}"
+            )
+        elapsed = summary["elapsed_seconds"]
+        totals = ", ".join(
+            f"{name}={value} ({summary['throughput_per_second'][name]:g}/s)"
+            for name, value in summary["counters"].items()
+        )
+        lines.append(f"Elapsed {elapsed:.1f}s" + (f"; {totals}" if totals else ""))
+        return lines
+
+    def write_json(self, path: str) -> None:
+        """Write to_dict() to path as JSON."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+            f.write("\n")
+
+
+_active: Optional[Metrics] = None
+
+
+def get_metrics() -> Optional[Metrics]:
+    """Return the active registry, or None when nothing is being measured."""
+    return _active
+
+
+@contextmanager
+def use_metrics(metrics: Metrics) -> Iterator[Metrics]:
+    """Make metrics the active registry for the enclosed block."""
+    global _active
+    previous = _active
+    _active = metrics
+    try:
+        yield metrics
+    finally:
+        _active = previous
+
+
+@contextmanager
+def timer(stage: str) -> Iterator[None]:
+    """Time the enclosed block into the active registry, if any."""
+    metrics = _active
+    if metrics is None:
+        yield
+        return
+    with metrics.timer(stage):
+        yield
+
+
+def count(name: str, n: int = 1, **labels: str) -> None:
+    """Add n to a counter of the active registry, if any."""
+    metrics = _active
+    if metrics is not None:
+        metrics.count(name, n, **labels)
@@ -0,0 +1,162 @@
+"""
+OpenMetrics endpoint for watching a long run from Prometheus or similar.
+
+Serves the live contents of a Metrics registry over HTTP from a background
+thread. Nothing runs unless a MetricsServer is started, so runs without
+--metrics-port pay nothing for it.
+"""
+
+import logging
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, List, Optional, Sequence
+from anki_tts.metrics import LATENCY_BUCKETS, Metrics
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+_INVALID_NAME_CHARS = re.compile(r"[^a-zA-Z0-9_]")
+
+
+def _metric_name(name: str, prefix: str) -> str:
+    return prefix + _INVALID_NAME_CHARS.sub("_", name)
+
+
+def _label_value(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs: Sequence) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{label}="{_label_value(value)}"' for label, value in pairs) + "}"
+
+
+def render_openmetrics(
+    metrics: Metrics,
+    prefix: str = "anki_tts_",
+    buckets: Sequence[float] = LATENCY_BUCKETS,
+) -> str:
+    """
+    Render a registry in the OpenMetrics text format.
+
+    Counters become `<prefix><name>_total` (labelled series keep their
+    labels), stage timings become one `<prefix>stage_seconds` histogram
+    labelled by stage, and in-flight blocks become the
+    `<prefix>in_flight` gauge.
+
+    Args:
+        metrics: The registry to render.
+        prefix: Prefix for every metric family name.
+        buckets: Ascending histogram bucket bounds in seconds, each one of
+            the LATENCY_BUCKETS the stage histograms count into.
+
+    Returns:
+        The exposition text, ending with "# EOF".
+    """
+    lines: List[str] = []
+
+    families = {}
+    for (name, labels), value in sorted(metrics.counters.copy().items()):
+        families.setdefault(name, []).append((labels, value))
+    for name, series in families.items():
+        family = _metric_name(name, prefix)
+        lines.append(f"# TYPE {family} counter")
+        for labels, value in series:
+            lines.append(f"{family}_total{_labels(labels)} {value}")
+
+    family = prefix + "stage_seconds"
+    lines.append(f"# TYPE {family} histogram")
+    lines.append(f"# UNIT {family} seconds")
+    for stage, histogram in sorted(metrics.stages.copy().items()):
+        counts, total, count = histogram.bucket_counts(buckets)
+        for bound, cumulative in zip(buckets, counts):
+            lines.append(f"{family}_bucket{_labels([('stage', stage), ('le', repr(float(bound)))])} {cumulative}")
+        lines.append(f"{family}_bucket{_labels([('stage', stage), ('le', '+Inf')])} {count}")
+        lines.append(f"{family}_sum{_labels([('stage', stage)])} {total}")
+        lines.append(f"{family}_count{_labels([('stage', stage)])} {count}")
+
+    family = prefix + "in_flight"
+    lines.append(f"# TYPE {family} gauge")
+    for stage, value in sorted(metrics.in_flight.copy().items()):
+        lines.append(f"{family}{_labels([('stage', stage)])} {value}")
+
+    family = prefix + "elapsed_seconds"
+    lines.append(f"# TYPE {family} gauge")
+    lines.append(f"{family} {metrics.elapsed}")
+
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """
+    Serve a Metrics registry at http://host:port/metrics on a daemon thread.
+
+    Usage:
+        with MetricsServer(metrics, port=9464):
+            run_jobs(..., metrics=metrics)
+    """
+
+    def __init__(self, metrics: Metrics, port: int, host: str = "127.0.0.1") -> None:
+        """
+        Args:
+            metrics: The registry to expose.
+            port: TCP port to listen on; 0 picks a free port.
+            host: Interface to bind to. The endpoint has no authentication
+                and its labels include deck names, so the default only
+                serves this machine; "0.0.0.0" serves every interface.
+        """
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def start(self) -> "MetricsServer":
+        """
+        Start listening.
+
+        Raises:
+            OSError: If the port cannot be bound.
+        """
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                payload = render_openmetrics(exporter.metrics).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics", daemon=True)
+        self._thread.start()
+        logging.info(f"Serving metrics at {self.url}")
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "MetricsServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
@@ -0,0 +1,152 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+from anki_tts.config import TTS_EXPECTED_LATENCY
+
+# Google TTS bills each voice family at its own rate. The family is part of
+# the voice name, e.g. "ja-JP-Wavenet-B" or "en-US-Neural2-C".
+_VOICE_TIERS = (
+    ("standard", "Standard"),
+    ("wavenet", "WaveNet"),
+    ("neural2", "Neural"),
+    ("news", "Neural"),
+    ("polyglot", "Neural"),
+    ("studio", "Studio"),
+    ("chirp", "Chirp HD"),
+    ("journey", "Chirp HD"),
+)
+
+
+def voice_tier(voice_name: str) -> str:
+    """Return the pricing tier of a Google TTS voice, e.g. "WaveNet", or "Other"."""
+    lowered = voice_name.lower()
+    for marker, tier in _VOICE_TIERS:
+        if marker in lowered:
+            return tier
+    return "Other"
+
+
+def _format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(round(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02}:{seconds:02}"
+
+
+@dataclass
+class RunPlan:
+    """
+    What a run would do, gathered by plan_deck() without synthesizing or
+    writing anything.
+
+    Only billed synthesis counts toward characters, requests and the
+    estimate. Several decks can be planned into the same RunPlan; a text
+    counted for one deck is then served from the cache for the others, as in
+    run_jobs().
+    """
+
+    notes_found: int = 0
+    notes_eligible: int = 0
+    notes_skipped: int = 0
+    # Eligible notes whose text is too long for the backend and cannot be
+    # split, so the run would fail them.
+    notes_too_long: int = 0
+    unique_texts: int = 0
+    cache_hits: int = 0
+    tts_requests: int = 0
+    characters_by_tier: Dict[str, int] = field(default_factory=dict)
+    _keys: Set[str] = field(default_factory=set, repr=False)
+
+    @property
+    def characters_billed(self) -> int:
+        """Characters that would be billed, over all tiers."""
+        return sum(self.characters_by_tier.values())
+
+    @property
+    def texts_to_synthesize(self) -> int:
+        """Unique texts that are not cached yet."""
+        return self.unique_texts - self.cache_hits
+
+    def add_text(self, key: str, text: str, tier: Optional[str], cached: bool, requests: int = 1) -> None:
+        """
+        Count a text a note would need, unless one with the same key was counted.
+
+        Args:
+            key: The text's cache key.
+            text: The text that would be synthesized.
+            tier: voice_tier() of the voice it would be synthesized with, or
+                None if the backend does not bill (e.g. a local engine).
+            cached: Whether the audio cache already holds key.
+            requests: Billed requests the text needs (see split_text()).
+        """
+        if key in self._keys:
+            return
+        self._keys.add(key)
+        self.unique_texts += 1
+        if cached:
+            self.cache_hits += 1
+            return
+        if tier is None:
+            return
+        self.characters_by_tier[tier] = self.characters_by_tier.get(tier, 0) + len(text)
+        self.tts_requests += requests
+
+    def eta_seconds(
+        self,
+        concurrency: int,
+        requests_per_minute: Optional[float] = None,
+        characters_per_minute: Optional[float] = None,
+        latency: float = TTS_EXPECTED_LATENCY,
+    ) -> float:
+        """
+        Estimate how long the billed synthesis of the planned texts takes.
+
+        The run is assumed to be bound by whichever is slowest: concurrency
+        requests of latency seconds each, or the request and character quotas.
+        Uploads overlap synthesis and are not counted.
+
+        Args:
+            concurrency: Requests in flight at once (--workers). Must be >= 1.
+            requests_per_minute: Request quota, or None for unlimited.
+            characters_per_minute: Character quota, or None for unlimited.
+            latency: Seconds per request (default: TTS_EXPECTED_LATENCY).
+
+        Returns:
+            The estimated duration in seconds.
+
+        Raises:
+            ValueError: If concurrency is less than 1.
+        """
+        if concurrency < 1:
+            raise ValueError(f"concurrency must be >= 1, got {concurrency}")
+        bounds = [self.tts_requests * latency / concurrency]
+        if requests_per_minute:
+            bounds.append(self.tts_requests * 60 / requests_per_minute)
+        if characters_per_minute:
+            bounds.append(self.characters_billed * 60 / characters_per_minute)
+        return max(bounds)
+
+    def format_table(
+        self,
+        concurrency: int,
+        requests_per_minute: Optional[float] = None,
+        characters_per_minute: Optional[float] = None,
+        latency: float = TTS_EXPECTED_LATENCY,
+    ) -> List[str]:
+        """Return the plan as lines of a plain-text report; arguments as for eta_seconds()."""
+        lines = [
+            f"{'Notes found':<22}{self.notes_found:>10}",
+            f"{'Notes needing audio':<22}{self.notes_eligible:>10}",
+            f"{'Notes skipped':<22}{self.notes_skipped:>10}",
+        ]
+        if self.notes_too_long:
+            lines.append(f"{'Notes too long':<22}{self.notes_too_long:>10}")
+        lines += [
+            f"{'Unique texts':<22}{self.unique_texts:>10}",
+            f"{'Cache hits':<22}{self.cache_hits:>10}",
+            f"{'Texts to synthesize':<22}{self.texts_to_synthesize:>10}",
+            f"{'TTS requests':<22}{self.tts_requests:>10}",
+        ]
+        for tier, characters in sorted(self.characters_by_tier.items()):
+            lines.append(f"{f'{tier} characters':<22}{characters:>10}")
+        eta = self.eta_seconds(concurrency, requests_per_minute, characters_per_minute, latency)
+        lines.append(f"{'Estimated time':<22}{_format_duration(eta):>10}")
+        return lines
@@ -0,0 +1,310 @@
+import io
+import math
+import multiprocessing
+import shlex
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import wave
+from array import array
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from anki_tts import metrics
+from anki_tts.config import OPUS_TRANSCODE_COMMAND, POSTPROCESS_LOUDNESS_DBFS, POSTPROCESS_SILENCE_DBFS
+
+# Audio kept before the first and after the last loud sample when trimming,
+# so word onsets and endings are not clipped.
+_TRIM_PADDING_SECONDS = 0.05
+_FULL_SCALE = 32767
+
+
+def _read_pcm16(audio: bytes) -> Tuple[Any, memoryview]:
+    """Return the WAV parameters of audio and its samples as signed 16-bit ints."""
+    with wave.open(io.BytesIO(audio), "rb") as reader:
+        params = reader.getparams()
+        frames = reader.readframes(params.nframes)
+    if params.sampwidth != 2:
+        raise ValueError(f"Only 16-bit PCM WAV audio is supported, got {params.sampwidth * 8}-bit")
+    if sys.byteorder == "little":
+        return params, memoryview(frames).cast("h")
+    samples = array("h", frames)
+    samples.byteswap()
+    return params, memoryview(samples)
+
+
+def _write_pcm16(params: Any, samples: memoryview) -> bytes:
+    """Return samples as a WAV file with params."""
+    if sys.byteorder != "little":
+        swapped = array("h", samples)
+        swapped.byteswap()
+        samples = memoryview(swapped)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as writer:
+        writer.setparams(params)
+        writer.writeframes(samples.cast("B"))
+    return buffer.getvalue()
+
+
+def trim_silence(audio: bytes) -> bytes:
+    """Cut audio quieter than POSTPROCESS_SILENCE_DBFS from both ends of a 16-bit WAV clip."""
+    params, samples = _read_pcm16(audio)
+    threshold = _FULL_SCALE * 10 ** (POSTPROCESS_SILENCE_DBFS / 20)
+    first = next((i for i, sample in enumerate(samples) if abs(sample) > threshold), None)
+    if first is None:
+        return audio  # all silence; leave it for the listener to notice
+    last = next(i for i in range(len(samples) - 1, -1, -1) if abs(samples[i]) > threshold)
+    padding = int(_TRIM_PADDING_SECONDS * params.framerate) * params.nchannels
+    # Cut on frame boundaries so channels stay interleaved.
+    start = max(0, first - padding) // params.nchannels * params.nchannels
+    end = min(len(samples), (last // params.nchannels + 1) * params.nchannels + padding)
+    if start == 0 and end == len(samples):
+        return audio
+    return _write_pcm16(params, samples[start:end])
+
+
+def normalize_loudness(audio: bytes) -> bytes:
+    """
+    Scale a 16-bit WAV clip to an RMS level of POSTPROCESS_LOUDNESS_DBFS.
+
+    RMS is a simple stand-in for perceived loudness, good enough to even out
+    clips from the same voice. The gain is capped so peaks do not clip.
+    """
+    params, samples = _read_pcm16(audio)
+    if not samples:
+        return audio
+    peak = max(abs(min(samples)), max(samples))
+    rms = math.sqrt(sum(sample * sample for sample in samples) / len(samples))
+    if rms == 0:
+        return audio
+    gain = min(_FULL_SCALE * 10 ** (POSTPROCESS_LOUDNESS_DBFS / 20) / rms, _FULL_SCALE / peak)
+    scaled = array("h", [round(sample * gain) for sample in samples])
+    return _write_pcm16(params, memoryview(scaled))
+
+
+def transcode_opus(audio: bytes) -> bytes:
+    """
+    Re-encode audio as Ogg Opus with OPUS_TRANSCODE_COMMAND.
+
+    Raises:
+        RuntimeError: If the command fails or writes nothing.
+    """
+    command = shlex.split(OPUS_TRANSCODE_COMMAND)
+    result = subprocess.run(command, input=audio, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        stderr = result.stderr.decode("utf-8", errors="replace").strip()
+        raise RuntimeError(f"{command[0]} exited with status {result.returncode}: {stderr[:200]}")
+    if not result.stdout:
+        raise RuntimeError(f"{command[0]} produced no audio")
+    return result.stdout
+
+
+@dataclass(frozen=True)
+class PostProcessingStep:
+    """A post-processing function and the audio formats it reads and writes."""
+
+    run: Callable[[bytes], bytes]
+    # Format the step needs, or None if it reads any format.
+    accepts: Optional[str] = None
+    # Format the step writes, or None if it keeps the input format.
+    produces: Optional[str] = None
+
+
+POSTPROCESSING_STEPS: Dict[str, PostProcessingStep] = {
+    "trim": PostProcessingStep(trim_silence, accepts="wav"),
+    "normalize": PostProcessingStep(normalize_loudness, accepts="wav"),
+    "opus": PostProcessingStep(transcode_opus, produces="ogg"),
+}
+
+
+def _run_steps(steps: Tuple[str, ...], audio: bytes) -> Tuple[bytes, List[Tuple[str, float, int]]]:
+    """
+    Apply steps to audio in a worker process.
+
+    All steps run in one call, so a clip crosses the process boundary only
+    once each way.
+
+    Returns:
+        The processed audio, and (step, seconds, input bytes) for each step.
+    """
+    timings = []
+    for name in steps:
+        start = time.perf_counter()
+        size = len(audio)
+        audio = POSTPROCESSING_STEPS[name].run(audio)
+        timings.append((name, time.perf_counter() - start, size))
+    return audio, timings
+
+
+def _copy_outcome(source: Future, target: Future) -> None:
+    """Resolve target with the outcome of the finished source, unless target was cancelled."""
+    if source.cancelled():
+        target.cancel()
+        return
+    if not target.set_running_or_notify_cancel():
+        return
+    error = source.exception()
+    if error is not None:
+        target.set_exception(error)
+    else:
+        target.set_result(source.result())
+
+
+def _cancel_with(target: Future, source: Future) -> None:
+    """Cancel source when target is cancelled, so abandoned work is not started."""
+    target.add_done_callback(lambda done: source.cancel() if done.cancelled() else None)
+
+
+class AudioPostProcessor:
+    """
+    Run CPU-bound post-processing of synthesized audio in worker processes.
+
+    Steps from POSTPROCESSING_STEPS are applied in order, each clip in one
+    worker process, so trimming, loudness normalization and transcoding run
+    on all cores instead of competing with the synthesis and upload threads
+    for the GIL. Clips travel to the workers as plain bytes, and the WAV steps
+    work on memoryviews of the samples rather than copies.
+    The pool is started on the first clip, so runs served entirely from the
+    cache never start it.
+
+    Every step is timed as stage "post_<step>" in the active Metrics
+    registry, with its input counted in the "postprocess_bytes" counter
+    labelled by step; the whole round trip, including the transfer to and
+    from the worker, is timed as stage "postprocess".
+
+    Usage:
+        with AudioPostProcessor(["trim", "normalize", "opus"]) as postprocessor:
+            audio = postprocessor.process(wav_audio)
+    """
+
+    def __init__(self, steps: Sequence[str], processes: Optional[int] = None) -> None:
+        """
+        Args:
+            steps: Step names from POSTPROCESSING_STEPS, applied in order.
+            processes: Worker processes. Must be >= 1. Default None uses
+                os.cpu_count().
+
+        Raises:
+            ValueError: If steps is empty, a step name is unknown, or
+                processes is less than 1.
+            FileNotFoundError: If the "opus" step's transcoder cannot be found.
+        """
+        if not steps:
+            raise ValueError("steps must not be empty")
+        for step in steps:
+            if step not in POSTPROCESSING_STEPS:
+                raise ValueError(f"Unknown post-processing step '{step}'; choose from {', '.join(POSTPROCESSING_STEPS)}")
+        if processes is not None and processes < 1:
+            raise ValueError(f"processes must be >= 1, got {processes}")
+        if "opus" in steps:
+            transcoder = shlex.split(OPUS_TRANSCODE_COMMAND)[0]
+            if shutil.which(transcoder) is None:
+                raise FileNotFoundError(f"Transcoder not found: {transcoder}")
+        self.steps = tuple(steps)
+        self.processes = processes
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def output_format(self, audio_format: str) -> str:
+        """
+        Return the format of processed audio given input in audio_format.
+
+        Raises:
+            ValueError: If a step cannot read the format it would receive.
+        """
+        for name in self.steps:
+            step = POSTPROCESSING_STEPS[name]
+            if step.accepts is not None and step.accepts != audio_format:
+                raise ValueError(f"Post-processing step '{name}' needs {step.accepts} audio, got {audio_format}")
+            audio_format = step.produces or audio_format
+        return audio_format
+
+    def cache_key_params(self) -> Tuple[str, ...]:
+        """Return everything that determines the output, for cache keys."""
+        params = ["postprocess", *self.steps]
+        if "trim" in self.steps:
+            params.append(f"silence={POSTPROCESS_SILENCE_DBFS:g}")
+        if "normalize" in self.steps:
+            params.append(f"loudness={POSTPROCESS_LOUDNESS_DBFS:g}")
+        if "opus" in self.steps:
+            params.append(OPUS_TRANSCODE_COMMAND)
+        return tuple(params)
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # Spawned rather than forked: the parent runs threads, and a
+                # fork could copy a lock some other thread holds.
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.processes, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._pool
+
+    def submit(self, audio: bytes) -> Future:
+        """Start processing audio and return a Future of the result."""
+        registry = metrics.get_metrics()
+        start = time.perf_counter()
+        result: Future = Future()
+
+        def finish(done: Future) -> None:
+            if done.cancelled():
+                result.cancel()
+                return
+            if not result.set_running_or_notify_cancel():
+                return
+            try:
+                audio_data, timings = done.result()
+            except BaseException as e:
+                result.set_exception(e)
+                return
+            if registry is not None:
+                registry.observe("postprocess", time.perf_counter() - start)
+                for name, seconds, size in timings:
+                    registry.observe(f"post_{name}", seconds)
+                    registry.count("postprocess_bytes", size, stage=name)
+            result.set_result(audio_data)
+
+        processing = self._get_pool().submit(_run_steps, self.steps, audio)
+        processing.add_done_callback(finish)
+        _cancel_with(result, processing)
+        return result
+
+    def process(self, audio: bytes) -> bytes:
+        """Process audio and return the result, blocking until it is ready."""
+        return self.submit(audio).result()
+
+    def process_after(self, future: Future) -> Future:
+        """
+        Return a Future of future's audio once processed, failing if future fails.
+
+        Cancelling the returned Future cancels future, or the processing of
+        its audio if future has already finished.
+        """
+        result: Future = Future()
+
+        def chain(done: Future) -> None:
+            if done.cancelled() or done.exception() is not None or result.done():
+                _copy_outcome(done, result)
+                return
+            processed = self.submit(done.result())
+            _cancel_with(result, processed)
+            processed.add_done_callback(lambda processed: _copy_outcome(processed, result))
+
+        future.add_done_callback(chain)
+        _cancel_with(result, future)
+        return result
+
+    def close(self) -> None:
+        """Stop the worker processes, waiting for clips being processed."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
+
+    def __enter__(self) -> "AudioPostProcessor":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,284 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+def is_quota_error(exc: BaseException) -> bool:
+    """
+    Return True if exc means a quota or rate limit was hit.
+
+    Recognizes google.api_core ResourceExhausted/TooManyRequests (HTTP 429),
+    raw gRPC RESOURCE_EXHAUSTED errors and HTTP 429 responses from requests,
+    without importing any of those libraries.
+    """
+    code = getattr(exc, "code", None)
+    if code == 429:
+        return True
+    if callable(code):
+        try:
+            return getattr(code(), "name", None) == "RESOURCE_EXHAUSTED"
+        except Exception:
+            return False
+    response = getattr(exc, "response", None)
+    return getattr(response, "status_code", None) == 429
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled at a per-minute rate.
+
+    Requests larger than the bucket are let through once it is full and leave
+    it in debt, so oversized inputs are slowed down rather than blocked forever.
+    """
+
+    def __init__(
+        self,
+        rate_per_minute: float,
+        burst_seconds: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        """
+        Args:
+            rate_per_minute: Tokens added per minute. Must be > 0.
+            burst_seconds: Bucket capacity expressed as seconds of refill, i.e.
+                how much unused quota can be saved up for a burst.
+            clock: Monotonic time source, replaceable in tests.
+            sleep: Sleep function, replaceable in tests.
+
+        Raises:
+            ValueError: If rate_per_minute is not positive.
+        """
+        if rate_per_minute <= 0:
+            raise ValueError(f"rate_per_minute must be > 0, got {rate_per_minute}")
+        self.base_rate = rate_per_minute / 60.0
+        self.rate = self.base_rate  # tokens per second; lowered by backoff
+        self.capacity = max(1.0, self.base_rate * burst_seconds)
+        self._tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        """Block until tokens are available, then take them."""
+        while True:
+            with self._lock:
+                self._refill()
+                needed = min(tokens, self.capacity)
+                if self._tokens >= needed:
+                    self._tokens -= tokens
+                    return
+                wait = (needed - self._tokens) / self.rate
+            self._sleep(wait)
+
+    def scale(self, fraction: float) -> None:
+        """Set the refill rate to a fraction of the configured rate."""
+        with self._lock:
+            self._refill()
+            self.rate = self.base_rate * fraction
+
+
+class QuotaLimiter:
+    """
+    Client-side limiter for Google TTS requests/min and characters/min quotas.
+
+    Each call first waits for both token buckets and for a concurrency slot.
+    The limiter adapts with AIMD (additive increase, multiplicative decrease):
+    a quota error (RESOURCE_EXHAUSTED / HTTP 429) halves the allowed rates and
+    concurrency and the call is retried after a cool-down instead of failing,
+    while successes grow them back step by step up to the configured maximum.
+    This keeps sustained throughput close to the real quota ceiling.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        characters_per_minute: Optional[float] = None,
+        max_concurrency: int = 1,
+        max_throttle_retries: int = 8,
+        min_fraction: float = 0.05,
+        increase_step: float = 0.05,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        """
+        Args:
+            requests_per_minute: Request quota; None means unlimited.
+            characters_per_minute: Character quota; None means unlimited.
+            max_concurrency: Upper bound for the adaptive concurrency limit.
+                Must be >= 1.
+            max_throttle_retries: How many times one call is retried after
+                quota errors before the error is raised.
+            min_fraction: Lowest fraction of the configured rates backoff
+                can drop to.
+            increase_step: Fraction of the configured rates regained after
+                each success.
+            clock: Monotonic time source, replaceable in tests.
+            sleep: Sleep function, replaceable in tests.
+
+        Raises:
+            ValueError: If max_concurrency is less than 1.
+        """
+        if max_concurrency < 1:
+            raise ValueError(f"max_concurrency must be >= 1, got {max_concurrency}")
+        self.request_bucket = TokenBucket(requests_per_minute, clock=clock, sleep=sleep) if requests_per_minute else None
+        self.character_bucket = TokenBucket(characters_per_minute, clock=clock, sleep=sleep) if characters_per_minute else None
+        self.max_concurrency = max_concurrency
+        self.concurrency_limit = max_concurrency
+        self.max_throttle_retries = max_throttle_retries
+        self.min_fraction = min_fraction
+        self.increase_step = increase_step
+        self.rate_fraction = 1.0
+        self.throttled = 0
+        self._sleep = sleep
+        self._in_flight = 0
+        self._successes_since_increase = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, characters: int, requests: int = 1) -> None:
+        """Block until requests totalling this many characters may be sent."""
+        with self._condition:
+            while self._in_flight >= self.concurrency_limit:
+                self._condition.wait()
+            self._in_flight += 1
+        if self.request_bucket is not None:
+            self.request_bucket.acquire(requests)
+        if self.character_bucket is not None:
+            self.character_bucket.acquire(characters)
+
+    def release(self, throttled: bool = False, failed: bool = False) -> None:
+        """
+        Release a slot taken by acquire() and adapt to the outcome.
+
+        Args:
+            throttled: The request hit a quota; back off.
+            failed: The request failed for another reason; release the slot
+                without adapting either way.
+        """
+        with self._condition:
+            self._in_flight -= 1
+            if throttled:
+                self.throttled += 1
+                self.concurrency_limit = max(1, self.concurrency_limit // 2)
+                self._successes_since_increase = 0
+                self._set_rate_fraction(max(self.min_fraction, self.rate_fraction / 2))
+            elif not failed:
+                self._successes_since_increase += 1
+                # Grow concurrency by one per "round" of successful requests.
+                if self._successes_since_increase >= self.concurrency_limit:
+                    self._successes_since_increase = 0
+                    self.concurrency_limit = min(self.max_concurrency, self.concurrency_limit + 1)
+                if self.rate_fraction < 1.0:
+                    self._set_rate_fraction(min(1.0, self.rate_fraction + self.increase_step))
+            self._condition.notify_all()
+
+    def cooldown(self, attempt: int) -> float:
+        """Seconds to wait before retrying a throttled call (attempt starts at 0)."""
+        return min(60.0, 2.0 ** attempt)
+
+    def call(self, fn: Callable[[], T], characters: int, requests: int = 1) -> T:
+        """
+        Run fn under the limiter, retrying it after quota errors.
+
+        Args:
+            fn: The request to make.
+            characters: Billed characters in the request.
+            requests: API requests fn makes, e.g. for a text split into
+                several pieces.
+
+        Returns:
+            fn's result.
+
+        Raises:
+            Exception: fn's error if it is not a quota error, or a quota error
+                that persisted through max_throttle_retries retries.
+        """
+        attempt = 0
+        while True:
+            self.acquire(characters, requests)
+            try:
+                result = fn()
+            except Exception as e:
+                throttled = is_quota_error(e)
+                self.release(throttled, failed=True)
+                if not throttled or attempt >= self.max_throttle_retries:
+                    raise
+                self._log_throttle(e, attempt)
+                self._sleep(self.cooldown(attempt))
+                attempt += 1
+                continue
+            self.release()
+            return result
+
+    async def acall(self, fn: Callable[[], Awaitable[T]], characters: int, requests: int = 1) -> T:
+        """Async counterpart of call(); waits for the limiter off the event loop."""
+        attempt = 0
+        while True:
+            await self._acquire_off_loop(characters, requests)
+            try:
+                result = await fn()
+            except Exception as e:
+                throttled = is_quota_error(e)
+                self.release(throttled, failed=True)
+                if not throttled or attempt >= self.max_throttle_retries:
+                    raise
+                self._log_throttle(e, attempt)
+                await asyncio.sleep(self.cooldown(attempt))
+                attempt += 1
+                continue
+            except BaseException:
+                # Cancelled mid-request; the slot is still ours to give back.
+                self.release(failed=True)
+                raise
+            self.release()
+            return result
+
+    async def _acquire_off_loop(self, characters: int, requests: int) -> None:
+        """
+        acquire() on a worker thread, releasing the slot if the caller is cancelled.
+
+        Cancelling the await does not stop the thread, which may still take
+        the slot afterwards; it then gives it straight back.
+        """
+        lock = threading.Lock()
+        state = {"acquired": False, "abandoned": False}
+
+        def acquire() -> None:
+            self.acquire(characters, requests)
+            with lock:
+                if not state["abandoned"]:
+                    state["acquired"] = True
+                    return
+            self.release(failed=True)
+
+        try:
+            await asyncio.to_thread(acquire)
+        except BaseException:
+            with lock:
+                state["abandoned"] = True
+                acquired = state["acquired"]
+            if acquired:
+                self.release(failed=True)
+            raise
+
+    def _set_rate_fraction(self, fraction: float) -> None:
+        self.rate_fraction = fraction
+        for bucket in (self.request_bucket, self.character_bucket):
+            if bucket is not None:
+                bucket.scale(fraction)
+
+    def _log_throttle(self, exc: BaseException, attempt: int) -> None:
+        logging.warning(
+            f"Quota exceeded, backing off {self.cooldown(attempt):.0f}s "
+            f"(concurrency {self.concurrency_limit}, rate {self.rate_fraction:.0%}): {exc}"
+        )
@@ -0,0 +1,216 @@
+import asyncio
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter
+from typing import Awaitable, Callable, Dict, List, Optional, TypeVar
+from anki_tts import metrics
+from anki_tts.config import RETRY_MAX_ATTEMPTS, RETRY_TIME_BUDGET
+
+T = TypeVar("T")
+
+# gRPC status names and HTTP status codes worth retrying, by category.
+_GRPC_CATEGORIES = {
+    "UNAVAILABLE": "unavailable",
+    "DEADLINE_EXCEEDED": "deadline",
+    "INTERNAL": "server_error",
+    "ABORTED": "unavailable",
+}
+_HTTP_CATEGORIES = {
+    500: "server_error",
+    502: "unavailable",
+    503: "unavailable",
+    504: "deadline",
+}
+# AnkiConnect errors raised while Anki is momentarily busy (syncing, a modal
+# dialog open, the collection being reloaded). Anything else it reports, such
+# as a missing note or field, is permanent.
+_ANKI_BUSY = re.compile(r"collection is not available|database is locked|busy", re.IGNORECASE)
+
+
+def classify_error(exc: BaseException) -> Optional[str]:
+    """
+    Return the retry category of a transient error, or None if it is fatal.
+
+    Categories are "unavailable", "deadline", "server_error", "connection"
+    and "anki_busy". Quota errors are deliberately fatal here: QuotaLimiter
+    handles those with its own backoff.
+    """
+    code = getattr(exc, "code", None)
+    if callable(code):  # raw grpc.RpcError
+        try:
+            return _GRPC_CATEGORIES.get(getattr(code(), "name", None))
+        except Exception:
+            return None
+    if isinstance(code, int):  # google.api_core.exceptions.GoogleAPICallError
+        return _HTTP_CATEGORIES.get(code)
+
+    # Match requests' exception classes by name so this module does not need
+    # to import it; the builtins share the names.
+    names = {cls.__name__ for cls in type(exc).__mro__}
+    if names & {"TimeoutError", "Timeout"}:
+        return "deadline"
+    if names & {"ConnectionError", "ChunkedEncodingError"}:
+        return "connection"
+    response = getattr(exc, "response", None)
+    status = getattr(response, "status_code", None)
+    if status in _HTTP_CATEGORIES:
+        return _HTTP_CATEGORIES[status]
+    if isinstance(exc, RuntimeError) and str(exc).startswith("AnkiConnect error:") and _ANKI_BUSY.search(str(exc)):
+        return "anki_busy"
+    return None
+
+
+class RetryPolicy:
+    """
+    Retry transient errors with capped exponential backoff and full jitter.
+
+    A call is retried while its error classifies as retryable, it has attempts
+    left, and the next wait still fits in the total time budget. Retries are
+    counted per category in `counts`. The policy is safe to share between
+    threads.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = RETRY_MAX_ATTEMPTS,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        time_budget: float = RETRY_TIME_BUDGET,
+        classify: Callable[[BaseException], Optional[str]] = classify_error,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+        rng: Callable[[], float] = random.random,
+    ) -> None:
+        """
+        Args:
+            max_attempts: Total attempts per call, including the first.
+                Must be >= 1; 1 disables retries.
+            base_delay: Backoff ceiling in seconds before the first retry;
+                doubles with every further retry.
+            max_delay: Cap on the backoff ceiling in seconds.
+            time_budget: Seconds after the first attempt beyond which no
+                further retry is started.
+            classify: Maps an exception to a retry category, or None if the
+                error should not be retried.
+            clock: Monotonic time source, replaceable in tests.
+            sleep: Sleep function, replaceable in tests.
+            rng: Uniform [0, 1) random source for jitter, replaceable in tests.
+
+        Raises:
+            ValueError: If max_attempts is less than 1.
+        """
+        if max_attempts < 1:
+            raise ValueError(f"max_attempts must be >= 1, got {max_attempts}")
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.time_budget = time_budget
+        self.classify = classify
+        self.counts: Counter = Counter()
+        self._clock = clock
+        self._sleep = sleep
+        self._rng = rng
+        self._lock = threading.Lock()
+
+    def delay(self, retry: int) -> float:
+        """Seconds to wait before the given retry (0-based), with full jitter."""
+        return self._rng() * min(self.max_delay, self.base_delay * 2 ** retry)
+
+    def _next_delay(self, exc: Exception, attempt: int, started: float) -> Optional[float]:
+        """Return how long to wait before retrying exc, or None to give up."""
+        category = self.classify(exc)
+        if category is None or attempt + 1 >= self.max_attempts:
+            return None
+        delay = self.delay(attempt)
+        if self._clock() - started + delay > self.time_budget:
+            return None
+        with self._lock:
+            self.counts[category] += 1
+        metrics.count("retries", category=category)
+        logging.warning(f"Retrying after {category} error in {delay:.1f}s (attempt {attempt + 2}/{self.max_attempts}): {exc}")
+        return delay
+
+    def call(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """
+        Call fn(*args, **kwargs), retrying transient errors.
+
+        Returns:
+            fn's result.
+
+        Raises:
+            Exception: The last error once it is fatal or retries run out.
+        """
+        started = self._clock()
+        attempt = 0
+        while True:
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                delay = self._next_delay(e, attempt, started)
+                if delay is None:
+                    raise
+            self._sleep(delay)
+            attempt += 1
+
+    def call_each(
+        self, fn: Callable[[List[int]], List[Optional[Exception]]], count: int
+    ) -> List[Optional[Exception]]:
+        """
+        Run fn over items 0..count-1, retrying only the items that fail transiently.
+
+        For batch calls that report one error per item, such as AnkiConnect's
+        `multi`: fn gets the indices still to do and returns an error (or
+        None) for each. Items whose error is retryable are sent again
+        together after one backoff, within the attempts and time budget of
+        call(); successes and fatal errors are final. Each retry round counts
+        as one retry.
+
+        Returns:
+            The last error (or None) of every item, in order.
+
+        Raises:
+            Exception: Whatever fn itself raises.
+        """
+        errors: List[Optional[Exception]] = [None] * count
+        pending = list(range(count))
+        started = self._clock()
+        attempt = 0
+        while pending:
+            for i, error in zip(pending, fn(pending)):
+                errors[i] = error
+            pending = [i for i in pending if errors[i] is not None and self.classify(errors[i]) is not None]
+            if not pending:
+                break
+            delay = self._next_delay(errors[pending[0]], attempt, started)
+            if delay is None:
+                break
+            self._sleep(delay)
+            attempt += 1
+        return errors
+
+    async def acall(self, fn: Callable[[], Awaitable[T]]) -> T:
+        """Async counterpart of call() for a coroutine factory."""
+        started = self._clock()
+        attempt = 0
+        while True:
+            try:
+                return await fn()
+            except Exception as e:
+                delay = self._next_delay(e, attempt, started)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def snapshot(self) -> Dict[str, int]:
+        """Return a copy of the per-category retry counts."""
+        with self._lock:
+            return dict(self.counts)
+
+
+def format_retry_counts(counts: Dict[str, int]) -> str:
+    """Return counts as "category=n, ..." sorted by category, or "none"."""
+    return ", ".join(f"{category}={n}" for category, n in sorted(counts.items()) if n) or "none"
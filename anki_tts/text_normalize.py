@@ -0,0 +1,119 @@
+import html
+import re
+from functools import lru_cache
+from typing import Callable, Dict, Sequence, Union
+
+# Anki media references: [sound:file.mp3]
+_SOUND_TAG = re.compile(r"\[sound:[^\]]*\]")
+# Cloze deletions: {{c1::answer}} or {{c1::answer::hint}}
+_CLOZE = re.compile(r"\{\{c\d+::(.*?)(?:::.*?)?\}\}", re.DOTALL)
+# Elements whose content is never spoken.
+_HIDDEN_ELEMENT = re.compile(r"<(script|style)\b.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+# Tags that separate lines or blocks; replaced by a newline so sentences on
+# either side are not run together.
+_BLOCK_TAG = re.compile(r"<(?:br|/?(?:div|p|li|ul|ol|tr|h[1-6]))\b[^>]*>", re.IGNORECASE)
+_TAG = re.compile(r"<[^>]*>")
+# Anki furigana: "漢字[かんじ]", optionally preceded by a space marking where
+# the base text starts, as in " 今日[きょう]は". Without a space the base is
+# the run of kanji right before the bracket.
+_FURIGANA = re.compile(
+    r"(?: ([^ <>\[\]]+?)|([々〆ヵヶ\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+))\[([^\[\]]+)\]"
+)
+_INLINE_SPACE = re.compile(r"[^\S\n]+")
+_BLANK_LINES = re.compile(r"\s*\n\s*")
+
+
+def strip_sound_tags(text: str) -> str:
+    """Remove [sound:...] references."""
+    return _SOUND_TAG.sub("", text)
+
+
+def resolve_cloze(text: str) -> str:
+    """Replace cloze deletions with their answers, dropping hints."""
+    return _CLOZE.sub(r"\1", text)
+
+
+def strip_html(text: str) -> str:
+    """Remove HTML tags, turning line and block breaks into newlines."""
+    text = _HIDDEN_ELEMENT.sub("", text)
+    text = _BLOCK_TAG.sub("\n", text)
+    return _TAG.sub("", text)
+
+
+def unescape_entities(text: str) -> str:
+    """Decode HTML entities such as &amp; and &nbsp; (as a plain space)."""
+    return html.unescape(text).replace("\xa0", " ")
+
+
+def strip_furigana(text: str) -> str:
+    """Keep the base text of furigana annotations: " 漢字[かんじ]" -> "漢字"."""
+    return _FURIGANA.sub(lambda m: m.group(1) or m.group(2), text)
+
+
+def furigana_to_reading(text: str) -> str:
+    """Replace furigana annotations by their reading: " 漢字[かんじ]" -> "かんじ"."""
+    return _FURIGANA.sub(lambda m: m.group(3), text)
+
+
+def collapse_whitespace(text: str) -> str:
+    """Collapse runs of spaces, keep single line breaks, and trim the ends."""
+    return _BLANK_LINES.sub("\n", _INLINE_SPACE.sub(" ", text)).strip()
+
+
+NORMALIZATION_STEPS: Dict[str, Callable[[str], str]] = {
+    "sound": strip_sound_tags,
+    "cloze": resolve_cloze,
+    "html": strip_html,
+    "entities": unescape_entities,
+    "furigana": strip_furigana,
+    "furigana-reading": furigana_to_reading,
+    "whitespace": collapse_whitespace,
+}
+DEFAULT_STEPS = ("sound", "cloze", "html", "entities", "furigana", "whitespace")
+
+
+class TextNormalizer:
+    """
+    Turn an Anki field value into the plain text that should be spoken.
+
+    Applies a sequence of steps in order and memoizes the results, since
+    decks often repeat the same field values. The normalized text is what
+    gets synthesized and hashed for the audio cache, so the same sentence
+    with different markup shares one synthesis.
+
+    Usage:
+        normalize = TextNormalizer(["sound", "cloze", "html", "entities", "furigana-reading", "whitespace"])
+        normalize("<b> 漢字[かんじ]</b>&nbsp;")  # -> "かんじ"
+    """
+
+    def __init__(
+        self,
+        steps: Sequence[Union[str, Callable[[str], str]]] = DEFAULT_STEPS,
+        memo_size: int = 4096,
+    ) -> None:
+        """
+        Args:
+            steps: Step names from NORMALIZATION_STEPS, or callables taking
+                and returning a string, applied in order.
+            memo_size: Number of recent results remembered.
+
+        Raises:
+            ValueError: If a step name is unknown.
+        """
+        self.steps = []
+        for step in steps:
+            if callable(step):
+                self.steps.append(step)
+            elif step in NORMALIZATION_STEPS:
+                self.steps.append(NORMALIZATION_STEPS[step])
+            else:
+                raise ValueError(f"Unknown normalization step '{step}'; choose from {', '.join(NORMALIZATION_STEPS)}")
+        self._normalize = lru_cache(maxsize=memo_size)(self._apply)
+
+    def _apply(self, text: str) -> str:
+        for step in self.steps:
+            text = step(text)
+        return text
+
+    def __call__(self, text: str) -> str:
+        return self._normalize(text)
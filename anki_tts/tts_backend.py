@@ -0,0 +1,199 @@
+import hashlib
+import logging
+import os
+import re
+import shlex
+import shutil
+import subprocess
+import tempfile
+import threading
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Protocol, Sequence, Tuple, Union
+from anki_tts import metrics
+
+
+@dataclass(frozen=True)
+class BackendCapabilities:
+    """What a TTS backend produces and how its work should be scheduled."""
+
+    # Short name used in logs and cache keys, e.g. "google" or "local".
+    name: str
+    # File extension of the audio it returns, e.g. "mp3" or "wav".
+    audio_format: str
+    # Longest text in UTF-8 bytes one request accepts; longer texts are split.
+    # None means no limit.
+    max_input_bytes: Optional[int] = None
+    # Whether longer texts can be split at all; if not, they cannot be
+    # synthesized.
+    splits_long_texts: bool = True
+    # Whether characters are billed, so requests go through the quota limiter.
+    billed: bool = False
+    # Syntheses that can usefully run at once, or None if only bounded by
+    # the caller's workers (e.g. a network API).
+    concurrency: Optional[int] = None
+
+
+class TTSBackend(Protocol):
+    """
+    A text-to-speech engine process_deck() can synthesize with.
+
+    GoogleTTSBackend (in gcloud_tts) calls Google Cloud; SubprocessBackend
+    runs a local engine such as espeak-ng or Piper.
+    """
+
+    capabilities: BackendCapabilities
+
+    def cache_key_params(self, language_code: str, voice_name: Optional[str]) -> Tuple[str, ...]:
+        """Return everything besides the text that determines the audio, for cache keys."""
+        ...
+
+    def check(self) -> None:
+        """Raise if the backend cannot synthesize at all, e.g. without credentials."""
+        ...
+
+    def synthesize(self, text: str, language_code: str, voice_name: Optional[str] = None) -> bytes:
+        """Return the audio for text."""
+        ...
+
+    def synthesize_many(self, texts: Sequence[str], language_code: str, voice_name: Optional[str] = None) -> List[bytes]:
+        """Return the audio for each text, in input order."""
+        ...
+
+
+def text_cache_keyer(params: Sequence[str]) -> Callable[[str], str]:
+    """
+    Return a function mapping text to a stable hex digest of it and params.
+
+    The text is Unicode-normalized and whitespace-collapsed first, so inputs
+    that only differ in invisible ways share a key.
+
+    Args:
+        params: A backend's cache_key_params(); hashed after the text.
+
+    Returns:
+        A function taking the input text and returning a SHA-256 hex digest.
+    """
+    suffix = b"".join(part.encode("utf-8") + b"\0" for part in params)
+
+    def key(text: str) -> str:
+        normalized = re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+        return hashlib.sha256(normalized.encode("utf-8") + b"\0" + suffix).hexdigest()
+
+    return key
+
+
+class SubprocessBackend:
+    """
+    Synthesize with a local command-line engine, one process per text.
+
+    The command is an argument list (or a shell-style string) whose items may
+    contain {voice}, {language} and {output} placeholders. The text is written
+    to the engine's stdin; the audio is read from its stdout, or from a
+    temporary file when the command names one with {output}. Up to
+    `processes` engines run at once, one per CPU core by default, so bulk
+    audio can be generated offline as fast as the machine allows.
+
+    Usage:
+        backend = SubprocessBackend("espeak-ng --stdout -v {voice}")
+        backend = SubprocessBackend("piper --model {voice} --output_file {output}")
+    """
+
+    def __init__(
+        self,
+        command: Union[str, Sequence[str]],
+        audio_format: str = "wav",
+        processes: Optional[int] = None,
+        timeout: float = 60.0,
+        name: str = "local",
+    ) -> None:
+        """
+        Args:
+            command: The engine command line, with placeholders as above.
+            audio_format: File extension of the audio the engine writes.
+                Default "wav".
+            processes: Maximum engines running at once. Must be >= 1. Default
+                None uses os.cpu_count().
+            timeout: Seconds before an engine run is killed. Default 60.
+            name: Backend name for logs and cache keys. Default "local".
+
+        Raises:
+            ValueError: If command is empty or processes is less than 1.
+            FileNotFoundError: If the engine executable cannot be found.
+        """
+        argv = shlex.split(command) if isinstance(command, str) else list(command)
+        if not argv:
+            raise ValueError("command must not be empty")
+        if processes is None:
+            processes = os.cpu_count() or 1
+        if processes < 1:
+            raise ValueError(f"processes must be >= 1, got {processes}")
+        if shutil.which(argv[0]) is None:
+            raise FileNotFoundError(f"TTS engine not found: {argv[0]}")
+        self.command = argv
+        self.timeout = timeout
+        self.capabilities = BackendCapabilities(name=name, audio_format=audio_format, concurrency=processes)
+        self._writes_file = any("{output}" in arg for arg in argv)
+        self._slots = threading.BoundedSemaphore(processes)
+
+    def cache_key_params(self, language_code: str, voice_name: Optional[str]) -> Tuple[str, ...]:
+        return (self.capabilities.name, shlex.join(self.command), language_code, voice_name or language_code)
+
+    def check(self) -> None:
+        pass  # the executable was found in __init__
+
+    def _argv(self, language_code: str, voice_name: Optional[str], output: str) -> List[str]:
+        values = {"voice": voice_name or language_code, "language": language_code, "output": output}
+        return [arg.format(**values) for arg in self.command]
+
+    def _run(self, text: str, language_code: str, voice_name: Optional[str]) -> bytes:
+        output = ""
+        if self._writes_file:
+            fd, output = tempfile.mkstemp(prefix="anki-tts-", suffix=f".{self.capabilities.audio_format}")
+            os.close(fd)
+        try:
+            argv = self._argv(language_code, voice_name, output)
+            result = subprocess.run(
+                argv, input=text.encode("utf-8"), stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=self.timeout
+            )
+            if result.returncode != 0:
+                stderr = result.stderr.decode("utf-8", errors="replace").strip()
+                raise RuntimeError(f"{argv[0]} exited with status {result.returncode}: {stderr[:200]}")
+            if self._writes_file:
+                with open(output, "rb") as f:
+                    audio = f.read()
+            else:
+                audio = result.stdout
+        finally:
+            if output:
+                os.unlink(output)
+        if not audio:
+            raise RuntimeError(f"{self.command[0]} produced no audio")
+        return audio
+
+    def synthesize(self, text: str, language_code: str = "ja-JP", voice_name: Optional[str] = None) -> bytes:
+        """
+        Run the engine on text and return its audio.
+
+        Blocks while `processes` engines are already running.
+
+        Raises:
+            RuntimeError: If the engine fails or writes no audio.
+            subprocess.TimeoutExpired: If the engine runs longer than timeout.
+        """
+        with self._slots:
+            try:
+                with metrics.timer("synthesis"):
+                    audio = self._run(text, language_code, voice_name)
+            except Exception as e:
+                logging.error(f"Local TTS failed for text '{text[:30]}...': {e}")
+                raise
+        metrics.count("tts_requests")
+        metrics.count("bytes_synthesized", len(audio))
+        return audio
+
+    def synthesize_many(self, texts: Sequence[str], language_code: str = "ja-JP", voice_name: Optional[str] = None) -> List[bytes]:
+        """Synthesize texts on all engine slots at once; see synthesize()."""
+        with ThreadPoolExecutor(max_workers=self.capabilities.concurrency) as pool:
+            return list(pool.map(lambda text: self.synthesize(text, language_code, voice_name), texts))
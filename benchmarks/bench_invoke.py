@@ -0,0 +1,60 @@
+"""
+Micro-benchmark: per-call AnkiConnect latency with and without connection reuse.
+
+Compares a bare requests.post per call (the old invoke) with AnkiConnectClient,
+which keeps a pooled keep-alive session, against the local stand-in server.
+
+Usage:
+    python -m benchmarks.bench_invoke [--calls 2000]
+"""
+
+import argparse
+import statistics
+import time
+from typing import Callable, List
+
+import requests
+
+from anki_tts.anki_tools import AnkiConnectClient
+from benchmarks.fake_ankiconnect import FakeAnkiConnect
+
+
+def _time_calls(call: Callable[[], object], calls: int) -> List[float]:
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def _report(label: str, samples: List[float], connections: int) -> None:
+    ordered = sorted(samples)
+    p50 = ordered[len(ordered) // 2] * 1e6
+    p99 = ordered[int(len(ordered) * 0.99)] * 1e6
+    print(f"{label:<28} mean {statistics.mean(samples) * 1e6:8.1f} µs   p50 {p50:8.1f} µs   p99 {p99:8.1f} µs   connections {connections}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=2000, help="Calls per variant (default: 2000)")
+    args = parser.parse_args()
+
+    request_json = {"action": "version", "version": 6, "params": {}}
+
+    with FakeAnkiConnect() as server:
+        def bare_post() -> object:
+            return requests.post(server.url, json=request_json, timeout=30).json()
+
+        bare_post()  # warm up
+        server.connections = 0
+        _report("requests.post per call", _time_calls(bare_post, args.calls), server.connections)
+
+        with AnkiConnectClient(url=server.url) as client:
+            client.invoke("version")  # warm up and open the pooled connection
+            server.connections = 0
+            _report("AnkiConnectClient (pooled)", _time_calls(lambda: client.invoke("version"), args.calls), server.connections)
+
+
+if __name__ == "__main__":
+    main()
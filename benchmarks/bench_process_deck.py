@@ -0,0 +1,169 @@
+"""
+End-to-end benchmark: process_deck against fake AnkiConnect and TTS backends.
+
+For each deck size, serves a fresh in-memory deck from the local AnkiConnect
+stand-in and runs process_deck in a child process with a fake TTS client, so
+the reported peak RSS and CPU time belong to the pipeline alone.
+
+Usage:
+    python -m benchmarks.bench_process_deck [--sizes 1000,10000,100000] [--workers 32]
+        [--batch-size 25] [--async] [--tts-latency 0.01] [--audio-kb 16]
+        [--anki-latency 0.0005] [--fail-rate 0.001] [--upload-mode inline|path]
+        [--filename-mode note|content] [--distinct-texts 500]
+"""
+
+import argparse
+import json
+import logging
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+from benchmarks.fake_ankiconnect import FakeAnkiConnect, make_notes
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def _peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_child(args: argparse.Namespace) -> Dict[str, Any]:
+    """Run process_deck once against args.url and return its measurements."""
+    from anki_tts.anki_tools import AnkiConnectClient, set_default_client
+    from anki_tts.gcloud_tts import AsyncTTSRunner
+    from anki_tts.metrics import Metrics
+    from anki_tts.retry import RetryPolicy
+    from benchmarks.fake_tts import FakeTTSAsyncClient, FakeTTSClient
+    from scripts.run_tts import process_deck
+
+    logging.basicConfig(level=logging.WARNING)
+    set_default_client(AnkiConnectClient(url=args.url, retry_policy=RetryPolicy(base_delay=0.001)))
+    tts_options = dict(latency=args.tts_latency, audio_bytes=args.audio_kb * 1024)
+    metrics = Metrics()
+
+    media_dir = tempfile.mkdtemp(prefix="bench-media-") if args.upload_mode == "path" else None
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    options: Dict[str, Any] = dict(
+        workers=args.workers,
+        batch_size=args.batch_size,
+        max_consecutive_failures=args.notes + 1,
+        metrics=metrics,
+        upload_mode=args.upload_mode,
+        media_dir=media_dir,
+        filename_mode=args.filename_mode,
+    )
+    try:
+        if args.async_tts:
+            with AsyncTTSRunner(args.workers, client_factory=lambda: FakeTTSAsyncClient(**tts_options)) as runner:
+                process_deck("Bench", "Sentence", "Audio", async_tts=True, async_runner=runner, **options)
+        else:
+            process_deck("Bench", "Sentence", "Audio", client=FakeTTSClient(**tts_options), **options)
+        seconds = time.perf_counter() - wall_start
+    finally:
+        if media_dir is not None:
+            shutil.rmtree(media_dir, ignore_errors=True)
+
+    return {
+        "upload_mode": args.upload_mode,
+        "notes": args.notes,
+        "seconds": seconds,
+        "notes_per_second": args.notes / seconds,
+        "cpu_seconds": time.process_time() - cpu_start,
+        "peak_rss_mb": _peak_rss_mb(),
+        "cards_added": metrics.counter("cards_added"),
+        "notes_failed": metrics.counter("notes_failed"),
+    }
+
+
+def run_size(notes: int, args: argparse.Namespace, passthrough: List[str]) -> Dict[str, Any]:
+    """Serve a deck of notes cards and benchmark one child run against it."""
+    with FakeAnkiConnect(make_notes(notes, distinct_texts=args.distinct_texts), latency=args.anki_latency, fail_rate=args.fail_rate) as server:
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_process_deck", "--child", "--url", server.url,
+             "--notes", str(notes), *passthrough],
+            check=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,  # progress bar
+            text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        result["anki_requests"] = server.requests
+        result["injected_failures"] = server.failures
+        result["media_files"] = len(server.media)
+    return result
+
+
+def _report(results: List[Dict[str, Any]]) -> None:
+    print(f"{'upload':>6} {'notes':>8} {'seconds':>9} {'notes/s':>9} {'CPU s':>8} {'peak RSS MB':>12} {'Anki reqs':>10} {'added':>8} {'failed':>7} {'media':>7}")
+    for r in results:
+        rss = f"{r['peak_rss_mb']:.1f}" if r["peak_rss_mb"] is not None else "n/a"
+        print(
+            f"{r['upload_mode']:>6} {r['notes']:>8} {r['seconds']:>9.2f} {r['notes_per_second']:>9.1f} {r['cpu_seconds']:>8.2f} "
+            f"{rss:>12} {r['anki_requests']:>10} {r['cards_added']:>8} {r['notes_failed']:>7} {r['media_files']:>7}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Comma-separated deck sizes (default: 1000,10000,100000)")
+    parser.add_argument("--workers", type=int, default=32, help="process_deck workers (default: 32)")
+    parser.add_argument("--batch-size", type=int, default=25, help="process_deck batch size (default: 25)")
+    parser.add_argument("--async", dest="async_tts", action="store_true", help="Use the async synthesis path")
+    parser.add_argument("--tts-latency", type=float, default=0.01, help="Seconds per fake TTS request (default: 0.01)")
+    parser.add_argument("--audio-kb", type=int, default=16, help="Fake audio size in KiB (default: 16)")
+    parser.add_argument("--anki-latency", type=float, default=0.0005, help="Seconds per fake AnkiConnect request (default: 0.0005)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Probability that an updateNote fails transiently (default: 0)")
+    parser.add_argument(
+        "--upload-mode",
+        default="inline",
+        help="process_deck upload mode, or 'inline,path' to compare both (default: inline)",
+    )
+    parser.add_argument("--filename-mode", default="note", help="process_deck filename mode: note or content (default: note)")
+    parser.add_argument(
+        "--distinct-texts",
+        type=int,
+        default=None,
+        help="Cycle note texts through this many values, as in a vocabulary deck (default: all distinct)",
+    )
+    parser.add_argument("--json", action="store_true", help="Print results as JSON instead of a table")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--url", help=argparse.SUPPRESS)
+    parser.add_argument("--notes", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args)))
+        return
+
+    passthrough = [
+        "--workers", str(args.workers),
+        "--batch-size", str(args.batch_size),
+        "--tts-latency", str(args.tts_latency),
+        "--audio-kb", str(args.audio_kb),
+        "--filename-mode", args.filename_mode,
+    ] + (["--async"] if args.async_tts else [])
+    results = [
+        run_size(int(size), args, passthrough + ["--upload-mode", mode])
+        for size in args.sizes.split(",")
+        for mode in args.upload_mode.split(",")
+    ]
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        _report(results)
+
+
+if __name__ == "__main__":
+    main()
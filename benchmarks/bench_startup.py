@@ -0,0 +1,72 @@
+"""
+Startup benchmark: how long run_tts takes before it can do any work.
+
+Times fresh interpreters importing scripts.run_tts and running
+`python -m scripts.run_tts --help`, next to importing google.cloud.texttospeech
+alone for reference, and lists the heavy modules the import pulled in. grpc
+and texttospeech are only loaded once a note needs synthesizing, so neither
+should appear.
+
+Usage:
+    python -m benchmarks.bench_startup [--runs 10] [--max-seconds 0.5]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from typing import List
+
+_COMMANDS = (
+    ("import scripts.run_tts", [sys.executable, "-c", "import scripts.run_tts"]),
+    ("run_tts --help", [sys.executable, "-m", "scripts.run_tts", "--help"]),
+    ("import texttospeech", [sys.executable, "-c", "import google.cloud.texttospeech"]),
+)
+_HEAVY_MODULES = ("grpc", "google.protobuf", "google.cloud.texttospeech")
+
+
+def _time_command(command: List[str], runs: int) -> float:
+    """Return the median wall time in seconds of running command."""
+    subprocess.run(command, check=True, stdout=subprocess.DEVNULL)  # warm the OS file cache
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def _heavy_modules_loaded() -> List[str]:
+    """Return which of _HEAVY_MODULES importing scripts.run_tts loads."""
+    check = (
+        "import sys, scripts.run_tts; "
+        f"print(' '.join(m for m in {_HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    output = subprocess.run([sys.executable, "-c", check], check=True, stdout=subprocess.PIPE, text=True).stdout
+    return output.split()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10, help="Timed runs per command (default: 10)")
+    parser.add_argument(
+        "--max-seconds",
+        type=float,
+        default=None,
+        help="Exit with status 1 if `run_tts --help` takes longer than this, or if heavy modules load on import",
+    )
+    args = parser.parse_args()
+
+    results = {label: _time_command(command, args.runs) for label, command in _COMMANDS}
+    for label, seconds in results.items():
+        print(f"{label:<24} {seconds * 1000:8.1f} ms (median of {args.runs})")
+    heavy = _heavy_modules_loaded()
+    print(f"{'heavy modules on import':<24} {', '.join(heavy) or 'none'}")
+
+    if args.max_seconds is not None and (heavy or results["run_tts --help"] > args.max_seconds):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
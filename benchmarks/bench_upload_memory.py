@@ -0,0 +1,107 @@
+"""
+Micro-benchmark: peak memory of audio uploads, buffered vs streamed JSON bodies.
+
+Compares the old upload path (base64 string in a params dict, serialized by
+requests' json=) with AnkiConnectClient, which streams the base64 straight
+from the audio bytes. Peak memory is measured with tracemalloc while
+--in-flight uploads run concurrently against a local server that discards
+request bodies, so only the client side is counted. The audio itself is
+allocated before measuring and is not part of the result.
+
+Usage:
+    python -m benchmarks.bench_upload_memory [--audio-kb 512] [--in-flight 8]
+"""
+
+import argparse
+import base64
+import threading
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable
+
+import requests
+
+from anki_tts.anki_tools import AnkiConnectClient, _update_note_action
+
+_RESPONSE = b'{"result": null, "error": null}'
+
+
+class _DiscardHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self) -> None:
+        remaining = int(self.headers.get("Content-Length", 0))
+        while remaining:
+            remaining -= len(self.rfile.read(min(remaining, 64 * 1024)))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(_RESPONSE)))
+        self.end_headers()
+        self.wfile.write(_RESPONSE)
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+
+def _buffered_upload(session: requests.Session, url: str) -> Callable[[int, bytes], Any]:
+    def upload(note_id: int, audio: bytes) -> Any:
+        params = {
+            "note": {
+                "id": note_id,
+                "fields": {"Audio": ""},
+                "audio": [{"filename": f"{note_id}.mp3", "data": base64.b64encode(audio).decode("utf-8"), "fields": ["Audio"]}],
+            },
+        }
+        response = session.post(url, json={"action": "updateNote", "version": 6, "params": params})
+        response.raise_for_status()
+        return response.json()["result"]
+    return upload
+
+
+def _streamed_upload(client: AnkiConnectClient) -> Callable[[int, bytes], Any]:
+    def upload(note_id: int, audio: bytes) -> Any:
+        return client.invoke("updateNote", **_update_note_action(note_id, "Audio", f"{note_id}.mp3", audio))
+    return upload
+
+
+def _peak_mb(upload: Callable[[int, bytes], Any], clips: list) -> float:
+    """Return the peak traced allocation in MiB while uploading clips concurrently."""
+    with ThreadPoolExecutor(max_workers=len(clips)) as executor:
+        upload(0, clips[0])  # warm up the connection pool outside the measurement
+        tracemalloc.start()
+        list(executor.map(upload, range(len(clips)), clips))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--audio-kb", type=int, default=512, help="Size of each clip in KiB (default: 512)")
+    parser.add_argument("--in-flight", type=int, default=8, help="Concurrent uploads (default: 8)")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _DiscardHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    clips = [bytes([i % 256]) * (args.audio_kb * 1024) for i in range(args.in_flight)]
+    clip_mb = args.audio_kb / 1024
+
+    try:
+        with requests.Session() as session, AnkiConnectClient(url=url, pool_maxsize=args.in_flight) as client:
+            for label, upload in (("buffered json=", _buffered_upload(session, url)), ("streamed JSONBody", _streamed_upload(client))):
+                peak = _peak_mb(upload, clips)
+                per_upload = peak / args.in_flight
+                print(
+                    f"{label:<20} peak {peak:8.2f} MiB   per in-flight upload {per_upload:7.2f} MiB "
+                    f"({per_upload / clip_mb:4.2f}x the {clip_mb:g} MiB clip)"
+                )
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+Local stand-in for the AnkiConnect add-on, for benchmarks.
+
+Serves the subset of the AnkiConnect API this project uses from an in-memory
+note and media store, on a background thread, with optional per-request latency and
+randomly injected update failures.
+"""
+
+import base64
+import fnmatch
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+
+def make_notes(
+    count: int,
+    text_field: str = "Sentence",
+    audio_field: str = "Audio",
+    distinct_texts: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Return count notesInfo-style notes with text and an empty audio field.
+
+    With distinct_texts, the texts cycle through that many values, like a
+    vocabulary deck where many notes share a reading.
+    """
+    return [
+        {
+            "noteId": note_id,
+            "modelName": "Basic",
+            "tags": [],
+            "fields": {
+                text_field: {"value": f"テスト文 {note_id % distinct_texts if distinct_texts else note_id}", "order": 0},
+                audio_field: {"value": "", "order": 1},
+            },
+        }
+        for note_id in range(1, count + 1)
+    ]
+
+
+class FakeAnkiConnect:
+    """
+    In-memory AnkiConnect server.
+
+    Usage:
+        with FakeAnkiConnect(make_notes(1000), latency=0.002) as server:
+            client = AnkiConnectClient(url=server.url)
+    """
+
+    def __init__(
+        self,
+        notes: Optional[List[Dict[str, Any]]] = None,
+        latency: float = 0.0,
+        fail_rate: float = 0.0,
+        failure: str = "collection is not available",
+        seed: int = 0,
+    ) -> None:
+        """
+        Args:
+            notes: notesInfo-style note dicts to serve.
+            latency: Seconds to sleep before answering each request.
+            fail_rate: Probability that an updateNote fails with failure.
+            failure: Error message of injected failures. The default is one
+                the AnkiConnect client retries.
+            seed: Seed for the failure injection.
+        """
+        self.notes = {note["noteId"]: note for note in (notes or [])}
+        # filename -> size of the stored media file
+        self.media: Dict[str, int] = {}
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.failure = failure
+        self.failures = 0
+        self._random = random.Random(seed)
+        self.requests = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeAnkiConnect":
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like a pooled client expects
+            disable_nagle_algorithm = True
+
+            def setup(self) -> None:
+                super().setup()
+                with fake._lock:
+                    fake.connections += 1
+
+            def do_POST(self) -> None:
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                request = json.loads(body)
+                with fake._lock:
+                    fake.requests += 1
+                if fake.latency:
+                    time.sleep(fake.latency)
+                response = fake.dispatch(request)
+                payload = json.dumps(response).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "FakeAnkiConnect":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+    def dispatch(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Handle one AnkiConnect request and return the response envelope."""
+        try:
+            handler = getattr(self, "_action_" + request["action"])
+        except AttributeError:
+            return {"result": None, "error": f"unsupported action: {request['action']}"}
+        try:
+            return {"result": handler(**request.get("params", {})), "error": None}
+        except Exception as e:
+            return {"result": None, "error": str(e)}
+
+    def _action_version(self) -> int:
+        return 6
+
+    def _action_findNotes(self, query: str) -> List[int]:
+        return list(self.notes)
+
+    def _action_notesInfo(self, notes: List[int]) -> List[Dict[str, Any]]:
+        return [self.notes[note_id] if note_id in self.notes else {} for note_id in notes]
+
+    def _maybe_fail(self) -> None:
+        if self.fail_rate:
+            with self._lock:
+                fail = self._random.random() < self.fail_rate
+                self.failures += fail
+            if fail:
+                raise RuntimeError(self.failure)
+
+    def _store(self, filename: str, data: bytes) -> None:
+        with self._lock:
+            self.media[filename] = len(data)
+
+    def _action_updateNote(self, note: Dict[str, Any]) -> None:
+        self._maybe_fail()
+        stored = self.notes.get(note["id"])
+        if stored is None:
+            raise ValueError(f"note was not found: {note['id']}")
+        for name, value in note.get("fields", {}).items():
+            stored["fields"][name]["value"] = value
+        for audio in note.get("audio", []):
+            self._store(audio["filename"], base64.b64decode(audio["data"]))
+            for name in audio["fields"]:
+                stored["fields"][name]["value"] += f"[sound:{audio['filename']}]"
+
+    def _action_updateNoteFields(self, note: Dict[str, Any]) -> None:
+        self._maybe_fail()
+        stored = self.notes.get(note["id"])
+        if stored is None:
+            raise ValueError(f"note was not found: {note['id']}")
+        for name, value in note["fields"].items():
+            stored["fields"][name]["value"] = value
+
+    def _action_storeMediaFile(
+        self,
+        filename: str,
+        data: Optional[str] = None,
+        path: Optional[str] = None,
+        deleteExisting: bool = True,
+    ) -> str:
+        if path is not None:
+            with open(path, "rb") as f:
+                self._store(filename, f.read())
+        elif data is not None:
+            self._store(filename, base64.b64decode(data))
+        else:
+            raise ValueError("storeMediaFile needs data or path")
+        return filename
+
+    def _action_getMediaFilesNames(self, pattern: str = "*") -> List[str]:
+        with self._lock:
+            return fnmatch.filter(list(self.media), pattern)
+
+    def _action_multi(self, actions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [self.dispatch(action) for action in actions]
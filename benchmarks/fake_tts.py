@@ -0,0 +1,68 @@
+"""
+Local stand-ins for the Google TTS clients, for benchmarks.
+
+They answer synthesize_speech like the real clients, after a configurable
+latency, with filler audio of a configurable size and no network access.
+"""
+
+import asyncio
+import random
+import time
+from typing import Any
+
+
+class _Response:
+    __slots__ = ("audio_content",)
+
+    def __init__(self, audio_content: bytes) -> None:
+        self.audio_content = audio_content
+
+
+class FakeTTSClient:
+    """
+    Drop-in for TextToSpeechClient.
+
+    Usage:
+        process_deck(..., client=FakeTTSClient(latency=0.05, audio_bytes=20_000))
+    """
+
+    def __init__(self, latency: float = 0.0, audio_bytes: int = 16 * 1024, jitter: float = 0.0, seed: int = 0) -> None:
+        """
+        Args:
+            latency: Seconds each request takes.
+            audio_bytes: Size of the returned audio.
+            jitter: Up to this many extra seconds added at random per request.
+            seed: Seed for the jitter.
+        """
+        self.latency = latency
+        self.audio_bytes = audio_bytes
+        self.jitter = jitter
+        self.requests = 0
+        self._random = random.Random(seed)
+
+    def _delay(self) -> float:
+        return self.latency + (self._random.random() * self.jitter if self.jitter else 0.0)
+
+    def _audio(self, input: Any) -> bytes:
+        # Vary the content with the input so nothing downstream can cheat by
+        # comparing identical payloads.
+        header = input.text.encode("utf-8")[:64]
+        return header + b"\0" * max(0, self.audio_bytes - len(header))
+
+    def synthesize_speech(self, input: Any, voice: Any, audio_config: Any) -> _Response:
+        self.requests += 1
+        delay = self._delay()
+        if delay:
+            time.sleep(delay)
+        return _Response(self._audio(input))
+
+
+class FakeTTSAsyncClient(FakeTTSClient):
+    """Drop-in for TextToSpeechAsyncClient; create it on the event loop it is used from."""
+
+    async def synthesize_speech(self, input: Any, voice: Any, audio_config: Any) -> _Response:
+        self.requests += 1
+        delay = self._delay()
+        if delay:
+            await asyncio.sleep(delay)
+        return _Response(self._audio(input))
@@ -1,24 +1,105 @@
+from __future__ import annotations
+
 import argparse
 import logging
+import os
 import re
 import sys
+import tempfile
+from collections import deque
+from contextlib import ExitStack
+from concurrent.futures import Future, ThreadPoolExecutor
 from tqdm import tqdm
-from typing import Optional
-from anki_tts.anki_tools import get_notes_from_deck, get_note_info, add_audio_to_note
-from anki_tts.gcloud_tts import init_tts_client, synthesize_audio
+from typing import TYPE_CHECKING, Callable, Deque, Dict, List, Optional, Tuple, Union
+from anki_tts.anki_tools import (
+    AnkiConnectClient,
+    NoteUpdateBatcher,
+    get_notes_from_deck,
+    iter_note_info,
+    add_audio_to_note,
+    add_audio_file_to_note,
+    get_media_file_names,
+    set_audio_field,
+    get_default_client,
+    set_default_client,
+)
+from anki_tts.audio_cache import AudioCache
+from anki_tts.gcloud_tts import (
+    AUDIO_ENCODINGS,
+    AsyncTTSRunner,
+    AudioSettings,
+    GoogleTTSBackend,
+    LazyClient,
+    init_async_tts_client,
+    init_tts_client,
+    resolve_voice_name,
+    split_text,
+)
+from anki_tts.jobs import TTSJob, load_jobs, schedule_jobs
+from anki_tts.journal import RunJournal
 from anki_tts.logging_utils import TqdmLoggingHandler
-from anki_tts.config import DEFAULT_LANGUAGE
+from anki_tts.media_manifest import MediaManifest
+from anki_tts.metrics import Metrics, use_metrics
+from anki_tts.metrics_exporter import MetricsServer
+from anki_tts.plan import RunPlan, voice_tier
+from anki_tts.postprocess import POSTPROCESSING_STEPS, AudioPostProcessor
+from anki_tts.rate_limit import QuotaLimiter
+from anki_tts.text_normalize import DEFAULT_STEPS, TextNormalizer
+from anki_tts.retry import RetryPolicy, format_retry_counts
+from anki_tts.tts_backend import SubprocessBackend, TTSBackend, text_cache_keyer
+from anki_tts.config import (
+    ANKI_CONNECT_ACTION_TIMEOUTS,
+    ANKI_CONNECT_TIMEOUT,
+    AUDIO_CACHE_DIR,
+    AUDIO_CACHE_MAX_MB,
+    DEFAULT_LANGUAGE,
+    LOCAL_TTS_COMMAND,
+    LOCAL_TTS_FORMAT,
+    NOTES_INFO_CHUNK_SIZE,
+    RETRY_MAX_ATTEMPTS,
+    RETRY_TIME_BUDGET,
+    TTS_AUDIO_ENCODING,
+    TTS_CHARACTERS_PER_MINUTE,
+    TTS_EFFECTS_PROFILE,
+    TTS_REQUESTS_PER_MINUTE,
+    TTS_SAMPLE_RATE,
+    TTS_SPEAKING_RATE,
+)
+
+if TYPE_CHECKING:
+    from google.cloud import texttospeech
+
+
+# How audio reaches Anki: inline as base64 in the request, or as a local file
+# path AnkiConnect reads itself.
+UPLOAD_MODES = ("inline", "path")
+# How audio files are named in Anki: one per note and field, or one per
+# distinct audio content shared by every note that needs it.
+FILENAME_MODES = ("note", "content")
+
+
+def _safe_field_name(audio_field: str) -> str:
+    return re.sub(r"[^\w-]", "_", audio_field)
+
+
+def build_audio_filename(note_id: int, audio_field: str, extension: str = "mp3") -> str:
+    """Return a filesystem-safe audio filename encoding the note ID and field name."""
+    return f"{note_id}_{_safe_field_name(audio_field)}.{extension}"
 
 
-def build_audio_filename(note_id: int, audio_field: str) -> str:
-    """Return a filesystem-safe MP3 filename encoding the note ID and field name."""
-    safe_field = re.sub(r"[^\w-]", "_", audio_field)
-    return f"{note_id}_{safe_field}.mp3"
+def build_content_filename(key: str, extension: str = "mp3") -> str:
+    """Return the audio filename shared by all notes whose audio has this cache key."""
+    return f"tts_{key[:32]}.{extension}"
 
 
-def iter_notes_with_progress(notes, desc: str):
-    """Generator to yield notes and update tqdm progress automatically."""
-    with tqdm(total=len(notes), desc=desc, unit="card") as progress_bar:
+def iter_notes_with_progress(notes, desc: str, total: Optional[int] = None):
+    """Generator to yield notes and update tqdm progress automatically.
+
+    total defaults to len(notes); pass it explicitly for lazy iterables.
+    """
+    if total is None:
+        total = len(notes)
+    with tqdm(total=total, desc=desc, unit="card") as progress_bar:
         for note in notes:
             yield note
             progress_bar.update(1)
@@ -32,6 +113,30 @@ def process_deck(
     voice: Optional[str] = None,
     max_cards: Optional[int] = None,
     max_consecutive_failures: int = 3,
+    workers: int = 1,
+    cache: Optional[AudioCache] = None,
+    batch_size: int = 1,
+    batch_max_bytes: int = 16 * 1024 * 1024,
+    notes_chunk_size: int = NOTES_INFO_CHUNK_SIZE,
+    tags: Optional[List[str]] = None,
+    note_types: Optional[List[str]] = None,
+    async_tts: bool = False,
+    limiter: Optional[QuotaLimiter] = None,
+    retry_policy: Optional[RetryPolicy] = None,
+    journal: Optional[RunJournal] = None,
+    client: Optional[Union[texttospeech.TextToSpeechClient, LazyClient]] = None,
+    executor: Optional[ThreadPoolExecutor] = None,
+    async_runner: Optional[AsyncTTSRunner] = None,
+    normalizer: Optional[Callable[[str], str]] = None,
+    metrics: Optional[Metrics] = None,
+    upload_mode: str = "inline",
+    media_dir: Optional[str] = None,
+    filename_mode: str = "note",
+    manifest: Optional[MediaManifest] = None,
+    reuse_media: bool = False,
+    backend: Optional[TTSBackend] = None,
+    postprocessor: Optional[AudioPostProcessor] = None,
+    audio_settings: Optional[AudioSettings] = None,
 ) -> bool:
     """
     Process all notes in a given Anki deck: generate audio for a text field and
@@ -51,79 +156,912 @@ def process_deck(
         max_consecutive_failures: Abort after this many consecutive synthesis
             failures. A successful addition resets the counter. Must be >= 1.
             Default 3.
+        workers: Number of notes synthesized concurrently. Uploads still
+            happen one at a time in deck order, so max_cards and
+            max_consecutive_failures behave exactly as in a sequential run.
+            Must be >= 1. Default 1.
+        cache: Optional AudioCache consulted before calling Google TTS and
+            filled with every new synthesis. Default None uses a small
+            in-memory cache, so duplicate texts in the deck are still only
+            synthesized once per run.
+        batch_size: Number of note updates sent to AnkiConnect per `multi`
+            request. Queued updates count toward max_cards like in-flight
+            synthesis. If the run aborts part-way through a batch, updates in
+            that batch that did succeed are still counted. Must be >= 1.
+            Default 1 sends each update on its own.
+        batch_max_bytes: Upper bound on the base64 audio payload of one
+            batch. Default 16 MiB.
+        notes_chunk_size: Number of notes fetched per notesInfo request.
+            Notes are streamed chunk by chunk, with the next chunk prefetched
+            while the current one is processed. Must be >= 1.
+        tags: If set, only process notes carrying at least one of these tags.
+        note_types: If set, only process notes of one of these note types.
+        async_tts: If True, synthesize with the asyncio Google client on a
+            single background event loop instead of a thread per worker;
+            workers then bounds the number of requests in flight, which can
+            be in the hundreds. Only for the Google backend.
+        limiter: Optional QuotaLimiter for Google TTS requests/min and
+            characters/min quotas. Quota errors are retried with adaptive
+            backoff rather than counted as failures. Default None uses an
+            unlimited limiter that only backs off on quota errors.
+        retry_policy: RetryPolicy for transient synthesis errors
+            (UNAVAILABLE, DEADLINE_EXCEEDED, connection resets). A note whose
+            synthesis succeeds after retrying is not counted as a failure.
+            Default None uses RetryPolicy(). AnkiConnect calls are retried by
+            the AnkiConnect client's own policy.
+        journal: Optional RunJournal. Every note that receives audio is
+            recorded in it, and notes it already lists for audio_field are
+            skipped before their details are fetched from AnkiConnect, so a
+            resumed run picks up where the last one stopped, even with
+            overwrite.
+        client: TextToSpeechClient to synthesize with, or a LazyClient
+            creating one. Default None initializes one with init_tts_client()
+            when the first text needs synthesizing, so runs served entirely
+            from Anki or the cache never load grpc. Ignored with async_tts
+            or backend.
+        executor: Thread pool to synthesize on, e.g. one shared by several
+            runs. Default None starts a pool of `workers` threads for this
+            run. Ignored with async_tts.
+        async_runner: AsyncTTSRunner to synthesize on with async_tts.
+            Default None starts one for this run.
+        normalizer: Turns a text field value into the text to speak; the
+            result is used both for synthesis and for the cache key. Notes
+            left with nothing to say are skipped. Default None uses
+            TextNormalizer(), which removes HTML, entities, cloze markers,
+            furigana readings and [sound:] tags.
+        metrics: Metrics registry to record stage timings and counters in.
+            Default None records into a new registry and logs its summary
+            table at the end of the run; a registry passed in is left for the
+            caller to report.
+        upload_mode: "inline" sends each clip base64-encoded inside the
+            AnkiConnect request. "path" writes it to a local file and lets
+            AnkiConnect read it with storeMediaFile, then sets the field with
+            updateNoteFields; this only works when Anki runs on the same
+            machine. Default "inline".
+        media_dir: Directory for the files of upload_mode "path", removed
+            once Anki has copied them or the run stops. Default None uses the
+            files of a persistent cache instead, hard-linked into a staging
+            directory until Anki has copied them so eviction cannot remove
+            them first.
+        filename_mode: "note" gives every note its own file named after the
+            note and field (see build_audio_filename). "content" names files
+            after the audio itself (see build_content_filename), so notes
+            with the same text, voice and audio settings share one file: it
+            is stored once per run, and later notes only get their field
+            pointed at it. Default "note".
+        manifest: Optional MediaManifest recording which audio every file
+            stored in Anki holds, kept across runs.
+        reuse_media: If True, list Anki's media files once at the start and
+            neither synthesize nor upload audio for a note whose file Anki
+            already holds with the expected content; only its field is set,
+            if it does not play the file yet. Content-named files always
+            match their audio; note-named files match when the manifest
+            records the same cache key for them. Mostly useful with
+            overwrite, or when rerunning without a journal.
+        backend: TTSBackend to synthesize with, e.g. a SubprocessBackend
+            running a local engine. Its audio format sets the file extension,
+            and only billed backends go through limiter. Default None uses
+            GoogleTTSBackend with client.
+        postprocessor: Optional AudioPostProcessor applied to every new
+            synthesis in its worker processes before the audio is cached and
+            uploaded. Its steps are part of the cache key, and its output
+            format sets the file extension. Left running for the caller to
+            close.
+        audio_settings: AudioSettings for Google TTS (encoding, sample rate,
+            speaking rate, effects profile); the encoding sets the file
+            extension. Default None requests MP3. Ignored with backend.
 
     Returns:
         True if the run completed normally, False if aborted due to consecutive
-        failures.
+        failures or because audio cannot be synthesized at all, e.g. without
+        usable credentials.
+
+    Raises:
+        ValueError: If a numeric limit is out of range, upload_mode
+            or filename_mode is unknown, upload_mode "path" has neither
+            media_dir nor a persistent cache, async_tts is combined with
+            a backend other than Google, or postprocessor cannot read the
+            backend's audio format.
     """
     if max_cards is not None and max_cards < 1:
         raise ValueError(f"max_cards must be >= 1, got {max_cards}")
     if max_consecutive_failures < 1:
         raise ValueError(f"max_consecutive_failures must be >= 1, got {max_consecutive_failures}")
+    if workers < 1:
+        raise ValueError(f"workers must be >= 1, got {workers}")
+    if batch_size < 1:
+        raise ValueError(f"batch_size must be >= 1, got {batch_size}")
+    if notes_chunk_size < 1:
+        raise ValueError(f"notes_chunk_size must be >= 1, got {notes_chunk_size}")
+    if upload_mode not in UPLOAD_MODES:
+        raise ValueError(f"upload_mode must be one of {', '.join(UPLOAD_MODES)}, got {upload_mode!r}")
+    if filename_mode not in FILENAME_MODES:
+        raise ValueError(f"filename_mode must be one of {', '.join(FILENAME_MODES)}, got {filename_mode!r}")
+    if upload_mode == "path" and media_dir is None and (cache is None or cache.directory is None):
+        raise ValueError("upload_mode 'path' needs media_dir or a persistent cache")
+    if async_tts and backend is not None and not isinstance(backend, GoogleTTSBackend):
+        raise ValueError(f"async_tts only works with the Google backend, got {backend.capabilities.name!r}")
 
-    client = init_tts_client()
-    note_ids = get_notes_from_deck(deck_name)
-    if not note_ids:
-        logging.info(f"No notes found in deck '{deck_name}'.")
-        return True
+    if backend is None:
+        backend = GoogleTTSBackend(client if client is not None else LazyClient(init_tts_client), audio_settings)
+    extension = backend.capabilities.audio_format
+    if postprocessor is not None:
+        extension = postprocessor.output_format(extension)
+    if cache is None:
+        cache = AudioCache()
+    if limiter is None:
+        limiter = QuotaLimiter(max_concurrency=workers)
+    if retry_policy is None:
+        retry_policy = RetryPolicy()
+    if normalizer is None:
+        normalizer = TextNormalizer()
+    own_metrics = metrics is None
+    if own_metrics:
+        metrics = Metrics()
+    tts_retries_before = retry_policy.snapshot()
+    anki_retry_policy = get_default_client().retry_policy
+    anki_retries_before = anki_retry_policy.snapshot()
+    cache_hits_before, cache_misses_before = cache.hits, cache.misses
+    throttled_before = limiter.throttled
+    reused_before = metrics.counter("media_reused")
+    produced_before = _audio_produced(metrics)
+    # Built with the first cache key; Google's needs the texttospeech types.
+    key_for: Optional[Callable[[str], str]] = None
+    if upload_mode == "path" and media_dir is not None:
+        os.makedirs(media_dir, exist_ok=True)
+    with use_metrics(metrics):
+        # Let Anki drop notes with no text (and, unless overwriting, notes that
+        # already have audio) so only real work is downloaded. The same checks are
+        # repeated per note below as a safety net.
+        note_ids = get_notes_from_deck(
+            deck_name,
+            text_field=text_field,
+            audio_field=audio_field,
+            missing_audio_only=not overwrite,
+            tags=tags,
+            note_types=note_types,
+        )
+        if journal is not None and len(journal):
+            remaining = [note_id for note_id in note_ids if not journal.is_done(note_id, audio_field)]
+            if len(remaining) < len(note_ids):
+                logging.info(f"Skipping {len(note_ids) - len(remaining)} note(s) already completed according to the journal.")
+            note_ids = remaining
+        if not note_ids:
+            logging.info(f"No notes in deck '{deck_name}' need audio.")
+            return True
 
-    notes = get_note_info(note_ids)
+        # Files Anki already holds that might be reused.
+        existing_media = set()
+        if reuse_media:
+            pattern = f"tts_*.{extension}" if filename_mode == "content" else f"*_{_safe_field_name(audio_field)}.{extension}"
+            existing_media = set(get_media_file_names(pattern))
+            logging.info(f"Anki holds {len(existing_media)} media file(s) matching {pattern}.")
 
-    desc = f"Processing deck '{deck_name}'"
-    if max_cards is not None:
-        desc += f" (max {max_cards})"
+        notes = iter_note_info(note_ids, chunk_size=notes_chunk_size)
 
-    audio_added = 0
-    consecutive_failures = 0
-    aborted = False
-    for note in iter_notes_with_progress(notes, desc):
-        if max_cards is not None and audio_added >= max_cards:
-            break
+        desc = f"Processing deck '{deck_name}'"
+        if max_cards is not None:
+            desc += f" (max {max_cards})"
 
-        note_id = note["noteId"]
-        fields = note["fields"]
+        audio_added = 0
+        consecutive_failures = 0
+        aborted = False
+        # Synthesis jobs in submission (deck) order. Results are consumed from the
+        # head so uploads and failure accounting happen in the same order as a
+        # sequential run, whatever order the workers finish in.
+        in_flight: Deque[Tuple[int, str, str, Future]] = deque()
+        # Cache key -> pending synthesis, so duplicate texts arriving while the
+        # first copy is still being synthesized share its result.
+        pending: Dict[str, Future] = {}
+        shared_hits = 0
+        # Requests needed for the texts sent to the backend, counting every
+        # piece of a text too long for a single request.
+        tts_requests = 0
+        split_requests = 0
+        max_input_bytes = backend.capabilities.max_input_bytes
+        synthesis_checked = False
+        synthesis_error: Optional[Exception] = None
 
-        # Validate required fields
-        if text_field not in fields or audio_field not in fields:
-            logging.warning(f"Note {note_id} missing required fields: {text_field}, {audio_field}")
-            continue
+        def synthesize_and_cache(text: str, key: str, requests: int) -> bytes:
+            def synthesize() -> bytes:
+                return backend.synthesize(text, language_code, voice)
 
-        text_value = fields[text_field]["value"]
-        audio_value = fields[audio_field]["value"]
+            if backend.capabilities.billed:
+                audio_data = retry_policy.call(limiter.call, synthesize, len(text), requests)
+            else:
+                audio_data = retry_policy.call(synthesize)
+            if postprocessor is not None:
+                audio_data = postprocessor.process(audio_data)
+            cache.put(key, audio_data)
+            return audio_data
 
-        # Skip empty text fields
-        if not text_value.strip():
-            logging.debug(f"Skipping empty field for note {note_id}.")
-            continue
+        def can_synthesize() -> bool:
+            # Checked once, before the first synthesis rather than on a
+            # worker, so e.g. a credentials error stops the run instead of
+            # failing each note in turn.
+            nonlocal synthesis_checked, synthesis_error, aborted
+            if not synthesis_checked:
+                synthesis_checked = True
+                try:
+                    (backend if async_runner is None else async_runner).check()
+                except Exception as e:
+                    synthesis_error = e
+                    aborted = True
+            return synthesis_error is None
 
-        # Skip if audio already exists and overwrite is False
-        if "[sound:" in audio_value and not overwrite:
-            logging.debug(f"Skipping note {note_id} (already has audio).")
-            continue
+        def submit_synthesis(text: str, key: str) -> Future:
+            nonlocal tts_requests, split_requests
+            pieces = len(split_text(text, max_input_bytes)) if max_input_bytes else 1
+            tts_requests += pieces
+            if pieces > 1:
+                split_requests += pieces - 1
+            if async_runner is None:
+                return executor.submit(synthesize_and_cache, text, key, pieces)
+            future = async_runner.submit(
+                text, language_code=language_code, voice_name=voice, audio_config=backend.audio_config
+            )
+            if postprocessor is not None:
+                future = postprocessor.process_after(future)
 
-        logging.info(f"Generating audio for note {note_id}: {text_value}")
-        try:
-            audio_data = synthesize_audio(text_value, client, language_code=language_code, voice_name=voice)
-            filename = build_audio_filename(note_id, audio_field)
-            add_audio_to_note(note_id, audio_field, filename, audio_data)
-            audio_added += 1
-            consecutive_failures = 0
-        except Exception as e:
-            logging.error(f"❌ Failed to process note {note_id}: {e}")
+            def cache_result(done: Future) -> None:
+                if not done.cancelled() and done.exception() is None:
+                    cache.put(key, done.result())
+
+            future.add_done_callback(cache_result)
+            return future
+
+        batcher = NoteUpdateBatcher(batch_size, batch_max_bytes) if batch_size > 1 else None
+        # note ID -> (filename, cache key, audio size) of uploads awaiting their
+        # outcome, for the journal and metrics.
+        uploading: Dict[int, Tuple[str, str, int]] = {}
+        # note ID -> file written to media_dir, or cache entry linked into
+        # staging_dir, for an upload awaiting its outcome.
+        staged: Dict[int, str] = {}
+        staging_dir: Optional[str] = None
+        # With filename_mode "content": files stored in Anki during this run,
+        # and files whose store is still awaiting its outcome -> the note
+        # whose upload stores them.
+        stored_files = set()
+        storing: Dict[str, int] = {}
+
+        def record(note_id: int, error: Optional[Exception]) -> None:
+            nonlocal audio_added, consecutive_failures, aborted
+            uploaded = uploading.pop(note_id, None)
+            if uploaded is not None and storing.get(uploaded[0]) == note_id:
+                del storing[uploaded[0]]
+                if error is None:
+                    stored_files.add(uploaded[0])
+            staged_path = staged.pop(note_id, None)
+            if staged_path is not None:
+                try:
+                    os.unlink(staged_path)
+                except OSError:
+                    pass
+            if error is None:
+                audio_added += 1
+                consecutive_failures = 0
+                metrics.count("cards_added")
+                if uploaded is not None:
+                    filename, key, size = uploaded
+                    metrics.count("bytes_uploaded", size)
+                    if size:
+                        metrics.count("files_uploaded")
+                    if manifest is not None and size:
+                        manifest.record(filename, key)
+                    if journal is not None:
+                        journal.record(note_id, audio_field, key, filename)
+                return
+            metrics.count("notes_failed")
+            logging.error(f"❌ Failed to process note {note_id}: {error}")
             consecutive_failures += 1
             if consecutive_failures >= max_consecutive_failures:
                 aborted = True
+
+        def audio_file(note_id: int, filename: str, key: str, audio_data: bytes) -> Optional[str]:
+            # Local file for upload_mode "path", or None to upload inline.
+            if upload_mode != "path":
+                return None
+            if media_dir is None:
+                # Evicted cache entries fall back to an inline upload.
+                path = cache.path_for(key)
+                if path is None:
+                    return None
+                return link_cache_file(note_id, filename, path)
+            path = os.path.join(media_dir, filename)
+            with metrics.timer("write_file"):
+                with open(path, "wb") as f:
+                    f.write(audio_data)
+            staged[note_id] = path
+            return path
+
+        def link_cache_file(note_id: int, filename: str, path: str) -> Optional[str]:
+            # Puts from the synthesis workers, or before a batched upload is
+            # flushed, may evict the entry before Anki reads it; a hard link
+            # keeps its data until the upload is settled.
+            nonlocal staging_dir
+            try:
+                if staging_dir is None:
+                    staging_dir = tempfile.mkdtemp(prefix="staging-", dir=cache.directory)
+                staged_path = os.path.join(staging_dir, f"{note_id}_{filename}")
+                os.link(path, staged_path)
+            except OSError:
+                # Evicted already, or no hard links here: upload inline.
+                return None
+            staged[note_id] = staged_path
+            return staged_path
+
+        def discard_staged() -> None:
+            # Files of uploads still queued when the run stopped.
+            for path in staged.values():
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            staged.clear()
+            if staging_dir is not None:
+                try:
+                    os.rmdir(staging_dir)
+                except OSError:
+                    pass
+
+        def reference(note_id: int, filename: str, key: str) -> None:
+            # Point the field at a shared file stored (or being stored) already.
+            uploading[note_id] = (filename, key, 0)
+            metrics.count("media_reused")
+            if batcher is not None:
+                for outcome in batcher.add_reference(note_id, audio_field, filename):
+                    record(*outcome)
+                return
+            try:
+                set_audio_field(note_id, audio_field, filename)
+            except Exception as e:
+                record(note_id, e)
+            else:
+                record(note_id, None)
+
+        def upload(note_id: int, filename: str, key: str, audio_data: bytes) -> None:
+            if filename in stored_files or filename in storing:
+                reference(note_id, filename, key)
+                return
+            if filename_mode == "content":
+                storing[filename] = note_id
+            uploading[note_id] = (filename, key, len(audio_data))
+            try:
+                path = audio_file(note_id, filename, key, audio_data)
+            except OSError as e:
+                record(note_id, e)
+                return
+            # Shared files are stored on their own so later notes can refer to
+            # them; per-note files go inline with the field update.
+            separate_store = path is not None or filename_mode == "content"
+            if batcher is not None:
+                if path is not None:
+                    outcomes = batcher.add_file(note_id, audio_field, filename, path)
+                elif separate_store:
+                    outcomes = batcher.add_file(note_id, audio_field, filename, audio_data=audio_data)
+                else:
+                    outcomes = batcher.add(note_id, audio_field, filename, audio_data)
+                for outcome in outcomes:
+                    record(*outcome)
+                return
+            try:
+                if path is not None:
+                    add_audio_file_to_note(note_id, audio_field, filename, path)
+                elif separate_store:
+                    add_audio_file_to_note(note_id, audio_field, filename, audio_data=audio_data)
+                else:
+                    add_audio_to_note(note_id, audio_field, filename, audio_data)
+            except Exception as e:
+                record(note_id, e)
+            else:
+                record(note_id, None)
+
+        def finish_oldest() -> None:
+            note_id, filename, key, future = in_flight.popleft()
+            if pending.get(key) is future:
+                del pending[key]
+            try:
+                audio_data = future.result()
+            except Exception as e:
+                # Settle queued uploads first so failures are still counted in
+                # deck order.
+                flush_uploads()
+                if not aborted:
+                    record(note_id, e)
+                return
+            upload(note_id, filename, key, audio_data)
+
+        def flush_uploads() -> None:
+            if batcher is not None:
+                for outcome in batcher.flush():
+                    record(*outcome)
+
+        def queued_uploads() -> int:
+            return len(batcher) if batcher is not None else 0
+
+        def settle_one() -> None:
+            if in_flight:
+                finish_oldest()
+            else:
+                flush_uploads()
+
+        def must_wait() -> bool:
+            # A free slot needs both an idle worker and room under max_cards once
+            # every in-flight job and queued upload is counted as a success.
+            if len(in_flight) >= workers:
+                return True
+            outstanding = len(in_flight) + queued_uploads()
+            return max_cards is not None and audio_added + outstanding >= max_cards
+
+        with ExitStack() as stack:
+            stack.callback(discard_staged)
+            if not async_tts:
+                async_runner = None
+                if executor is None:
+                    executor = stack.enter_context(ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tts"))
+            elif async_runner is None:
+                async_runner = stack.enter_context(AsyncTTSRunner(
+                    workers, client_factory=init_async_tts_client, limiter=limiter, retry_policy=retry_policy
+                ))
+
+            for note in iter_notes_with_progress(notes, desc, total=len(note_ids)):
+                if max_cards is not None and audio_added >= max_cards:
+                    break
+
+                note_id = note["noteId"]
+                fields = note["fields"]
+
+                with metrics.timer("filter"):
+                    missing_fields = text_field not in fields or audio_field not in fields
+                    has_audio = not missing_fields and "[sound:" in fields[audio_field]["value"]
+
+                # Validate required fields
+                if missing_fields:
+                    logging.warning(f"Note {note_id} missing required fields: {text_field}, {audio_field}")
+                    metrics.count("notes_skipped")
+                    continue
+
+                # Skip if audio already exists and overwrite is False
+                if has_audio and not overwrite:
+                    logging.debug(f"Skipping note {note_id} (already has audio).")
+                    metrics.count("notes_skipped")
+                    continue
+
+                with metrics.timer("normalize"):
+                    text_value = normalizer(fields[text_field]["value"])
+
+                # Skip empty text fields (including ones holding only markup)
+                if not text_value.strip():
+                    logging.debug(f"Skipping empty field for note {note_id}.")
+                    metrics.count("notes_skipped")
+                    continue
+
+                while (in_flight or queued_uploads()) and must_wait() and not aborted:
+                    settle_one()
+                if aborted or (max_cards is not None and audio_added >= max_cards):
+                    break
+
+                if key_for is None:
+                    key_for = text_cache_keyer(_cache_key_params(backend, postprocessor, language_code, voice))
+                key = key_for(text_value)
+                if filename_mode == "content":
+                    filename = build_content_filename(key, extension)
+                else:
+                    filename = build_audio_filename(note_id, audio_field, extension)
+                if filename in existing_media:
+                    existing_media.discard(filename)
+                    if filename_mode == "content" or (manifest is not None and manifest.get(filename) == key):
+                        stored_files.add(filename)
+                if filename in stored_files and f"[sound:{filename}]" in fields[audio_field]["value"]:
+                    logging.debug(f"Skipping note {note_id} (already plays {filename}).")
+                    metrics.count("notes_skipped")
+                    continue
+                if filename in stored_files or filename in storing:
+                    # Only the field reference is uploaded, so no audio is needed.
+                    logging.info(f"Reusing stored audio file {filename} for note {note_id}: {text_value}")
+                    future = Future()
+                    future.set_result(b"")
+                    shared_hits += 1
+                elif key in pending:
+                    logging.info(f"Reusing audio being generated for note {note_id}: {text_value}")
+                    future = pending[key]
+                    shared_hits += 1
+                else:
+                    cached_audio = cache.get(key)
+                    if cached_audio is not None:
+                        logging.info(f"Using cached audio for note {note_id}: {text_value}")
+                        future = Future()
+                        future.set_result(cached_audio)
+                    else:
+                        if not can_synthesize():
+                            break
+                        logging.info(f"Generating audio for note {note_id}: {text_value}")
+                        future = submit_synthesis(text_value, key)
+                        pending[key] = future
+                in_flight.append((note_id, filename, key, future))
+
+            while (in_flight or queued_uploads()) and not aborted:
+                settle_one()
+            # Anything left over was submitted or queued speculatively before the
+            # abort; drop it without uploading so an aborted run never writes past
+            # the failure that stopped it.
+            for _, _, _, future in in_flight:
+                future.cancel()
+            notes.close()
+        if journal is not None:
+            journal.flush()
+        if manifest is not None:
+            manifest.flush()
+
+        logging.info(f"Added audio to {audio_added} card(s).")
+        _log_audio_produced(metrics, produced_before, f"Audio produced ({extension})")
+        cache_hits = cache.hits - cache_hits_before + shared_hits
+        logging.info(f"Audio cache: {cache_hits} hit(s), {cache.misses - cache_misses_before} miss(es).")
+        tts_label = "Google TTS" if isinstance(backend, GoogleTTSBackend) else f"{backend.capabilities.name} TTS"
+        logging.info(
+            f"{tts_label} requests: {tts_requests} sent, {cache_hits} saved by the cache, "
+            f"{split_requests} extra to split long texts."
+        )
+        reused = metrics.counter("media_reused") - reused_before
+        if reused:
+            logging.info(f"Reused {reused} media file(s) instead of uploading them again.")
+        throttled = limiter.throttled - throttled_before
+        if throttled:
+            logging.info(f"Backed off {throttled} time(s) after hitting the Google TTS quota.")
+        tts_retries = _counts_since(tts_retries_before, retry_policy.snapshot())
+        anki_retries = _counts_since(anki_retries_before, anki_retry_policy.snapshot())
+        if tts_retries or anki_retries:
+            logging.info(
+                f"Retries — TTS: {format_retry_counts(tts_retries)}; "
+                f"AnkiConnect: {format_retry_counts(anki_retries)}."
+            )
+        if synthesis_error is not None:
+            logging.error(f"❌ Run aborted — cannot synthesize audio: {synthesis_error}")
+        elif aborted:
+            logging.error(
+                f"❌ Run aborted — {consecutive_failures} consecutive synthesis failures. "
+                "Check your API credentials or quota."
+            )
+        else:
+            logging.info("✅ Finished processing deck.")
+        if own_metrics:
+            for line in metrics.format_table():
+                logging.info(line)
+        return not aborted
+
+
+def _format_bytes(size: float) -> str:
+    """Return size in bytes as e.g. "512 B" or "3.4 MB"."""
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def _audio_produced(metrics: Metrics) -> Tuple[int, int]:
+    """Return the (files, bytes) of audio uploaded to Anki so far."""
+    return metrics.counter("files_uploaded"), metrics.counter("bytes_uploaded")
+
+
+def _log_audio_produced(metrics: Metrics, before: Tuple[int, int], title: str) -> None:
+    """Log the files and bytes of audio uploaded since before, after title."""
+    files, size = (now - then for now, then in zip(_audio_produced(metrics), before))
+    average = f" ({_format_bytes(size / files)} per file)" if files else ""
+    logging.info(f"{title}: {files} file(s), {_format_bytes(size)}{average}.")
+
+
+def _cache_key_params(
+    backend: TTSBackend, postprocessor: Optional[AudioPostProcessor], language_code: str, voice: Optional[str]
+) -> Tuple[str, ...]:
+    """Return the cache key parameters of audio from backend, after postprocessor if any."""
+    params = backend.cache_key_params(language_code, voice)
+    if postprocessor is not None:
+        params += postprocessor.cache_key_params()
+    return params
+
+
+def _job_backend(job: TTSJob, backends: Optional[Dict[str, TTSBackend]]) -> Optional[TTSBackend]:
+    """Return the backend a job names, or None for the shared Google client."""
+    if job.backend in (None, "google"):
+        return None
+    if not backends or job.backend not in backends:
+        raise ValueError(f"No TTS backend named {job.backend!r} for {job.describe()}")
+    return backends[job.backend]
+
+
+def run_jobs(
+    jobs: List[TTSJob],
+    workers: int = 1,
+    async_tts: bool = False,
+    cache: Optional[AudioCache] = None,
+    limiter: Optional[QuotaLimiter] = None,
+    retry_policy: Optional[RetryPolicy] = None,
+    metrics: Optional[Metrics] = None,
+    backends: Optional[Dict[str, TTSBackend]] = None,
+    **options,
+) -> bool:
+    """
+    Run several jobs in one process, sharing everything that can be shared.
+
+    The TTS client, the worker pool (or async event loop), the audio cache,
+    the quota limiter and the retry policy are created once; AnkiConnect calls
+    all go through the default client's pooled session. Jobs are reordered
+    with schedule_jobs() so that texts recurring across decks are synthesized
+    once and served from the cache afterwards.
+
+    Args:
+        jobs: The jobs to run.
+        workers: See process_deck(). Must be >= 1.
+        async_tts: See process_deck().
+        cache: Audio cache shared by all jobs. Default None uses one
+            in-memory cache for the whole run.
+        limiter: See process_deck(); shared by all jobs.
+        retry_policy: See process_deck(); shared by all jobs.
+        metrics: Registry all jobs record into. Its summary table is logged
+            once all jobs are done. Default None uses a new registry.
+        backends: TTS backends by name, for jobs whose backend is not
+            "google". Google jobs share one lazily created client (or the
+            async runner); other jobs always synthesize on the thread pool.
+        **options: Further process_deck() keyword arguments applied to every
+            job, e.g. batch_size or journal.
+
+    Returns:
+        True if every job completed normally. A job aborted due to
+        consecutive failures stops the remaining jobs, since the usual causes
+        (credentials, quota) affect them all.
+
+    Raises:
+        ValueError: If workers is less than 1, or a job names a backend
+            missing from backends.
+    """
+    if workers < 1:
+        raise ValueError(f"workers must be >= 1, got {workers}")
+    if cache is None:
+        cache = AudioCache()
+    if limiter is None:
+        limiter = QuotaLimiter(max_concurrency=workers)
+    if retry_policy is None:
+        retry_policy = RetryPolicy()
+    if metrics is None:
+        metrics = Metrics()
+    produced_before = _audio_produced(metrics)
+    jobs = schedule_jobs(jobs)
+    job_backends = [_job_backend(job, backends) for job in jobs]
+
+    with ExitStack() as stack:
+        client = executor = async_runner = None
+        if async_tts:
+            async_runner = stack.enter_context(AsyncTTSRunner(
+                workers, client_factory=init_async_tts_client, limiter=limiter, retry_policy=retry_policy
+            ))
+        else:
+            client = LazyClient(init_tts_client)
+        if not async_tts or any(backend is not None for backend in job_backends):
+            executor = stack.enter_context(ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tts"))
+
+        completed = True
+        for number, (job, backend) in enumerate(zip(jobs, job_backends), 1):
+            if len(jobs) > 1:
+                logging.info(f"Job {number}/{len(jobs)}: {job.describe()}")
+            completed = process_deck(
+                job.deck,
+                job.text_field,
+                job.audio_field,
+                language_code=job.language,
+                overwrite=job.overwrite,
+                voice=job.voice,
+                max_cards=job.max_cards,
+                tags=job.tags,
+                note_types=job.note_types,
+                workers=workers,
+                async_tts=async_tts and backend is None,
+                cache=cache,
+                limiter=limiter,
+                retry_policy=retry_policy,
+                client=client,
+                executor=executor,
+                async_runner=async_runner,
+                metrics=metrics,
+                backend=backend,
+                **options,
+            )
+            if not completed:
+                skipped = len(jobs) - number
+                if skipped:
+                    logging.error(f"❌ Skipping the remaining {skipped} job(s).")
+                break
+
+    if len(jobs) > 1:
+        _log_audio_produced(metrics, produced_before, "Audio produced by all jobs")
+    for line in metrics.format_table():
+        logging.info(line)
+    return completed
+
+
+def plan_deck(
+    deck_name: str,
+    text_field: str,
+    audio_field: str,
+    language_code: str = "ja-JP",
+    overwrite: bool = False,
+    voice: Optional[str] = None,
+    max_cards: Optional[int] = None,
+    cache: Optional[AudioCache] = None,
+    notes_chunk_size: int = NOTES_INFO_CHUNK_SIZE,
+    tags: Optional[List[str]] = None,
+    note_types: Optional[List[str]] = None,
+    journal: Optional[RunJournal] = None,
+    normalizer: Optional[Callable[[str], str]] = None,
+    plan: Optional[RunPlan] = None,
+    backend: Optional[TTSBackend] = None,
+    postprocessor: Optional[AudioPostProcessor] = None,
+    audio_settings: Optional[AudioSettings] = None,
+) -> RunPlan:
+    """
+    Work out what process_deck() would do, without synthesizing or writing.
+
+    Runs the same fetch, filter and normalize stages and counts the texts
+    that would be synthesized, keying each distinct text only once. Neither
+    a TTS client nor credentials are needed.
+
+    Args:
+        deck_name, text_field, audio_field, language_code, overwrite, voice,
+        max_cards, notes_chunk_size, tags, note_types, journal, normalizer,
+        audio_settings: See process_deck().
+        cache: AudioCache whose entries count as cache hits. Only checked
+            for membership, never read or written.
+        plan: RunPlan to add to, e.g. one shared by several decks. Default
+            None starts a new one.
+        backend: TTSBackend the run would use; its cache keys decide the
+            cache hits. Characters and requests are only counted for billed
+            backends. Default None uses GoogleTTSBackend, whose client is
+            never created here.
+        postprocessor: AudioPostProcessor the run would use, for its cache
+            keys. Its worker processes are never started here.
+
+    Returns:
+        The plan, with this deck's notes and texts added.
+
+    Raises:
+        ValueError: If max_cards or notes_chunk_size is less than 1.
+    """
+    if max_cards is not None and max_cards < 1:
+        raise ValueError(f"max_cards must be >= 1, got {max_cards}")
+    if notes_chunk_size < 1:
+        raise ValueError(f"notes_chunk_size must be >= 1, got {notes_chunk_size}")
+    if plan is None:
+        plan = RunPlan()
+    if normalizer is None:
+        normalizer = TextNormalizer()
+
+    note_ids = get_notes_from_deck(
+        deck_name,
+        text_field=text_field,
+        audio_field=audio_field,
+        missing_audio_only=not overwrite,
+        tags=tags,
+        note_types=note_types,
+    )
+    if journal is not None and len(journal):
+        note_ids = [note_id for note_id in note_ids if not journal.is_done(note_id, audio_field)]
+    plan.notes_found += len(note_ids)
+    if not note_ids:
+        return plan
+
+    if backend is None:
+        backend = GoogleTTSBackend(settings=audio_settings)
+    billed = backend.capabilities.billed
+    tier = voice_tier(resolve_voice_name(language_code, voice)) if billed else None
+    max_input_bytes = backend.capabilities.max_input_bytes
+    splits_long_texts = backend.capabilities.splits_long_texts
+    key_for = text_cache_keyer(_cache_key_params(backend, postprocessor, language_code, voice))
+    # Normalized text -> cache key, so repeated texts are only keyed once.
+    keys: Dict[str, str] = {}
+    # Keys of uncached texts the backend could not synthesize.
+    too_long = set()
+    eligible = 0
+    notes = iter_note_info(note_ids, chunk_size=notes_chunk_size)
+    try:
+        for note in iter_notes_with_progress(notes, f"Planning deck '{deck_name}'", total=len(note_ids)):
+            if max_cards is not None and eligible >= max_cards:
                 break
+            fields = note["fields"]
+            if text_field not in fields or audio_field not in fields:
+                plan.notes_skipped += 1
+                continue
+            if not overwrite and "[sound:" in fields[audio_field]["value"]:
+                plan.notes_skipped += 1
+                continue
+            text_value = normalizer(fields[text_field]["value"])
+            if not text_value.strip():
+                plan.notes_skipped += 1
+                continue
 
-    logging.info(f"Added audio to {audio_added} card(s).")
-    if aborted:
-        logging.error(
-            f"❌ Run aborted — {consecutive_failures} consecutive synthesis failures. "
-            "Check your API credentials or quota."
+            eligible += 1
+            key = keys.get(text_value)
+            if key is None:
+                key = keys[text_value] = key_for(text_value)
+                cached = cache is not None and key in cache
+                requests = len(split_text(text_value, max_input_bytes)) if max_input_bytes else 1
+                if requests > 1 and not splits_long_texts and not cached:
+                    too_long.add(key)
+                else:
+                    plan.add_text(key, text_value, tier, cached, requests)
+            if key in too_long:
+                plan.notes_too_long += 1
+    finally:
+        notes.close()
+    plan.notes_eligible += eligible
+    return plan
+
+
+def plan_jobs(
+    jobs: List[TTSJob],
+    cache: Optional[AudioCache] = None,
+    journal: Optional[RunJournal] = None,
+    normalizer: Optional[Callable[[str], str]] = None,
+    notes_chunk_size: int = NOTES_INFO_CHUNK_SIZE,
+    backends: Optional[Dict[str, TTSBackend]] = None,
+    postprocessor: Optional[AudioPostProcessor] = None,
+    audio_settings: Optional[AudioSettings] = None,
+) -> RunPlan:
+    """
+    Plan several jobs into one RunPlan, as run_jobs() would run them.
+
+    Texts shared between decks are counted once, since run_jobs() serves the
+    later copies from its shared cache.
+
+    Args:
+        jobs: The jobs to plan.
+        cache, journal, normalizer, notes_chunk_size, postprocessor,
+        audio_settings: See plan_deck().
+        backends: See run_jobs().
+
+    Returns:
+        The combined plan.
+
+    Raises:
+        ValueError: If a job names a backend missing from backends.
+    """
+    job_backends = [_job_backend(job, backends) for job in jobs]
+    plan = RunPlan()
+    for job, backend in zip(jobs, job_backends):
+        plan_deck(
+            job.deck,
+            job.text_field,
+            job.audio_field,
+            language_code=job.language,
+            overwrite=job.overwrite,
+            voice=job.voice,
+            max_cards=job.max_cards,
+            cache=cache,
+            notes_chunk_size=notes_chunk_size,
+            tags=job.tags,
+            note_types=job.note_types,
+            journal=journal,
+            normalizer=normalizer,
+            plan=plan,
+            backend=backend,
+            postprocessor=postprocessor,
+            audio_settings=audio_settings,
         )
-    else:
-        logging.info("✅ Finished processing deck.")
-    return not aborted
+    return plan
+
+
+def _build_normalizer(raw_text: bool, furigana: str) -> Callable[[str], str]:
+    """Return the text normalizer selected by --raw-text and --furigana."""
+    if raw_text:
+        return str
+    if furigana == "reading":
+        return TextNormalizer([
+            "furigana-reading" if step == "furigana" else step for step in DEFAULT_STEPS
+        ])
+    return TextNormalizer()
+
+
+def _counts_since(before: Dict[str, int], after: Dict[str, int]) -> Dict[str, int]:
+    """Return the per-category increase from before to after, omitting zeros."""
+    return {key: n - before.get(key, 0) for key, n in after.items() if n > before.get(key, 0)}
 
 
 def _positive_int(value: str) -> int:
@@ -136,15 +1074,104 @@ def _positive_int(value: str) -> int:
     return ivalue
 
 
+def _non_negative_int(value: str) -> int:
+    try:
+        ivalue = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a non-negative integer, got {value!r}")
+    if ivalue < 0:
+        raise argparse.ArgumentTypeError(f"must be a non-negative integer, got {value}")
+    return ivalue
+
+
+def _step_list(value: str) -> List[str]:
+    """argparse type for a comma-separated list of post-processing steps."""
+    steps = [step.strip() for step in value.split(",") if step.strip()]
+    unknown = [step for step in steps if step not in POSTPROCESSING_STEPS]
+    if not steps or unknown:
+        raise argparse.ArgumentTypeError(
+            f"expected steps from {', '.join(POSTPROCESSING_STEPS)} separated by commas, got {value!r}"
+        )
+    return steps
+
+
+def _action_timeout(value: str) -> Tuple[str, float]:
+    action, sep, seconds = value.partition("=")
+    try:
+        timeout = float(seconds)
+    except ValueError:
+        timeout = 0.0
+    if not sep or not action or timeout <= 0:
+        raise argparse.ArgumentTypeError(f"expected ACTION=SECONDS with SECONDS > 0, got {value!r}")
+    return action, timeout
+
+
 if __name__ == "__main__":
 
     parser = argparse.ArgumentParser(description="Add Google TTS audio to Anki deck.")
-    parser.add_argument("deck", help="Name of the Anki deck to process")
-    parser.add_argument("--text-field", required=True, help="Anki deck field name containing the input text")
-    parser.add_argument("--audio-field", required=True, help="Anki deck field name where audio will be added")
+    parser.add_argument("deck", nargs="?", help="Name of the Anki deck to process (omit with --jobs)")
+    parser.add_argument(
+        "--jobs",
+        default=None,
+        metavar="FILE",
+        help="JSON, TOML or YAML file listing several decks to process in one run. Per-deck options given on the command line act as defaults for every job.",
+    )
+    parser.add_argument("--text-field", help="Anki deck field name containing the input text")
+    parser.add_argument("--audio-field", help="Anki deck field name where audio will be added")
     parser.add_argument("--language", default=DEFAULT_LANGUAGE, help=f"Language code (default: {DEFAULT_LANGUAGE})")
     parser.add_argument("--overwrite", action="store_true", help="Replace existing audio")
     parser.add_argument("--voice", default=None, help="Google TTS voice name")
+    parser.add_argument(
+        "--audio-encoding",
+        choices=list(AUDIO_ENCODINGS),
+        default=TTS_AUDIO_ENCODING,
+        help=f"Audio format Google TTS returns: MP3 (.mp3), OGG_OPUS (.ogg, much smaller) or LINEAR16 (.wav, uncompressed). Default: {TTS_AUDIO_ENCODING}.",
+    )
+    parser.add_argument(
+        "--sample-rate",
+        type=_positive_int,
+        default=TTS_SAMPLE_RATE,
+        metavar="HZ",
+        help="Sample rate of Google TTS audio, e.g. 16000 for smaller files. Default: $TTS_SAMPLE_RATE, or the voice's native rate.",
+    )
+    parser.add_argument(
+        "--speaking-rate",
+        type=float,
+        default=TTS_SPEAKING_RATE,
+        help="Google TTS speaking speed from 0.25 to 4.0, where 1.0 is normal. Default: $TTS_SPEAKING_RATE, or 1.0.",
+    )
+    parser.add_argument(
+        "--effects-profile",
+        action="append",
+        default=None,
+        metavar="PROFILE",
+        help="Google TTS audio profile to optimize for, e.g. handset-class-device or headphone-class-device. Can be repeated. Default: $TTS_EFFECTS_PROFILE, or none.",
+    )
+    parser.add_argument(
+        "--tag",
+        dest="tags",
+        action="append",
+        default=None,
+        help="Only process notes with this tag. Can be repeated to match any of several tags.",
+    )
+    parser.add_argument(
+        "--note-type",
+        dest="note_types",
+        action="append",
+        default=None,
+        help="Only process notes of this note type. Can be repeated.",
+    )
+    parser.add_argument(
+        "--furigana",
+        choices=["kanji", "reading"],
+        default="kanji",
+        help="How to speak furigana such as 漢字[かんじ]: the kanji, or the bracketed reading. Default: kanji.",
+    )
+    parser.add_argument(
+        "--raw-text",
+        action="store_true",
+        help="Send the text field to Google TTS as-is, without removing HTML, cloze markers or furigana.",
+    )
     parser.add_argument(
         "--max-cards",
         type=_positive_int,
@@ -157,6 +1184,183 @@ if __name__ == "__main__":
         default=3,
         help="Abort after this many consecutive synthesis failures. A successful addition resets the counter. Default: 3.",
     )
+    parser.add_argument(
+        "--workers",
+        type=_positive_int,
+        default=None,
+        help="Number of notes to synthesize concurrently. Audio is still added in deck order. Default: 1, or --local-processes with the local backend.",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=["google", "local"],
+        default=None,
+        help="TTS engine: Google Cloud ('google', default) or a local command-line engine such as espeak-ng or Piper ('local'). Job files can set it per job.",
+    )
+    parser.add_argument(
+        "--local-command",
+        default=LOCAL_TTS_COMMAND,
+        help=f"Command the local backend runs per text, reading the text on stdin; {{voice}}, {{language}} and {{output}} are filled in (default: {LOCAL_TTS_COMMAND!r})",
+    )
+    parser.add_argument(
+        "--local-format",
+        default=LOCAL_TTS_FORMAT,
+        help=f"File extension of the audio the local command writes (default: {LOCAL_TTS_FORMAT})",
+    )
+    parser.add_argument(
+        "--local-processes",
+        type=_positive_int,
+        default=None,
+        help="Local engines running at once (default: one per CPU core)",
+    )
+    parser.add_argument(
+        "--postprocess",
+        type=_step_list,
+        default=None,
+        metavar="STEPS",
+        help="Post-process new audio in worker processes, e.g. trim,normalize,opus: 'trim' cuts silence from both ends and 'normalize' evens out loudness (both for WAV audio, e.g. from --backend local); 'opus' transcodes to Ogg Opus with ffmpeg.",
+    )
+    parser.add_argument(
+        "--postprocess-processes",
+        type=_positive_int,
+        default=None,
+        help="Worker processes for --postprocess (default: one per CPU core)",
+    )
+    parser.add_argument(
+        "--async",
+        dest="async_tts",
+        action="store_true",
+        help="Use the asyncio Google TTS client: --workers requests are kept in flight from one thread. Suited to --workers in the hundreds.",
+    )
+    parser.add_argument(
+        "--requests-per-minute",
+        type=_positive_int,
+        default=TTS_REQUESTS_PER_MINUTE,
+        help="Client-side limit on Google TTS requests per minute. Default: $TTS_REQUESTS_PER_MINUTE, or unlimited.",
+    )
+    parser.add_argument(
+        "--characters-per-minute",
+        type=_positive_int,
+        default=TTS_CHARACTERS_PER_MINUTE,
+        help="Client-side limit on characters sent to Google TTS per minute. Default: $TTS_CHARACTERS_PER_MINUTE, or unlimited.",
+    )
+    parser.add_argument(
+        "--max-retries",
+        type=_non_negative_int,
+        default=RETRY_MAX_ATTEMPTS - 1,
+        help=f"Retries per request after transient Google TTS or AnkiConnect errors. 0 disables retries. Default: {RETRY_MAX_ATTEMPTS - 1}.",
+    )
+    parser.add_argument(
+        "--retry-budget",
+        type=float,
+        default=RETRY_TIME_BUDGET,
+        help=f"Maximum seconds spent retrying a single request. Default: {RETRY_TIME_BUDGET:g}.",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=_positive_int,
+        default=1,
+        help="Number of note updates sent to AnkiConnect per request. Default: 1.",
+    )
+    parser.add_argument(
+        "--batch-max-mb",
+        type=_positive_int,
+        default=16,
+        help="Maximum audio payload per AnkiConnect batch request in MB. Default: 16.",
+    )
+    parser.add_argument(
+        "--upload-mode",
+        choices=UPLOAD_MODES,
+        default="inline",
+        help="How audio reaches Anki: 'inline' sends it base64-encoded over HTTP; 'path' writes a local file that AnkiConnect reads itself, for Anki running on this machine. Default: inline.",
+    )
+    parser.add_argument(
+        "--media-dir",
+        default=None,
+        help="Directory for the audio files of --upload-mode path; each file is removed once Anki has copied it. Default: the --cache-dir files.",
+    )
+    parser.add_argument(
+        "--filename-mode",
+        choices=FILENAME_MODES,
+        default="note",
+        help="Name audio files per note and field ('note'), or after their content ('content', e.g. tts_<hash>.mp3) so notes with the same text share one file. Default: note.",
+    )
+    parser.add_argument(
+        "--reuse-media",
+        action="store_true",
+        help="Skip synthesis and upload for notes whose audio file Anki already holds with the right content, e.g. with --overwrite. Content-named files are recognized by name; note-named files need --media-manifest.",
+    )
+    parser.add_argument(
+        "--media-manifest",
+        default=None,
+        metavar="PATH",
+        help="File recording which audio each uploaded media file holds, kept across runs so --reuse-media can recognize note-named files.",
+    )
+    parser.add_argument(
+        "--notes-chunk-size",
+        type=_positive_int,
+        default=NOTES_INFO_CHUNK_SIZE,
+        help=f"Number of notes fetched from AnkiConnect per request. Default: {NOTES_INFO_CHUNK_SIZE}.",
+    )
+    parser.add_argument(
+        "--anki-timeout",
+        type=float,
+        default=ANKI_CONNECT_TIMEOUT,
+        help=f"AnkiConnect request timeout in seconds. Default: {ANKI_CONNECT_TIMEOUT:g}.",
+    )
+    parser.add_argument(
+        "--anki-action-timeout",
+        type=_action_timeout,
+        action="append",
+        default=[],
+        metavar="ACTION=SECONDS",
+        help="Timeout override for one AnkiConnect action, e.g. multi=300. Can be repeated.",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=AUDIO_CACHE_DIR,
+        help="Directory for a persistent audio cache reused across runs. Default: $AUDIO_CACHE_DIR, or no persistent cache.",
+    )
+    parser.add_argument(
+        "--cache-max-mb",
+        type=_positive_int,
+        default=AUDIO_CACHE_MAX_MB,
+        help=f"Size limit of the persistent audio cache in MB; least recently used audio is evicted first. Default: {AUDIO_CACHE_MAX_MB}.",
+    )
+    parser.add_argument(
+        "--journal",
+        default=None,
+        help="Record completed notes in this file so an interrupted run can be continued with --resume.",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip notes the --journal file records as done, without fetching them from Anki. Without --resume the journal is started afresh.",
+    )
+    parser.add_argument(
+        "--metrics-json",
+        default=None,
+        metavar="PATH",
+        help="Write per-stage timings (p50/p95/p99), counters and throughput for the run to this JSON file.",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=_positive_int,
+        default=None,
+        metavar="PORT",
+        help="Serve live OpenMetrics/Prometheus metrics at http://HOST:PORT/metrics while the run lasts.",
+    )
+    parser.add_argument(
+        "--metrics-host",
+        default="127.0.0.1",
+        metavar="HOST",
+        help="Interface to serve --metrics-port on (default: 127.0.0.1, this machine only). "
+        "Use 0.0.0.0 to let other machines scrape it; the endpoint has no authentication.",
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="Report what the run would do (notes needing audio, unique texts, cache hits, billed characters per voice tier and an estimated duration) without synthesizing or changing anything",
+    )
     parser.add_argument(
         "--log-level",
         default="INFO",
@@ -165,21 +1369,145 @@ if __name__ == "__main__":
     )
 
     args = parser.parse_args()
+    if args.jobs and args.deck:
+        parser.error("give either a deck or --jobs, not both")
+    if not args.jobs and not (args.deck and args.text_field and args.audio_field):
+        parser.error("deck, --text-field and --audio-field are required unless --jobs is given")
+    if args.resume and not args.journal:
+        parser.error("--resume requires --journal")
+    if args.upload_mode == "path" and not (args.media_dir or args.cache_dir):
+        parser.error("--upload-mode path requires --media-dir or --cache-dir")
     
+    try:
+        audio_settings = AudioSettings(
+            args.audio_encoding,
+            args.sample_rate,
+            args.speaking_rate,
+            args.effects_profile if args.effects_profile is not None else TTS_EFFECTS_PROFILE,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+
     handler = TqdmLoggingHandler()
     handler.setFormatter(logging.Formatter("%(levelname)s: %(message)s"))
     logging.root.handlers = [handler]
     logging.root.setLevel(getattr(logging, args.log_level.upper()))
 
-    success = process_deck(
-        args.deck,
-        args.text_field,
-        args.audio_field,
-        language_code=args.language,
-        overwrite=args.overwrite,
+    set_default_client(AnkiConnectClient(
+        timeout=args.anki_timeout,
+        action_timeouts={**ANKI_CONNECT_ACTION_TIMEOUTS, **dict(args.anki_action_timeout)},
+        retry_policy=RetryPolicy(max_attempts=args.max_retries + 1, time_budget=args.retry_budget),
+    ))
+    cache = AudioCache(args.cache_dir, max_bytes=args.cache_max_mb * 1024 * 1024) if args.cache_dir else None
+
+    job_options = dict(
+        text_field=args.text_field,
+        audio_field=args.audio_field,
+        language=args.language,
         voice=args.voice,
+        overwrite=args.overwrite,
+        tags=args.tags,
+        note_types=args.note_types,
         max_cards=args.max_cards,
-        max_consecutive_failures=args.max_consecutive_failures,
+        backend=args.backend,
     )
+    try:
+        jobs = load_jobs(args.jobs, defaults=job_options) if args.jobs else [TTSJob(deck=args.deck, **job_options)]
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    unknown_backends = sorted({job.backend for job in jobs} - {None, "google", "local"})
+    if unknown_backends:
+        parser.error(f"unknown backend(s) {', '.join(unknown_backends)}; use google or local")
+    backends = {}
+    if any(job.backend == "local" for job in jobs):
+        try:
+            backends["local"] = SubprocessBackend(args.local_command, args.local_format, args.local_processes)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+    postprocessor = None
+    if args.postprocess:
+        try:
+            postprocessor = AudioPostProcessor(args.postprocess, args.postprocess_processes)
+            for job in jobs:
+                backend = backends.get(job.backend) or GoogleTTSBackend(settings=audio_settings)
+                postprocessor.output_format(backend.capabilities.audio_format)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+    if args.workers is None:
+        # Enough threads to keep every local engine busy.
+        args.workers = backends["local"].capabilities.concurrency if backends else 1
+
+    if args.plan:
+        # Only read an existing journal; opening it for a new run would truncate it.
+        resume_journal = args.resume and os.path.exists(args.journal)
+        journal = RunJournal(args.journal, resume=True) if resume_journal else None
+        try:
+            plan = plan_jobs(
+                jobs,
+                cache=cache,
+                journal=journal,
+                normalizer=_build_normalizer(args.raw_text, args.furigana),
+                notes_chunk_size=args.notes_chunk_size,
+                backends=backends,
+                postprocessor=postprocessor,
+                audio_settings=audio_settings,
+            )
+        finally:
+            if journal is not None:
+                journal.close()
+        for line in plan.format_table(args.workers, args.requests_per_minute, args.characters_per_minute):
+            logging.info(line)
+        if plan.notes_too_long:
+            logging.warning(
+                f"{plan.notes_too_long} note(s) have text over the request limit, which can only be split "
+                "for MP3 output; the run would fail them."
+            )
+        sys.exit(0)
+
+    journal = RunJournal(args.journal, resume=args.resume) if args.journal else None
+    manifest = MediaManifest(args.media_manifest) if args.media_manifest else None
+    metrics = Metrics()
+    metrics_server = MetricsServer(metrics, args.metrics_port, args.metrics_host).start() if args.metrics_port else None
+
+    try:
+        success = run_jobs(
+            jobs,
+            max_consecutive_failures=args.max_consecutive_failures,
+            workers=args.workers,
+            cache=cache,
+            batch_size=args.batch_size,
+            batch_max_bytes=args.batch_max_mb * 1024 * 1024,
+            notes_chunk_size=args.notes_chunk_size,
+            upload_mode=args.upload_mode,
+            media_dir=args.media_dir,
+            filename_mode=args.filename_mode,
+            manifest=manifest,
+            reuse_media=args.reuse_media,
+            async_tts=args.async_tts,
+            limiter=QuotaLimiter(
+                requests_per_minute=args.requests_per_minute,
+                characters_per_minute=args.characters_per_minute,
+                max_concurrency=args.workers,
+            ),
+            retry_policy=RetryPolicy(max_attempts=args.max_retries + 1, time_budget=args.retry_budget),
+            journal=journal,
+            normalizer=_build_normalizer(args.raw_text, args.furigana),
+            metrics=metrics,
+            backends=backends,
+            postprocessor=postprocessor,
+            audio_settings=audio_settings,
+        )
+    finally:
+        if postprocessor is not None:
+            postprocessor.close()
+        if journal is not None:
+            journal.close()
+        if manifest is not None:
+            manifest.close()
+        if args.metrics_json:
+            metrics.write_json(args.metrics_json)
+        if metrics_server is not None:
+            metrics_server.stop()
     if not success:
         sys.exit(1)
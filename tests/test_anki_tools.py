@@ -1,5 +1,10 @@
 import pytest
-from anki_tts.anki_tools import invoke, get_notes_from_deck, get_note_info, add_audio_to_note
+from anki_tts import anki_tools
+from anki_tts.metrics import Metrics, use_metrics
+from anki_tts.retry import RetryPolicy
+import base64
+import json
+from anki_tts.anki_tools import invoke, get_notes_from_deck, get_note_info, add_audio_to_note, add_audio_file_to_note, NoteUpdateBatcher, AnkiConnectClient, iter_note_info, build_note_query, Base64Audio, JSONBody
 
 # =========================
 # AnkiConnect - invoke
@@ -13,7 +18,7 @@ def test_invoke_success(mocker) -> None:
         def raise_for_status(self) -> None:
             return None  # no-op for success
 
-    mocker.patch("requests.post", return_value=MockResponse())
+    mocker.patch("requests.Session.post", return_value=MockResponse())
     result = invoke("someAction", param=1)
     assert result == 123
 
@@ -27,11 +32,97 @@ def test_invoke_error(mocker) -> None:
         def raise_for_status(self) -> None:
             return None  # no-op
 
-    mocker.patch("requests.post", return_value=MockResponse())
+    mocker.patch("requests.Session.post", return_value=MockResponse())
     with pytest.raises(RuntimeError):
         invoke("someAction", param=1)
 
 
+class _OkResponse:
+    def json(self) -> dict:
+        return {"result": "ok", "error": None}
+
+    def raise_for_status(self) -> None:
+        return None
+
+
+def test_client_uses_per_action_timeout(mocker) -> None:
+    """Test that AnkiConnectClient applies per-action timeouts and falls back to the default."""
+    mock_post = mocker.patch("requests.Session.post", return_value=_OkResponse())
+    client = AnkiConnectClient(url="http://anki.test", timeout=5, action_timeouts={"multi": 90})
+
+    client.invoke("multi", actions=[])
+    client.invoke("findNotes", query="deck:x")
+
+    assert mock_post.call_args_list[0].kwargs["timeout"] == 90
+    assert mock_post.call_args_list[1].kwargs["timeout"] == 5
+    assert mock_post.call_args_list[1].args[0] == "http://anki.test"
+
+
+def test_client_reuses_one_session(mocker) -> None:
+    """Test that repeated calls go through the same pooled session."""
+    mock_post = mocker.patch("requests.Session.post", return_value=_OkResponse())
+    client = AnkiConnectClient()
+
+    client.invoke("version")
+    client.invoke("version")
+
+    assert mock_post.call_count == 2
+    assert client.session.get_adapter("http://localhost:8765") is client.session.get_adapter("http://127.0.0.1:1")
+
+
+def test_client_retries_transient_connection_errors(mocker) -> None:
+    """Test that a dropped connection is retried before the call fails."""
+    import requests
+    mock_post = mocker.patch(
+        "requests.Session.post",
+        side_effect=[requests.ConnectionError("connection reset"), _OkResponse()],
+    )
+    policy = RetryPolicy(sleep=lambda seconds: None)
+    client = AnkiConnectClient(retry_policy=policy)
+
+    assert client.invoke("version") == "ok"
+    assert mock_post.call_count == 2
+    assert policy.snapshot() == {"connection": 1}
+
+
+def test_client_does_not_retry_anki_errors(mocker) -> None:
+    """Test that a permanent AnkiConnect error is raised without retrying."""
+    class MockResponse(_OkResponse):
+        def json(self) -> dict:
+            return {"result": None, "error": "note was not found"}
+
+    mock_post = mocker.patch("requests.Session.post", return_value=MockResponse())
+    client = AnkiConnectClient(retry_policy=RetryPolicy(sleep=lambda seconds: None))
+
+    with pytest.raises(RuntimeError):
+        client.invoke("updateNote", note={})
+    assert mock_post.call_count == 1
+
+
+def test_client_times_each_action(mocker) -> None:
+    """Test that AnkiConnect calls are timed per action while metrics are active."""
+    mocker.patch("requests.Session.post", return_value=_OkResponse())
+    client = AnkiConnectClient()
+    metrics = Metrics()
+
+    with use_metrics(metrics):
+        client.invoke("findNotes", query="deck:x")
+        client.invoke("notesInfo", notes=[1])
+        client.invoke("notesInfo", notes=[2])
+
+    assert {stage: h.count for stage, h in metrics.stages.items()} == {"findNotes": 1, "notesInfo": 2}
+
+
+def test_invoke_delegates_to_default_client(mocker) -> None:
+    """Test that module-level invoke() goes through the replaceable default client."""
+    fake_client = mocker.MagicMock()
+    fake_client.invoke.return_value = 42
+    mocker.patch.object(anki_tools, "_default_client", fake_client)
+
+    assert invoke("version") == 42
+    fake_client.invoke.assert_called_once_with("version")
+
+
 # =========================
 # AnkiConnect - get_notes_from_deck
 # =========================
@@ -43,6 +134,41 @@ def test_get_notes_from_deck(mocker) -> None:
     assert notes == [1, 2, 3]
 
 
+def test_get_notes_from_deck_pushes_filters_into_query(mocker) -> None:
+    """Test that get_notes_from_deck() sends the filters to Anki as part of the query."""
+    mock_invoke = mocker.patch("anki_tts.anki_tools.invoke", return_value=[7])
+    get_notes_from_deck("My Deck", text_field="Sentence", audio_field="Audio", missing_audio_only=True)
+    mock_invoke.assert_called_once_with(
+        "findNotes", query='"deck:My Deck" "Sentence:_*" -"Audio:*[sound:*"'
+    )
+
+
+# =========================
+# AnkiConnect - build_note_query
+# =========================
+def test_build_note_query_deck_only() -> None:
+    """Test that with no filters the query only selects the deck."""
+    assert build_note_query("My Deck") == '"deck:My Deck"'
+
+
+def test_build_note_query_keeps_audio_filter_off_when_overwriting() -> None:
+    """Test that notes with existing audio are still matched unless missing_audio_only is set."""
+    query = build_note_query("Deck", text_field="Sentence", audio_field="Audio")
+    assert query == '"deck:Deck" "Sentence:_*"'
+
+
+def test_build_note_query_tags_and_note_types() -> None:
+    """Test that several tags are OR-ed together and combined with the note type."""
+    query = build_note_query("Deck", tags=["n5", "n4"], note_types=["Japanese (recognition)"])
+    assert query == '"deck:Deck" ("tag:n5" OR "tag:n4") "note:Japanese (recognition)"'
+
+
+def test_build_note_query_escapes_special_characters() -> None:
+    """Test that wildcards, quotes and field-name colons are escaped."""
+    query = build_note_query('Vocab_"A"*', text_field="Front:JP", audio_field="Audio", missing_audio_only=True)
+    assert query == '"deck:Vocab\\_\\"A\\"\\*" "Front\\:JP:_*" -"Audio:*[sound:*"'
+
+
 # =========================
 # AnkiConnect - get_note_info
 # =========================
@@ -54,6 +180,49 @@ def test_get_note_info(mocker) -> None:
     assert notes[0]["noteId"] == 1
 
 
+# =========================
+# AnkiConnect - iter_note_info
+# =========================
+def _fake_notes_info(note_ids):
+    return [{"noteId": note_id} for note_id in note_ids]
+
+
+@pytest.mark.parametrize("prefetch", [True, False])
+def test_iter_note_info_fetches_in_chunks(mocker, prefetch) -> None:
+    """Test that iter_note_info() requests notesInfo chunk by chunk and preserves order."""
+    mock_get = mocker.patch("anki_tts.anki_tools.get_note_info", side_effect=_fake_notes_info)
+
+    notes = list(iter_note_info([5, 4, 3, 2, 1], chunk_size=2, prefetch=prefetch))
+
+    assert [n["noteId"] for n in notes] == [5, 4, 3, 2, 1]
+    assert [c.args[0] for c in mock_get.call_args_list] == [[5, 4], [3, 2], [1]]
+
+
+def test_iter_note_info_is_lazy(mocker) -> None:
+    """Test that nothing beyond the next chunk is fetched before it is needed."""
+    mock_get = mocker.patch("anki_tts.anki_tools.get_note_info", side_effect=_fake_notes_info)
+
+    notes = iter_note_info(list(range(100)), chunk_size=10)
+    first = next(notes)
+    notes.close()
+
+    assert first["noteId"] == 0
+    assert mock_get.call_count <= 2  # current chunk plus at most one prefetch
+
+
+def test_iter_note_info_empty(mocker) -> None:
+    """Test that an empty ID list yields nothing and makes no request."""
+    mock_get = mocker.patch("anki_tts.anki_tools.get_note_info")
+    assert list(iter_note_info([])) == []
+    mock_get.assert_not_called()
+
+
+def test_iter_note_info_invalid_chunk_size_raises() -> None:
+    """Test that a non-positive chunk size raises ValueError."""
+    with pytest.raises(ValueError, match="chunk_size must be >= 1"):
+        list(iter_note_info([1], chunk_size=0))
+
+
 # =========================
 # AnkiConnect - add_audio_to_note
 # =========================
@@ -62,3 +231,230 @@ def test_add_audio_to_note(mocker) -> None:
     mocker.patch("anki_tts.anki_tools.invoke", return_value=True)
     result = add_audio_to_note(1, "Front", "test.mp3", b"fakebytes")
     assert result is True
+
+
+def test_add_audio_to_note_replaces_existing_file(mocker) -> None:
+    """Test that the audio entry replaces a clashing media file instead of being stored under another name."""
+    mock_invoke = mocker.patch("anki_tts.anki_tools.invoke")
+    add_audio_to_note(1, "Audio", "1_Audio.mp3", b"new")
+
+    entry = mock_invoke.call_args.kwargs["note"]["audio"][0]
+    assert entry["filename"] == "1_Audio.mp3"
+    assert entry["deleteExisting"] is True
+
+
+def test_add_audio_file_to_note_stores_then_references(mocker, tmp_path) -> None:
+    """Test that a file upload stores the media by path, then points the field at it."""
+    mock_invoke = mocker.patch("anki_tts.anki_tools.invoke")
+    path = tmp_path / "1_Audio.mp3"
+
+    add_audio_file_to_note(1, "Audio", "1_Audio.mp3", str(path))
+
+    store, update = mock_invoke.call_args_list
+    assert store.args == ("storeMediaFile",)
+    assert store.kwargs == {"filename": "1_Audio.mp3", "path": str(path), "deleteExisting": True}
+    assert update.args == ("updateNoteFields",)
+    assert update.kwargs == {"note": {"id": 1, "fields": {"Audio": "[sound:1_Audio.mp3]"}}}
+
+
+# =========================
+# AnkiConnect - streaming JSON body
+# =========================
+@pytest.mark.parametrize("size", [0, 1, 2, 3, anki_tools.BASE64_CHUNK_BYTES - 1, anki_tools.BASE64_CHUNK_BYTES * 2 + 1])
+def test_json_body_matches_buffered_encoding(size) -> None:
+    """Test that a streamed body is byte-for-byte the JSON of the base64-encoded payload."""
+    audio = bytes(i % 251 for i in range(size))
+    payload = {"action": "updateNote", "params": {"note": {"fields": {"Audio": "é"}, "audio": [{"data": Base64Audio(audio)}]}}}
+    expected = json.dumps({
+        "action": "updateNote",
+        "params": {"note": {"fields": {"Audio": "é"}, "audio": [{"data": base64.b64encode(audio).decode()}]}},
+    }).encode()
+
+    body = JSONBody(payload)
+
+    assert b"".join(body) == expected
+    assert len(body) == len(expected)
+    assert b"".join(body) == expected  # iterable again for retries
+
+
+def test_json_body_ignores_lookalike_strings() -> None:
+    """Test that a real string shaped like the audio placeholder is left alone."""
+    payload = {"fields": {"\\u0000audio:0": "\0audio:0"}, "data": Base64Audio(b"abc")}
+    assert json.loads(b"".join(JSONBody(payload))) == {"fields": {"\\u0000audio:0": "\0audio:0"}, "data": "YWJj"}
+
+
+def test_json_body_rejects_unserializable_values() -> None:
+    """Test that values JSON cannot encode still raise TypeError."""
+    with pytest.raises(TypeError):
+        JSONBody({"x": object()})
+
+
+def test_client_streams_audio_with_content_length(mocker) -> None:
+    """Test that uploads are posted as a sized JSONBody instead of a json= dict."""
+    mock_post = mocker.patch("requests.Session.post", return_value=_OkResponse())
+    client = AnkiConnectClient()
+    metrics = Metrics()
+
+    with use_metrics(metrics):
+        client.invoke("updateNote", note={"audio": [{"data": Base64Audio(b"abc")}]})
+        body = mock_post.call_args.kwargs["data"]
+        assert json.loads(b"".join(body))["params"]["note"]["audio"][0]["data"] == "YWJj"
+
+    assert mock_post.call_args.kwargs["headers"]["Content-Type"] == "application/json"
+    assert metrics.stages["base64"].count == 1
+
+
+# =========================
+# AnkiConnect - NoteUpdateBatcher
+# =========================
+def test_batcher_sends_multi_when_full(mocker) -> None:
+    """Test that a batch is sent as one multi call once max_notes updates are queued."""
+    mock_invoke = mocker.patch("anki_tts.anki_tools.invoke", return_value=[{"result": None, "error": None}] * 2)
+    batcher = NoteUpdateBatcher(max_notes=2)
+
+    assert batcher.add(1, "Audio", "1_Audio.mp3", b"a") == []
+    assert len(batcher) == 1
+    outcomes = batcher.add(2, "Audio", "2_Audio.mp3", b"b")
+
+    assert outcomes == [(1, None), (2, None)]
+    assert len(batcher) == 0
+    mock_invoke.assert_called_once()
+    actions = mock_invoke.call_args.kwargs["actions"]
+    assert [a["action"] for a in actions] == ["updateNote", "updateNote"]
+    assert actions[1]["params"]["note"]["id"] == 2
+    body = json.loads(b"".join(JSONBody(actions)))
+    assert body[1]["params"]["note"]["audio"][0]["data"] == "Yg=="
+
+
+def test_batcher_flushes_before_exceeding_byte_limit(mocker) -> None:
+    """Test that an update which would overflow max_bytes starts a new batch."""
+    mock_invoke = mocker.patch("anki_tts.anki_tools.invoke", return_value=[{"result": None, "error": None}])
+    batcher = NoteUpdateBatcher(max_notes=10, max_bytes=8)
+
+    batcher.add(1, "Audio", "1_Audio.mp3", b"abc")   # 4 base64 bytes
+    outcomes = batcher.add(2, "Audio", "2_Audio.mp3", b"abcdef")  # 8 more: too big together
+
+    assert outcomes == [(1, None)]
+    assert len(batcher) == 1
+    assert mock_invoke.call_args.kwargs["actions"][0]["params"]["note"]["id"] == 1
+
+
+def test_batcher_maps_item_errors_to_note_ids(mocker) -> None:
+    """Test that per-action errors in a multi response are reported against the right notes."""
+    mocker.patch("anki_tts.anki_tools.invoke", return_value=[
+        {"result": None, "error": None},
+        {"result": None, "error": "note was not found: 2"},
+        {"result": None, "error": None},
+    ])
+    batcher = NoteUpdateBatcher(max_notes=10)
+    for note_id in (1, 2, 3):
+        batcher.add(note_id, "Audio", f"{note_id}_Audio.mp3", b"x")
+
+    outcomes = batcher.flush()
+
+    assert [note_id for note_id, _ in outcomes] == [1, 2, 3]
+    assert outcomes[0][1] is None and outcomes[2][1] is None
+    assert "note was not found: 2" in str(outcomes[1][1])
+
+
+def test_batcher_retries_transient_item_errors(mocker) -> None:
+    """Test that only the items failing with a transient error are sent again, and then succeed."""
+    client = AnkiConnectClient(retry_policy=RetryPolicy(sleep=lambda seconds: None))
+    mocker.patch.object(anki_tools, "_default_client", client)
+    mock_invoke = mocker.patch("anki_tts.anki_tools.invoke", side_effect=[
+        [
+            {"result": None, "error": None},
+            {"result": None, "error": "collection is not available"},
+            {"result": None, "error": "note was not found: 3"},
+        ],
+        [{"result": None, "error": None}],
+    ])
+    batcher = NoteUpdateBatcher(max_notes=10)
+    for note_id in (1, 2, 3):
+        batcher.add(note_id, "Audio", f"{note_id}_Audio.mp3", b"x")
+
+    outcomes = batcher.flush()
+
+    assert outcomes[:2] == [(1, None), (2, None)]
+    assert "note was not found: 3" in str(outcomes[2][1])
+    retried = mock_invoke.call_args_list[1].kwargs["actions"]
+    assert [a["params"]["note"]["id"] for a in retried] == [2]
+
+
+def test_batcher_request_failure_fails_every_note(mocker) -> None:
+    """Test that a failed multi call is reported against every note in the batch."""
+    mocker.patch("anki_tts.anki_tools.invoke", side_effect=RuntimeError("connection refused"))
+    batcher = NoteUpdateBatcher(max_notes=10)
+    batcher.add(1, "Audio", "1_Audio.mp3", b"x")
+    batcher.add(2, "Audio", "2_Audio.mp3", b"y")
+
+    outcomes = batcher.flush()
+
+    assert [note_id for note_id, _ in outcomes] == [1, 2]
+    assert all(isinstance(error, RuntimeError) for _, error in outcomes)
+
+
+def test_batcher_flush_empty_is_noop(mocker) -> None:
+    """Test that flushing an empty batcher makes no request."""
+    mock_invoke = mocker.patch("anki_tts.anki_tools.invoke")
+    assert NoteUpdateBatcher().flush() == []
+    mock_invoke.assert_not_called()
+
+
+def test_batcher_skips_field_update_when_store_fails(mocker) -> None:
+    """Test that a note whose media file could not be stored keeps its field untouched."""
+    mock_invoke = mocker.patch("anki_tts.anki_tools.invoke", side_effect=[
+        [{"result": "1.mp3", "error": None}, {"result": None, "error": "file not found"}],
+        [{"result": None, "error": None}],
+    ])
+    batcher = NoteUpdateBatcher(max_notes=10)
+    batcher.add_file(1, "Audio", "1.mp3", "/tmp/1.mp3")
+    batcher.add_file(2, "Audio", "2.mp3", "/tmp/2.mp3")
+
+    outcomes = batcher.flush()
+
+    assert outcomes[0] == (1, None)
+    assert "file not found" in str(outcomes[1][1])
+    updates = mock_invoke.call_args_list[1].kwargs["actions"]
+    assert [a["params"]["note"]["id"] for a in updates] == [1]
+
+
+def test_batcher_reference_fails_with_its_store(mocker) -> None:
+    """Test that references to a media file whose store failed in the same batch are not sent."""
+    mock_invoke = mocker.patch("anki_tts.anki_tools.invoke", side_effect=[
+        [{"result": None, "error": "disk full"}],
+        [{"result": None, "error": None}],
+    ])
+    batcher = NoteUpdateBatcher(max_notes=10)
+    batcher.add_file(1, "Audio", "tts_a.mp3", audio_data=b"abc")
+    batcher.add_reference(2, "Audio", "tts_a.mp3")
+    batcher.add_reference(3, "Audio", "tts_b.mp3")
+
+    outcomes = batcher.flush()
+
+    assert "disk full" in str(outcomes[0][1])
+    assert "tts_a.mp3 was not stored" in str(outcomes[1][1])
+    assert outcomes[2] == (3, None)
+    stores = mock_invoke.call_args_list[0].kwargs["actions"]
+    assert json.loads(b"".join(JSONBody(stores)))[0]["params"]["data"] == "YWJj"
+    updates = mock_invoke.call_args_list[1].kwargs["actions"]
+    assert [a["params"]["note"]["id"] for a in updates] == [3]
+
+
+def test_batcher_reference_moves_with_oversized_store(mocker) -> None:
+    """Test that references queued ahead of a store that starts a new batch fail with that store."""
+    mock_invoke = mocker.patch("anki_tts.anki_tools.invoke", side_effect=[
+        [{"result": None, "error": None}],
+        [{"result": None, "error": "disk full"}],
+    ])
+    batcher = NoteUpdateBatcher(max_notes=10, max_bytes=8)
+    batcher.add_reference(1, "Audio", "tts_a.mp3")
+    batcher.add_reference(2, "Audio", "tts_b.mp3")
+
+    outcomes = batcher.add_file(3, "Audio", "tts_a.mp3", audio_data=b"abcdefghi")  # 12 base64 bytes
+    outcomes += batcher.flush()
+
+    assert outcomes[:2] == [(2, None), (3, mocker.ANY)]
+    assert "disk full" in str(outcomes[1][1])
+    assert outcomes[2][0] == 1 and "tts_a.mp3 was not stored" in str(outcomes[2][1])
+    assert mock_invoke.call_count == 2
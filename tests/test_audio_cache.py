@@ -0,0 +1,77 @@
+import os
+import pytest
+from anki_tts.audio_cache import AudioCache
+
+
+# =========================
+# AudioCache - memory mode
+# =========================
+def test_memory_cache_round_trip() -> None:
+    """Test that a memory cache returns stored audio and counts hits and misses."""
+    cache = AudioCache()
+    assert cache.get("abc") is None
+    cache.put("abc", b"audio")
+    assert cache.get("abc") == b"audio"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_memory_cache_evicts_least_recently_used() -> None:
+    """Test that the least recently used entry is evicted once over budget."""
+    cache = AudioCache(max_bytes=10)
+    cache.put("aa", b"12345")
+    cache.put("bb", b"12345")
+    cache.get("aa")  # "bb" is now the least recently used
+    cache.put("cc", b"12345")
+    assert "aa" in cache
+    assert "bb" not in cache
+    assert cache.total_bytes == 10
+
+
+def test_invalid_max_bytes_raises() -> None:
+    """Test that a non-positive size budget raises ValueError."""
+    with pytest.raises(ValueError, match="max_bytes must be >= 1"):
+        AudioCache(max_bytes=0)
+
+
+# =========================
+# AudioCache - disk mode
+# =========================
+def test_disk_cache_persists_across_instances(tmp_path) -> None:
+    """Test that entries written by one cache are visible to a later one."""
+    AudioCache(str(tmp_path)).put("abcdef", b"audio")
+    reopened = AudioCache(str(tmp_path))
+    assert len(reopened) == 1
+    assert reopened.get("abcdef") == b"audio"
+    assert reopened.path_for("abcdef") == os.path.join(str(tmp_path), "ab", "abcdef.audio")
+
+
+def test_disk_cache_leaves_no_temp_files(tmp_path) -> None:
+    """Test that atomic writes do not leave temporary files behind."""
+    cache = AudioCache(str(tmp_path))
+    cache.put("abcdef", b"audio")
+    cache.put("abcdef", b"newer")
+    assert os.listdir(tmp_path / "ab") == ["abcdef.audio"]
+    assert cache.get("abcdef") == b"newer"
+
+
+def test_disk_cache_evicts_oldest_on_open(tmp_path) -> None:
+    """Test that reopening with a smaller budget evicts the oldest entries."""
+    cache = AudioCache(str(tmp_path))
+    cache.put("aa01", b"12345")
+    cache.put("bb02", b"12345")
+    os.utime(cache.path_for("aa01"), (1, 1))  # make "aa01" the oldest
+
+    reopened = AudioCache(str(tmp_path), max_bytes=5)
+    assert "aa01" not in reopened
+    assert "bb02" in reopened
+    assert not os.path.exists(tmp_path / "aa" / "aa01.audio")
+
+
+def test_disk_cache_treats_deleted_file_as_miss(tmp_path) -> None:
+    """Test that an entry removed from disk behind the cache's back is a miss."""
+    cache = AudioCache(str(tmp_path))
+    cache.put("abcdef", b"audio")
+    os.unlink(cache.path_for("abcdef"))
+    assert cache.get("abcdef") is None
+    assert "abcdef" not in cache
+    assert cache.total_bytes == 0
@@ -1,6 +1,26 @@
+import asyncio
 import pytest
 import os
-from anki_tts.gcloud_tts import synthesize_audio, init_tts_client
+import time
+from google.cloud import texttospeech
+from anki_tts.metrics import Metrics, use_metrics
+from anki_tts.tts_backend import text_cache_keyer
+from anki_tts.gcloud_tts import (
+    synthesize_audio,
+    init_tts_client,
+    audio_cache_key,
+    build_audio_config,
+    init_async_tts_client,
+    synthesize_audio_async,
+    synthesize_many_async,
+    AsyncTTSRunner,
+    AudioSettings,
+    GoogleTTSBackend,
+    LazyClient,
+    MAX_INPUT_BYTES,
+    concat_mp3,
+    split_text,
+)
 
 # =========================
 # Google TTS - init_tts_client
@@ -89,4 +109,338 @@ def test_synthesize_audio_with_custom_voice(mocker) -> None:
     result = synthesize_audio("Hello", mock_client, language_code="en-GB", voice_name="en-GB-Wavenet-F")
     assert result == b"voice_audio_data"
     # Ensure synthesize_speech was called exactly once
-    mock_client.synthesize_speech.assert_called_once()
\ No newline at end of file
+    mock_client.synthesize_speech.assert_called_once()
+
+# =========================
+# Google TTS - long texts
+# =========================
+def test_split_text_keeps_short_text_whole() -> None:
+    """Test that text within the request limit is returned as-is."""
+    assert split_text("こんにちは。元気ですか？") == ["こんにちは。元気ですか？"]
+
+
+def test_split_text_splits_at_japanese_sentence_ends() -> None:
+    """Test that Japanese text is split after 。 and ！ without needing spaces."""
+    text = "今日は晴れです。明日は雨です！「そうですか。」"
+    assert split_text(text, max_bytes=30) == ["今日は晴れです。", "明日は雨です！", "「そうですか。」"]
+
+
+def test_split_text_splits_at_latin_sentence_ends() -> None:
+    """Test that Latin periods only end a sentence when followed by whitespace."""
+    text = "Pi is 3.14 roughly. It never ends! Really?"
+    assert split_text(text, max_bytes=24) == ["Pi is 3.14 roughly.", "It never ends! Really?"]
+
+
+def test_split_text_falls_back_to_clauses_and_characters() -> None:
+    """Test that overlong sentences are split at clause boundaries, then anywhere."""
+    assert split_text("あいうえお、かきくけこ", max_bytes=18) == ["あいうえお、", "かきくけこ"]
+    assert split_text("あいうえおかきくけこ", max_bytes=15) == ["あいうえお", "かきくけこ"]
+
+
+def test_split_text_pieces_fit_and_preserve_text() -> None:
+    """Test that every piece fits the default limit and no text is lost."""
+    text = "これはテストの文です。" * 1000
+    pieces = split_text(text)
+    assert len(pieces) > 1
+    assert all(len(piece.encode("utf-8")) <= MAX_INPUT_BYTES for piece in pieces)
+    assert "".join(pieces) == text
+
+
+def test_concat_mp3_strips_inner_id3_tags() -> None:
+    """Test that ID3 tags between clips are dropped and frames kept intact."""
+    id3v2 = b"ID3\x04\x00\x00\x00\x00\x00\x02xx"
+    id3v1 = b"TAG" + b"\x00" * 125
+    first = id3v2 + b"frames1" + id3v1
+    second = id3v2 + b"frames2" + id3v1
+
+    assert concat_mp3([first, second]) == id3v2 + b"frames1" + b"frames2" + id3v1
+    assert concat_mp3([b"frames"]) == b"frames"
+
+
+def test_synthesize_audio_splits_long_text(mocker) -> None:
+    """Test that text over the request limit is synthesized in pieces and joined in order."""
+    mock_client = mocker.MagicMock()
+
+    def synthesize_speech(input, voice, audio_config):
+        response = mocker.MagicMock()
+        response.audio_content = input.text[:2].encode("utf-8")
+        return response
+
+    mock_client.synthesize_speech.side_effect = synthesize_speech
+    text = "一の文です。" * 250 + "二の文です。" * 250
+
+    result = synthesize_audio(text, mock_client)
+
+    assert mock_client.synthesize_speech.call_count == 2
+    assert result == "一の二の".encode("utf-8")
+
+
+def test_synthesize_audio_refuses_to_split_non_mp3(mocker) -> None:
+    """Test that long text is rejected for encodings whose clips cannot be concatenated."""
+    audio_config = texttospeech.AudioConfig(audio_encoding=texttospeech.AudioEncoding.LINEAR16)
+    with pytest.raises(ValueError, match="only be split for MP3"):
+        synthesize_audio("あ。" * 2000, mocker.MagicMock(), audio_config=audio_config)
+
+
+def test_synthesize_audio_records_metrics(mocker) -> None:
+    """Test that a synthesis is timed and its characters and bytes are counted."""
+    mock_client = mocker.MagicMock()
+    mock_client.synthesize_speech.return_value.audio_content = b"12345"
+    metrics = Metrics()
+
+    with use_metrics(metrics):
+        synthesize_audio("こんにちは", mock_client)
+
+    assert metrics.stages["synthesis"].count == 1
+    assert metrics.to_dict()["counters"] == {"bytes_synthesized": 5, "characters_billed": 5, "tts_requests": 1}
+
+
+# =========================
+# Google TTS - audio_cache_key
+# =========================
+def test_audio_cache_key_ignores_whitespace_differences() -> None:
+    """Test that texts differing only in surrounding/repeated whitespace share a key."""
+    config = build_audio_config()
+    assert audio_cache_key(" Hello   world ", "en-GB", None, config) == audio_cache_key("Hello world", "en-GB", None, config)
+
+
+def test_audio_cache_key_resolves_default_voice() -> None:
+    """Test that an omitted voice keys the same as the explicit default voice."""
+    config = build_audio_config()
+    assert audio_cache_key("Hello", "en-GB", None, config) == audio_cache_key("Hello", "en-GB", "en-GB-Wavenet-F", config)
+
+
+def test_audio_cache_key_depends_on_every_parameter() -> None:
+    """Test that text, language, voice and audio config all change the key."""
+    config = build_audio_config()
+    base = audio_cache_key("Hello", "en-GB", "en-GB-Wavenet-F", config)
+    slower = texttospeech.AudioConfig(audio_encoding=texttospeech.AudioEncoding.MP3, speaking_rate=0.8)
+    assert base != audio_cache_key("Hullo", "en-GB", "en-GB-Wavenet-F", config)
+    assert base != audio_cache_key("Hello", "en-US", "en-GB-Wavenet-F", config)
+    assert base != audio_cache_key("Hello", "en-GB", "en-GB-Wavenet-A", config)
+    assert base != audio_cache_key("Hello", "en-GB", "en-GB-Wavenet-F", slower)
+
+
+# =========================
+# Google TTS - AudioSettings
+# =========================
+def test_build_audio_config_applies_settings() -> None:
+    """Test that set options are sent and unset ones keep the plain MP3 config."""
+    assert build_audio_config(AudioSettings()) == build_audio_config()
+    config = build_audio_config(AudioSettings("OGG_OPUS", 16000, 1.25, ["handset-class-device"]))
+    assert config.audio_encoding == texttospeech.AudioEncoding.OGG_OPUS
+    assert config.sample_rate_hertz == 16000
+    assert config.speaking_rate == 1.25
+    assert list(config.effects_profile_id) == ["handset-class-device"]
+
+
+@pytest.mark.parametrize("kwargs, message", [
+    ({"encoding": "FLAC"}, "encoding must be one of MP3, OGG_OPUS, LINEAR16"),
+    ({"sample_rate_hertz": 0}, "sample_rate_hertz must be >= 1"),
+    ({"speaking_rate": 5.0}, "speaking_rate must be between 0.25 and 4.0"),
+])
+def test_audio_settings_validation(kwargs, message) -> None:
+    """Test that unsupported settings are rejected before any request."""
+    with pytest.raises(ValueError, match=message):
+        AudioSettings(**kwargs)
+
+
+def test_audio_settings_extension() -> None:
+    """Test that each encoding maps to the extension Anki needs to play it."""
+    assert [AudioSettings(encoding).extension for encoding in ("MP3", "OGG_OPUS", "LINEAR16")] == ["mp3", "ogg", "wav"]
+
+
+
+
+# =========================
+# Google TTS - backend
+# =========================
+def test_google_backend_keys_match_audio_cache_key() -> None:
+    """Test that the backend's cache keys are the ones audio_cache_key() has always produced."""
+    backend = GoogleTTSBackend(client=object())
+    key = text_cache_keyer(backend.cache_key_params("en-GB", None))
+    assert key("Hello") == audio_cache_key("Hello", "en-GB", "en-GB-Wavenet-F", build_audio_config())
+    assert backend.capabilities.audio_format == "mp3"
+    assert backend.capabilities.billed
+
+
+@pytest.mark.parametrize("settings", [
+    AudioSettings(),
+    AudioSettings("OGG_OPUS", sample_rate_hertz=24000, speaking_rate=0.9, effects_profile=("handset-class-device",)),
+    AudioSettings("LINEAR16", speaking_rate=2),
+])
+def test_google_backend_keys_do_not_need_audio_config(settings) -> None:
+    """Test that keys built from the settings match those built from the AudioConfig they request."""
+    backend = GoogleTTSBackend(client=object(), settings=settings)
+    expected = text_cache_keyer(backend.cache_key_params("ja-JP", None))("犬")
+    assert audio_cache_key("犬", "ja-JP", None, build_audio_config(settings)) == expected
+    assert backend._audio_config is None
+
+
+def test_google_backend_requests_configured_audio(mocker) -> None:
+    """Test that the settings decide both the requested encoding and the audio format."""
+    mock_tts = mocker.patch("anki_tts.gcloud_tts.synthesize_audio", return_value=b"OggS")
+    backend = GoogleTTSBackend(client=object(), settings=AudioSettings("OGG_OPUS", sample_rate_hertz=24000))
+
+    assert backend.capabilities.audio_format == "ogg"
+    assert backend.synthesize("Hello", "en-GB") == b"OggS"
+    audio_config = mock_tts.call_args.kwargs["audio_config"]
+    assert audio_config.audio_encoding == texttospeech.AudioEncoding.OGG_OPUS
+    assert audio_config.sample_rate_hertz == 24000
+
+
+def test_google_backend_creates_client_on_first_synthesis(mocker) -> None:
+    """Test that the backend synthesizes with a client created on first use."""
+    class MockResponse:
+        audio_content = b"fake_audio_data"
+
+    mock_client = mocker.MagicMock()
+    mock_client.synthesize_speech.return_value = MockResponse()
+    factory = mocker.Mock(return_value=mock_client)
+    backend = GoogleTTSBackend(client=LazyClient(factory))
+    factory.assert_not_called()
+
+    assert backend.synthesize_many(["a", "b"], "en-GB") == [b"fake_audio_data"] * 2
+    factory.assert_called_once_with()
+    assert mock_client.synthesize_speech.call_count == 2
+
+# =========================
+# Google TTS - async client path
+# =========================
+class FakeAsyncClient:
+    """Stand-in for TextToSpeechAsyncClient with a fixed per-request latency."""
+
+    def __init__(self, latency: float = 0.05) -> None:
+        self.latency = latency
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    async def synthesize_speech(self, input, voice, audio_config):
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+
+        class Response:
+            audio_content = input.text.encode()
+
+        return Response()
+
+
+def test_init_async_tts_client_missing_env(mocker) -> None:
+    """Test that init_async_tts_client() applies the same credential checks as init_tts_client()."""
+    mocker.patch.dict(os.environ, {}, clear=True)
+    with pytest.raises(EnvironmentError, match="GOOGLE_APPLICATION_CREDENTIALS environment variable is not set"):
+        init_async_tts_client()
+
+
+def test_synthesize_audio_async_returns_bytes() -> None:
+    """Test that synthesize_audio_async() returns the audio from the async client."""
+    result = asyncio.run(synthesize_audio_async("こんにちは", FakeAsyncClient(latency=0)))
+    assert result == "こんにちは".encode()
+
+
+def test_synthesize_audio_async_splits_long_text() -> None:
+    """Test that the async path requests the pieces of a long text concurrently."""
+    client = FakeAsyncClient(latency=0.01)
+    text = "これは文です。" * 1000
+    result = asyncio.run(synthesize_audio_async(text, client))
+    assert result == text.encode()
+    assert client.peak_in_flight > 1
+
+
+def test_synthesize_many_async_respects_concurrency_limit() -> None:
+    """Test that no more than `concurrency` requests are ever in flight."""
+    client = FakeAsyncClient(latency=0.01)
+    results = asyncio.run(synthesize_many_async([f"t{i}" for i in range(20)], client, concurrency=4))
+    assert results == [f"t{i}".encode() for i in range(20)]
+    assert client.peak_in_flight == 4
+
+
+def test_synthesize_many_async_throughput_scales_with_concurrency() -> None:
+    """Test that raising concurrency cuts wall-clock time for latency-bound requests."""
+    texts = [f"t{i}" for i in range(20)]
+
+    def elapsed(concurrency: int) -> float:
+        start = time.perf_counter()
+        asyncio.run(synthesize_many_async(texts, FakeAsyncClient(latency=0.05), concurrency=concurrency))
+        return time.perf_counter() - start
+
+    sequential = elapsed(1)   # ~20 x 50 ms
+    concurrent = elapsed(20)  # ~1 x 50 ms
+    assert sequential >= 1.0
+    assert concurrent < sequential / 5
+
+
+def test_synthesize_many_async_invalid_concurrency_raises() -> None:
+    """Test that a non-positive concurrency raises ValueError."""
+    with pytest.raises(ValueError, match="concurrency must be >= 1"):
+        asyncio.run(synthesize_many_async(["a"], FakeAsyncClient(), concurrency=0))
+
+
+def test_async_runner_returns_concurrent_futures() -> None:
+    """Test that AsyncTTSRunner runs requests concurrently behind ordinary futures."""
+    client = FakeAsyncClient(latency=0.05)
+    with AsyncTTSRunner(concurrency=10, client_factory=lambda: client) as runner:
+        futures = [runner.submit(f"t{i}") for i in range(10)]
+        assert [f.result(timeout=5) for f in futures] == [f"t{i}".encode() for i in range(10)]
+    assert client.peak_in_flight == 10
+
+
+def test_async_runner_close_cancels_pending_requests() -> None:
+    """Test that closing the runner cancels requests that have not finished."""
+    runner = AsyncTTSRunner(concurrency=1, client_factory=lambda: FakeAsyncClient(latency=10))
+    future = runner.submit("slow")
+    runner.close()
+    assert future.cancelled()
+
+
+def test_async_runner_creates_client_on_first_request() -> None:
+    """Test that the client factory runs at the first request, not at start-up."""
+    created = []
+    factory = lambda: created.append(1) or FakeAsyncClient()
+    with AsyncTTSRunner(concurrency=2, client_factory=factory) as runner:
+        assert created == []
+        assert runner.submit("a").result(timeout=5) == b"a"
+        assert runner.submit("b").result(timeout=5) == b"b"
+    assert created == [1]
+
+
+def test_async_runner_client_factory_error_fails_requests() -> None:
+    """Test that a failing client factory fails every request with its error."""
+    def factory():
+        raise EnvironmentError("no credentials")
+
+    with AsyncTTSRunner(concurrency=1, client_factory=factory) as runner:
+        for text in ("a", "b"):
+            with pytest.raises(EnvironmentError, match="no credentials"):
+                runner.submit(text).result(timeout=5)
+
+
+# =========================
+# LazyClient
+# =========================
+def test_lazy_client_creates_once() -> None:
+    """Test that LazyClient calls its factory on the first get() only."""
+    created = []
+    lazy = LazyClient(lambda: created.append(object()) or created[-1])
+    assert created == []
+    assert lazy.get() is lazy.get()
+    assert len(created) == 1
+
+
+def test_lazy_client_remembers_factory_error() -> None:
+    """Test that a failed factory is not retried on later get() calls."""
+    calls = []
+
+    def factory():
+        calls.append(1)
+        raise EnvironmentError("no credentials")
+
+    lazy = LazyClient(factory)
+    for _ in range(2):
+        with pytest.raises(EnvironmentError, match="no credentials"):
+            lazy.get()
+    assert calls == [1]
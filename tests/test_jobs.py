@@ -0,0 +1,116 @@
+import json
+import pytest
+from anki_tts.jobs import TTSJob, load_jobs, schedule_jobs
+
+
+def _write(tmp_path, name: str, content: str) -> str:
+    path = tmp_path / name
+    path.write_text(content, encoding="utf-8")
+    return str(path)
+
+
+def test_load_jobs_json_with_defaults(tmp_path) -> None:
+    """Test that the file's defaults apply to every job and jobs can override them."""
+    path = _write(tmp_path, "jobs.json", json.dumps({
+        "defaults": {"text_field": "Sentence", "audio_field": "Audio"},
+        "jobs": [
+            {"deck": "Japanese"},
+            {"deck": "French", "language": "fr-FR", "audio_field": "Sound", "tags": "core"},
+        ],
+    }))
+
+    jobs = load_jobs(path)
+
+    assert jobs == [
+        TTSJob(deck="Japanese", text_field="Sentence", audio_field="Audio"),
+        TTSJob(deck="French", text_field="Sentence", audio_field="Sound", language="fr-FR", tags=["core"]),
+    ]
+
+
+def test_load_jobs_toml(tmp_path) -> None:
+    """Test that [[jobs]] tables are read from TOML files."""
+    path = _write(tmp_path, "jobs.toml", """
+[defaults]
+text_field = "Front"
+audio_field = "Audio"
+
+[[jobs]]
+deck = "Japanese"
+voice = "ja-JP-Neural2-C"
+
+[[jobs]]
+deck = "Korean"
+language = "ko-KR"
+overwrite = true
+""")
+
+    jobs = load_jobs(path)
+
+    assert [job.deck for job in jobs] == ["Japanese", "Korean"]
+    assert jobs[0].voice == "ja-JP-Neural2-C"
+    assert jobs[1].overwrite is True
+
+
+def test_load_jobs_yaml_list(tmp_path) -> None:
+    """Test that a YAML file may be a bare list of jobs."""
+    pytest.importorskip("yaml")
+    path = _write(tmp_path, "jobs.yaml", """
+- deck: Japanese
+  text_field: Sentence
+  audio_field: Audio
+  max_cards: 50
+""")
+
+    assert load_jobs(path) == [TTSJob(deck="Japanese", text_field="Sentence", audio_field="Audio", max_cards=50)]
+
+
+def test_load_jobs_applies_caller_defaults_first(tmp_path) -> None:
+    """Test that caller defaults are overridden by the file, and None values are ignored."""
+    path = _write(tmp_path, "jobs.json", json.dumps({
+        "defaults": {"language": "fr-FR"},
+        "jobs": [{"deck": "French"}],
+    }))
+
+    jobs = load_jobs(path, defaults={"text_field": "Sentence", "audio_field": "Audio", "language": "ja-JP", "voice": None})
+
+    assert jobs == [TTSJob(deck="French", text_field="Sentence", audio_field="Audio", language="fr-FR")]
+
+
+@pytest.mark.parametrize("content, message", [
+    ('[{"deck": "A", "text_field": "T"}]', "missing audio_field"),
+    ('[{"deck": "A", "text_field": "T", "audio_field": "X", "speed": 2}]', "unknown option"),
+    ('[{"deck": "A", "text_field": "T", "audio_field": "X", "max_cards": 0}]', "max_cards must be >= 1"),
+    ('{"jobs": []}', "does not list any jobs"),
+])
+def test_load_jobs_rejects_invalid_jobs(tmp_path, content, message) -> None:
+    """Test that invalid job files raise ValueError naming the problem."""
+    path = _write(tmp_path, "jobs.json", content)
+    with pytest.raises(ValueError, match=message):
+        load_jobs(path)
+
+
+def test_load_jobs_rejects_unknown_extension(tmp_path) -> None:
+    """Test that unsupported file types raise ValueError."""
+    path = _write(tmp_path, "jobs.ini", "")
+    with pytest.raises(ValueError, match="Unsupported job file type"):
+        load_jobs(path)
+
+
+def test_schedule_jobs_groups_by_voice() -> None:
+    """Test that jobs sharing a language and voice are moved next to each other."""
+    a = TTSJob("A", "T", "X", language="ja-JP")
+    b = TTSJob("B", "T", "X", language="fr-FR")
+    c = TTSJob("C", "T", "X", language="ja-JP")
+    d = TTSJob("D", "T", "X", language="ja-JP", voice="ja-JP-Neural2-C")
+
+    assert schedule_jobs([a, b, c, d]) == [a, c, b, d]
+
+
+def test_schedule_jobs_groups_by_backend() -> None:
+    """Test that jobs on different backends are not grouped, since their audio differs."""
+    a = TTSJob("A", "T", "X")
+    b = TTSJob("B", "T", "X", backend="local")
+    c = TTSJob("C", "T", "X", backend="google")
+
+    assert schedule_jobs([a, b, c]) == [a, c, b]
+    assert b.describe().endswith("via local)")
@@ -0,0 +1,91 @@
+import pytest
+from anki_tts.journal import RunJournal
+
+
+def test_journal_round_trip(tmp_path) -> None:
+    """Test that completed notes are loaded again on resume."""
+    path = str(tmp_path / "run.jsonl")
+    with RunJournal(path) as journal:
+        journal.record(1, "Audio", "k1", "1_Audio.mp3")
+        journal.record(2, "Audio", "k2", "2_Audio.mp3")
+
+    resumed = RunJournal(path, resume=True)
+    assert len(resumed) == 2
+    assert resumed.is_done(1, "Audio")
+    assert not resumed.is_done(1, "Other")
+    assert not resumed.is_done(3, "Audio")
+    resumed.close()
+
+
+def test_journal_without_resume_starts_fresh(tmp_path) -> None:
+    """Test that opening without resume discards an earlier journal."""
+    path = str(tmp_path / "run.jsonl")
+    with RunJournal(path) as journal:
+        journal.record(1, "Audio", "k1", "1_Audio.mp3")
+
+    with RunJournal(path) as journal:
+        assert len(journal) == 0
+    assert (tmp_path / "run.jsonl").read_text() == ""
+
+
+def test_journal_resume_appends(tmp_path) -> None:
+    """Test that a resumed journal keeps earlier records and adds new ones."""
+    path = str(tmp_path / "run.jsonl")
+    with RunJournal(path) as journal:
+        journal.record(1, "Audio", "k1", "1_Audio.mp3")
+    with RunJournal(path, resume=True) as journal:
+        journal.record(2, "Audio", "k2", "2_Audio.mp3")
+
+    assert len(RunJournal(path, resume=True)) == 2
+
+
+def test_journal_batches_syncs(tmp_path, mocker) -> None:
+    """Test that records are written and fsynced once per batch, not per note."""
+    fsync = mocker.patch("anki_tts.journal.os.fsync")
+    path = tmp_path / "run.jsonl"
+    journal = RunJournal(str(path), sync_every=3, sync_interval=3600)
+
+    journal.record(1, "Audio", "k1", "1_Audio.mp3")
+    journal.record(2, "Audio", "k2", "2_Audio.mp3")
+    assert fsync.call_count == 0
+    assert path.read_text() == ""
+
+    journal.record(3, "Audio", "k3", "3_Audio.mp3")
+    assert fsync.call_count == 1
+    assert len(path.read_text().splitlines()) == 3
+
+    journal.record(4, "Audio", "k4", "4_Audio.mp3")
+    journal.close()
+    assert fsync.call_count == 2
+    assert len(path.read_text().splitlines()) == 4
+
+
+def test_journal_syncs_after_interval(tmp_path, mocker) -> None:
+    """Test that a slow trickle of records is still synced every sync_interval seconds."""
+    fsync = mocker.patch("anki_tts.journal.os.fsync")
+    now = [0.0]
+    journal = RunJournal(str(tmp_path / "run.jsonl"), sync_every=100, sync_interval=1.0, clock=lambda: now[0])
+
+    journal.record(1, "Audio", "k1", "1_Audio.mp3")
+    assert fsync.call_count == 0
+    now[0] = 1.5
+    journal.record(2, "Audio", "k2", "2_Audio.mp3")
+    assert fsync.call_count == 1
+    journal.close()
+
+
+def test_journal_ignores_truncated_line(tmp_path) -> None:
+    """Test that a line cut short by a crash is skipped on resume."""
+    path = tmp_path / "run.jsonl"
+    path.write_text('{"note":1,"field":"Audio","key":"k1","file":"1_Audio.mp3"}\n{"note":2,"fie')
+
+    journal = RunJournal(str(path), resume=True)
+    assert len(journal) == 1
+    assert journal.is_done(1, "Audio")
+    journal.close()
+
+
+def test_invalid_sync_every_raises(tmp_path) -> None:
+    """Test that sync_every below 1 raises ValueError."""
+    with pytest.raises(ValueError, match="sync_every must be >= 1"):
+        RunJournal(str(tmp_path / "run.jsonl"), sync_every=0)
@@ -0,0 +1,58 @@
+from anki_tts.media_manifest import MediaManifest
+
+
+def test_manifest_round_trip(tmp_path) -> None:
+    """Test that recorded files are loaded again by the next run."""
+    path = str(tmp_path / "media.jsonl")
+    with MediaManifest(path) as manifest:
+        manifest.record("1_Audio.mp3", "k1")
+        manifest.record("2_Audio.mp3", "k2")
+
+    reopened = MediaManifest(path)
+    assert len(reopened) == 2
+    assert reopened.get("1_Audio.mp3") == "k1"
+    assert reopened.get("3_Audio.mp3") is None
+    reopened.close()
+
+
+def test_manifest_last_record_wins(tmp_path) -> None:
+    """Test that a file uploaded again with new audio keeps only the newest key."""
+    path = str(tmp_path / "media.jsonl")
+    with MediaManifest(path) as manifest:
+        manifest.record("1_Audio.mp3", "old")
+    with MediaManifest(path) as manifest:
+        manifest.record("1_Audio.mp3", "new")
+
+    with MediaManifest(path) as manifest:
+        assert manifest.get("1_Audio.mp3") == "new"
+
+
+def test_manifest_skips_unchanged_records(tmp_path) -> None:
+    """Test that recording the same key again writes nothing."""
+    path = tmp_path / "media.jsonl"
+    with MediaManifest(str(path)) as manifest:
+        manifest.record("1_Audio.mp3", "k1")
+        manifest.record("1_Audio.mp3", "k1")
+
+    assert len(path.read_text().splitlines()) == 1
+
+
+def test_manifest_compacts_superseded_lines(tmp_path) -> None:
+    """Test that a manifest mostly made of superseded lines is rewritten on open."""
+    path = tmp_path / "media.jsonl"
+    for key in ("a", "b", "c"):
+        with MediaManifest(str(path)) as manifest:
+            manifest.record("1_Audio.mp3", key)
+
+    with MediaManifest(str(path)) as manifest:
+        assert manifest.get("1_Audio.mp3") == "c"
+    assert len(path.read_text().splitlines()) == 1
+
+
+def test_manifest_ignores_truncated_lines(tmp_path) -> None:
+    """Test that a line cut short by a crash is skipped."""
+    path = tmp_path / "media.jsonl"
+    path.write_text('{"file":"1_Audio.mp3","key":"k1"}\n{"file":"2_Au')
+
+    with MediaManifest(str(path)) as manifest:
+        assert len(manifest) == 1
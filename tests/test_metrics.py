@@ -0,0 +1,157 @@
+import json
+import pytest
+from anki_tts import metrics as metrics_module
+from anki_tts.metrics import Histogram, Metrics, count, get_metrics, timer, use_metrics
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_histogram_percentiles() -> None:
+    """Test nearest-rank percentiles over 100 samples."""
+    histogram = Histogram()
+    for ms in range(100, 0, -1):
+        histogram.add(ms / 1000)
+
+    assert histogram.count == 100
+    assert histogram.percentile(50) == pytest.approx(0.050)
+    assert histogram.percentile(95) == pytest.approx(0.095)
+    assert histogram.percentile(99) == pytest.approx(0.099)
+    assert histogram.total == pytest.approx(5.05)
+
+
+def test_histogram_empty_percentile_is_zero() -> None:
+    """Test that an empty histogram reports 0."""
+    assert Histogram().percentile(50) == 0.0
+
+
+def test_metrics_timer_and_counters() -> None:
+    """Test that timed blocks and counters end up in the summary."""
+    clock = FakeClock()
+    metrics = Metrics(clock=clock)
+
+    with metrics.timer("synthesis"):
+        clock.now += 0.2
+    metrics.count("bytes_synthesized", 1000)
+    clock.now = 2.0
+
+    summary = metrics.to_dict()
+    assert summary["elapsed_seconds"] == 2.0
+    assert summary["stages"]["synthesis"] == {
+        "count": 1, "total_seconds": 0.2, "p50_ms": 200.0, "p95_ms": 200.0, "p99_ms": 200.0,
+    }
+    assert summary["counters"] == {"bytes_synthesized": 1000}
+    assert summary["throughput_per_second"] == {"bytes_synthesized": 500.0}
+
+
+def test_metrics_timer_records_failed_blocks() -> None:
+    """Test that a block raising an exception is still timed."""
+    metrics = Metrics()
+    with pytest.raises(RuntimeError):
+        with metrics.timer("updateNote"):
+            raise RuntimeError("boom")
+    assert metrics.stages["updateNote"].count == 1
+
+
+def test_format_table_lists_stages() -> None:
+    """Test that the summary table has a header, one row per stage and a totals line."""
+    metrics = Metrics()
+    metrics.observe("findNotes", 0.01)
+    metrics.observe("notesInfo", 0.02)
+    metrics.count("cards_added", 3)
+
+    lines = metrics.format_table()
+    assert lines[0].split() == ["Stage", "Count", "Total", "s", "p50", "ms", "p95", "ms", "p99", "ms"]
+    assert [line.split()[0] for line in lines[1:3]] == ["findNotes", "notesInfo"]
+    assert "cards_added=3" in lines[-1]
+
+
+def test_write_json(tmp_path) -> None:
+    """Test that the summary is written as JSON."""
+    metrics = Metrics()
+    metrics.observe("synthesis", 0.1)
+    path = tmp_path / "metrics.json"
+
+    metrics.write_json(str(path))
+
+    assert json.loads(path.read_text())["stages"]["synthesis"]["count"] == 1
+
+
+def test_module_helpers_record_into_active_registry() -> None:
+    """Test that timer() and count() record only while a registry is active."""
+    with timer("synthesis"):
+        pass
+    count("tts_requests")
+    assert get_metrics() is None
+
+    metrics = Metrics()
+    with use_metrics(metrics):
+        assert get_metrics() is metrics
+        with timer("synthesis"):
+            pass
+        count("tts_requests", 2)
+    assert get_metrics() is None
+
+    assert metrics.stages["synthesis"].count == 1
+    assert metrics.counter("tts_requests") == 2
+
+
+def test_labelled_counters() -> None:
+    """Test that labelled series are counted separately and named in the summary."""
+    metrics = Metrics()
+    metrics.count("retries", category="unavailable")
+    metrics.count("retries", 2, category="deadline")
+
+    assert metrics.counter("retries", category="deadline") == 2
+    assert metrics.counter("retries") == 0
+    assert metrics.to_dict()["counters"] == {"retries{category=deadline}": 2, "retries{category=unavailable}": 1}
+
+
+def test_timer_tracks_in_flight() -> None:
+    """Test that in_flight counts blocks currently inside a stage."""
+    metrics = Metrics()
+    with metrics.timer("synthesis"):
+        with metrics.timer("synthesis"):
+            assert metrics.in_flight["synthesis"] == 2
+    assert metrics.in_flight["synthesis"] == 0
+
+
+def test_histogram_bucket_counts() -> None:
+    """Test cumulative bucket counts for histogram export."""
+    histogram = Histogram()
+    for seconds in (0.01, 0.2, 0.2, 3.0):
+        histogram.add(seconds)
+
+    counts, total, n = histogram.bucket_counts([0.1, 0.5, 1.0])
+    assert counts == [1, 3, 3]
+    assert total == pytest.approx(3.41)
+    assert n == 4
+
+
+def test_histogram_memory_is_bounded() -> None:
+    """Test that only reservoir_size samples are kept while totals and buckets stay exact."""
+    histogram = Histogram(reservoir_size=100)
+    for ms in range(1, 10001):
+        histogram.add(ms / 10000)
+
+    assert len(histogram._reservoir) == 100
+    assert histogram.count == 10000
+    assert histogram.total == pytest.approx(5000.5)
+    assert histogram.bucket_counts([0.1, 0.5, 1.0])[0] == [1000, 5000, 10000]
+    assert 0.3 < histogram.percentile(50) < 0.7
+    with pytest.raises(ValueError, match="not among the histogram's bounds"):
+        histogram.bucket_counts([0.3])
+
+
+def test_use_metrics_restores_previous_registry() -> None:
+    """Test that nested use_metrics blocks restore the outer registry."""
+    outer, inner = Metrics(), Metrics()
+    with use_metrics(outer):
+        with use_metrics(inner):
+            assert metrics_module.get_metrics() is inner
+        assert metrics_module.get_metrics() is outer
@@ -0,0 +1,60 @@
+import requests
+from anki_tts.metrics import Metrics
+from anki_tts.metrics_exporter import CONTENT_TYPE, MetricsServer, render_openmetrics
+
+
+def _registry() -> Metrics:
+    metrics = Metrics()
+    metrics.count("cards_added", 3)
+    metrics.count("retries", category="unavailable")
+    metrics.observe("synthesis", 0.3)
+    metrics.observe("synthesis", 2.0)
+    return metrics
+
+
+def test_render_counters() -> None:
+    """Test that counters are rendered as _total samples, keeping labels."""
+    text = render_openmetrics(_registry())
+
+    assert "# TYPE anki_tts_cards_added counter\nanki_tts_cards_added_total 3\n" in text
+    assert 'anki_tts_retries_total{category="unavailable"} 1' in text
+
+
+def test_render_stage_histogram() -> None:
+    """Test that stage timings become a cumulative histogram labelled by stage."""
+    text = render_openmetrics(_registry(), buckets=(0.5, 1.0))
+
+    assert 'anki_tts_stage_seconds_bucket{stage="synthesis",le="0.5"} 1' in text
+    assert 'anki_tts_stage_seconds_bucket{stage="synthesis",le="1.0"} 1' in text
+    assert 'anki_tts_stage_seconds_bucket{stage="synthesis",le="+Inf"} 2' in text
+    assert 'anki_tts_stage_seconds_count{stage="synthesis"} 2' in text
+    assert 'anki_tts_stage_seconds_sum{stage="synthesis"} 2.3' in text
+
+
+def test_render_in_flight_gauge_and_eof() -> None:
+    """Test that in-flight blocks are exposed as a gauge and the text ends with # EOF."""
+    metrics = Metrics()
+    with metrics.timer("synthesis"):
+        text = render_openmetrics(metrics)
+
+    assert 'anki_tts_in_flight{stage="synthesis"} 1' in text
+    assert text.endswith("# EOF\n")
+
+
+def test_metrics_server_serves_live_registry() -> None:
+    """Test that the server exposes the registry over HTTP as it changes."""
+    metrics = Metrics()
+    with MetricsServer(metrics, port=0, host="127.0.0.1") as server:
+        metrics.count("cards_added", 5)
+        response = requests.get(server.url, timeout=5)
+
+        assert response.status_code == 200
+        assert response.headers["Content-Type"] == CONTENT_TYPE
+        assert "anki_tts_cards_added_total 5" in response.text
+        assert requests.get(server.url.replace("/metrics", "/other"), timeout=5).status_code == 404
+
+
+def test_metrics_server_listens_on_loopback_by_default() -> None:
+    """Test that the unauthenticated endpoint is only reachable from this machine unless asked otherwise."""
+    with MetricsServer(Metrics(), port=0) as server:
+        assert server.url.startswith("http://127.0.0.1:")
@@ -0,0 +1,52 @@
+import pytest
+from anki_tts.plan import RunPlan, voice_tier
+
+
+@pytest.mark.parametrize("voice_name, tier", [
+    ("ja-JP-Standard-A", "Standard"),
+    ("ja-JP-Wavenet-B", "WaveNet"),
+    ("en-US-Neural2-C", "Neural"),
+    ("en-US-Studio-O", "Studio"),
+    ("en-US-Chirp3-HD-Charon", "Chirp HD"),
+    ("custom-voice", "Other"),
+])
+def test_voice_tier(voice_name, tier) -> None:
+    """Test that voices are grouped by the family in their name."""
+    assert voice_tier(voice_name) == tier
+
+
+def test_plan_counts_each_text_once() -> None:
+    """Test that repeated keys are ignored and cached or unbilled texts are not billed."""
+    plan = RunPlan()
+    plan.add_text("k1", "犬", "WaveNet", cached=False)
+    plan.add_text("k1", "犬", "WaveNet", cached=False)
+    plan.add_text("k2", "猫です", "Standard", cached=False, requests=2)
+    plan.add_text("k3", "鳥", "WaveNet", cached=True)
+    plan.add_text("k4", "魚", None, cached=False)
+
+    assert plan.unique_texts == 4
+    assert plan.cache_hits == 1
+    assert plan.texts_to_synthesize == 3
+    assert plan.tts_requests == 3
+    assert plan.characters_by_tier == {"WaveNet": 1, "Standard": 3}
+    assert plan.characters_billed == 4
+
+
+def test_plan_eta_takes_slowest_bound() -> None:
+    """Test that the estimate is bound by concurrency or whichever quota is tighter."""
+    plan = RunPlan(tts_requests=600, characters_by_tier={"WaveNet": 60000})
+
+    assert plan.eta_seconds(concurrency=10, latency=0.5) == 30
+    assert plan.eta_seconds(concurrency=10, requests_per_minute=300, latency=0.5) == 120
+    assert plan.eta_seconds(concurrency=10, requests_per_minute=300, characters_per_minute=10000, latency=0.5) == 360
+    with pytest.raises(ValueError, match="concurrency must be >= 1"):
+        plan.eta_seconds(concurrency=0)
+
+
+def test_plan_format_table() -> None:
+    """Test that the report lists billed characters per tier and the estimate."""
+    plan = RunPlan(notes_eligible=5, unique_texts=3, tts_requests=3, characters_by_tier={"WaveNet": 12})
+    lines = plan.format_table(concurrency=1, latency=1500)
+
+    assert any(line.split() == ["WaveNet", "characters", "12"] for line in lines)
+    assert lines[-1].split() == ["Estimated", "time", "1:15:00"]
@@ -0,0 +1,133 @@
+import io
+import sys
+import wave
+from array import array
+from concurrent.futures import Future
+import pytest
+from anki_tts.metrics import Metrics, use_metrics
+from anki_tts.postprocess import AudioPostProcessor, normalize_loudness, transcode_opus, trim_silence
+
+
+def _wav(samples, framerate=8000) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(framerate)
+        writer.writeframes(array("h", samples).tobytes())
+    return buffer.getvalue()
+
+
+def _samples(audio: bytes) -> list:
+    with wave.open(io.BytesIO(audio), "rb") as reader:
+        return list(array("h", reader.readframes(reader.getnframes())))
+
+
+# A quiet 100 Hz square wave, padded with a second of silence on each side.
+_TONE = [1000, -1000] * 40 * 10
+_PADDED = [0] * 8000 + _TONE + [0] * 8000
+
+
+# =========================
+# steps
+# =========================
+def test_trim_silence_keeps_padding_around_sound() -> None:
+    """Test that silence is cut from both ends, keeping 50 ms around the sound."""
+    trimmed = _samples(trim_silence(_wav(_PADDED)))
+    assert trimmed == [0] * 400 + _TONE + [0] * 400
+    assert trim_silence(_wav([0] * 100)) == _wav([0] * 100)
+
+
+def test_normalize_loudness_raises_quiet_audio_without_clipping() -> None:
+    """Test that clips are scaled to the target RMS level, capped at full scale."""
+    assert set(_samples(normalize_loudness(_wav(_TONE)))) == {3277, -3277}  # -20 dBFS
+    assert max(_samples(normalize_loudness(_wav([30000] + [100] * 999)))) == 32767
+
+
+def test_wav_steps_reject_other_sample_widths() -> None:
+    """Test that only 16-bit PCM is processed."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(1)
+        writer.setframerate(8000)
+        writer.writeframes(b"\x80" * 10)
+    with pytest.raises(ValueError, match="16-bit"):
+        trim_silence(buffer.getvalue())
+
+
+def test_transcode_opus_pipes_through_command(mocker) -> None:
+    """Test that the transcoder reads audio on stdin and its stdout is the result."""
+    script = "import sys; sys.stdout.buffer.write(b'OggS' + sys.stdin.buffer.read())"
+    mocker.patch("anki_tts.postprocess.OPUS_TRANSCODE_COMMAND", f"{sys.executable} -c \"{script}\"")
+    assert transcode_opus(b"RIFF") == b"OggSRIFF"
+
+    mocker.patch("anki_tts.postprocess.OPUS_TRANSCODE_COMMAND", f"{sys.executable} -c \"import sys; sys.exit('bad input')\"")
+    with pytest.raises(RuntimeError, match="status 1: bad input"):
+        transcode_opus(b"RIFF")
+
+
+# =========================
+# AudioPostProcessor
+# =========================
+def test_postprocessor_validates_steps_and_formats(mocker) -> None:
+    """Test that unknown steps, a missing transcoder and unreadable formats are rejected."""
+    with pytest.raises(ValueError, match="Unknown post-processing step 'echo'"):
+        AudioPostProcessor(["trim", "echo"])
+    with pytest.raises(ValueError, match="processes must be >= 1"):
+        AudioPostProcessor(["trim"], processes=0)
+    mocker.patch("anki_tts.postprocess.OPUS_TRANSCODE_COMMAND", "not-a-transcoder -i pipe:0")
+    with pytest.raises(FileNotFoundError, match="not-a-transcoder"):
+        AudioPostProcessor(["opus"])
+
+    mocker.patch("anki_tts.postprocess.shutil.which", return_value="/usr/bin/ffmpeg")
+    postprocessor = AudioPostProcessor(["trim", "opus"])
+    assert postprocessor.output_format("wav") == "ogg"
+    with pytest.raises(ValueError, match="'trim' needs wav audio, got mp3"):
+        postprocessor.output_format("mp3")
+    with pytest.raises(ValueError, match="'normalize' needs wav audio, got ogg"):
+        AudioPostProcessor(["opus", "normalize"]).output_format("wav")
+
+
+def test_postprocessor_cache_key_params_follow_steps() -> None:
+    """Test that different steps give different cache keys."""
+    assert AudioPostProcessor(["trim"]).cache_key_params() != AudioPostProcessor(["trim", "normalize"]).cache_key_params()
+
+
+def test_postprocessor_runs_steps_in_worker_process() -> None:
+    """Test that clips are processed in the pool and each step is timed and counted."""
+    metrics = Metrics()
+    audio = _wav(_PADDED)
+    with AudioPostProcessor(["trim", "normalize"], processes=1) as postprocessor, use_metrics(metrics):
+        processed = postprocessor.process(audio)
+        failed = postprocessor.submit(b"not a wav file")
+        with pytest.raises(wave.Error):
+            failed.result()
+
+    assert processed == normalize_loudness(trim_silence(audio))
+    assert {"postprocess", "post_trim", "post_normalize"} <= set(metrics.stages)
+    assert metrics.counter("postprocess_bytes", stage="trim") == len(audio)
+    assert metrics.counter("postprocess_bytes", stage="normalize") < len(audio)
+
+
+def test_postprocessor_cancelling_chained_future_cancels_work(caplog) -> None:
+    """Test that cancelling process_after()'s Future cancels its source and never breaks callbacks."""
+    with AudioPostProcessor(["trim"], processes=1) as postprocessor:
+        pending = Future()
+        postprocessor.process_after(pending).cancel()
+        assert pending.cancelled()
+
+        running = Future()
+        running.set_running_or_notify_cancel()
+        result = postprocessor.process_after(running)
+        assert result.cancel()
+        running.set_result(_wav(_PADDED))
+        assert postprocessor._pool is None
+
+        finished = Future()
+        result = postprocessor.process_after(finished)
+        finished.set_result(_wav(_PADDED))
+        result.cancel()
+
+    assert result.cancelled()
+    assert not [record for record in caplog.records if record.levelname == "ERROR"]
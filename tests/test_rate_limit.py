@@ -0,0 +1,218 @@
+import asyncio
+import pytest
+from anki_tts.rate_limit import QuotaLimiter, TokenBucket, is_quota_error
+
+
+class FakeClock:
+    """Manual clock whose sleep() simply advances time."""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class QuotaError(Exception):
+    code = 429  # like google.api_core.exceptions.ResourceExhausted
+
+
+# =========================
+# is_quota_error
+# =========================
+def test_is_quota_error_recognizes_http_429() -> None:
+    """Test that api_core-style errors with code 429 are quota errors."""
+    assert is_quota_error(QuotaError("RESOURCE_EXHAUSTED"))
+
+
+def test_is_quota_error_recognizes_grpc_status() -> None:
+    """Test that raw gRPC errors with RESOURCE_EXHAUSTED status are quota errors."""
+    class Status:
+        name = "RESOURCE_EXHAUSTED"
+
+    class GrpcError(Exception):
+        def code(self):
+            return Status()
+
+    assert is_quota_error(GrpcError())
+
+
+def test_is_quota_error_rejects_other_errors() -> None:
+    """Test that ordinary errors are not treated as quota errors."""
+    assert not is_quota_error(Exception("network error"))
+
+
+# =========================
+# TokenBucket
+# =========================
+def test_token_bucket_waits_for_refill() -> None:
+    """Test that acquiring beyond the bucket waits for the per-minute refill."""
+    clock = FakeClock()
+    bucket = TokenBucket(60, clock=clock, sleep=clock.sleep)  # 1 token/s, capacity 1
+
+    bucket.acquire()
+    bucket.acquire()
+    bucket.acquire()
+
+    assert clock.now == pytest.approx(2.0)
+
+
+def test_token_bucket_lets_oversized_request_through_in_debt() -> None:
+    """Test that a request larger than the bucket is admitted and slows later ones."""
+    clock = FakeClock()
+    bucket = TokenBucket(600, clock=clock, sleep=clock.sleep)  # 10 tokens/s, capacity 10
+
+    bucket.acquire(30)  # full bucket: admitted, leaves 20 tokens of debt
+    assert clock.now == 0
+    bucket.acquire(10)  # must wait for debt plus 10 tokens: 3 s
+    assert clock.now == pytest.approx(3.0)
+
+
+def test_token_bucket_rejects_non_positive_rate() -> None:
+    """Test that a zero rate raises ValueError."""
+    with pytest.raises(ValueError, match="rate_per_minute must be > 0"):
+        TokenBucket(0)
+
+
+# =========================
+# QuotaLimiter
+# =========================
+def test_limiter_retries_quota_errors_and_backs_off() -> None:
+    """Test that quota errors are retried with a cool-down and AIMD decrease."""
+    clock = FakeClock()
+    limiter = QuotaLimiter(requests_per_minute=600, max_concurrency=8, clock=clock, sleep=clock.sleep)
+    outcomes = iter([QuotaError("quota"), QuotaError("quota"), b"audio"])
+
+    def request():
+        outcome = next(outcomes)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert limiter.call(request, characters=5) == b"audio"
+    assert limiter.throttled == 2
+    assert limiter.concurrency_limit == 2
+    assert limiter.request_bucket.rate == pytest.approx(10 * (0.25 + limiter.increase_step))
+    assert clock.sleeps[:2] == [1.0, 2.0]
+
+
+def test_limiter_gives_up_after_max_retries() -> None:
+    """Test that a persistent quota error is raised once retries are exhausted."""
+    clock = FakeClock()
+    limiter = QuotaLimiter(max_throttle_retries=2, clock=clock, sleep=clock.sleep)
+
+    def request():
+        raise QuotaError("quota")
+
+    with pytest.raises(QuotaError):
+        limiter.call(request, characters=1)
+    assert limiter.throttled == 3
+
+
+def test_limiter_does_not_retry_other_errors() -> None:
+    """Test that non-quota errors propagate immediately without backoff."""
+    clock = FakeClock()
+    limiter = QuotaLimiter(max_concurrency=4, clock=clock, sleep=clock.sleep)
+    calls = []
+
+    def request():
+        calls.append(1)
+        raise ValueError("bad input")
+
+    with pytest.raises(ValueError):
+        limiter.call(request, characters=1)
+    assert len(calls) == 1
+    assert limiter.throttled == 0
+    assert limiter.concurrency_limit == 4
+
+
+def test_limiter_additive_increase_restores_concurrency() -> None:
+    """Test that successes grow the concurrency limit back by one per round."""
+    limiter = QuotaLimiter(max_concurrency=4)
+    limiter.acquire(1)
+    limiter.release(throttled=True)
+    assert limiter.concurrency_limit == 2
+
+    for _ in range(2):
+        limiter.acquire(1)
+        limiter.release()
+    assert limiter.concurrency_limit == 3
+
+
+def test_limiter_charges_characters() -> None:
+    """Test that the character bucket is charged by text length."""
+    clock = FakeClock()
+    limiter = QuotaLimiter(characters_per_minute=600, clock=clock, sleep=clock.sleep)  # 10 chars/s
+
+    limiter.call(lambda: None, characters=10)
+    limiter.call(lambda: None, characters=10)
+
+    assert clock.now == pytest.approx(1.0)
+
+
+def test_limiter_charges_every_request_of_a_split_text() -> None:
+    """Test that a call making several requests takes that many request tokens."""
+    clock = FakeClock()
+    limiter = QuotaLimiter(requests_per_minute=60, clock=clock, sleep=clock.sleep)  # 1 request/s
+
+    limiter.call(lambda: None, characters=1, requests=3)
+    limiter.call(lambda: None, characters=1)
+
+    assert clock.now == pytest.approx(3.0)
+
+
+def test_limiter_acall_retries_quota_errors(mocker) -> None:
+    """Test that the async path also retries quota errors instead of failing."""
+    mocker.patch("anki_tts.rate_limit.asyncio.sleep", new=mocker.AsyncMock())
+    limiter = QuotaLimiter()
+    attempts = []
+
+    async def request():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise QuotaError("quota")
+        return b"audio"
+
+    assert asyncio.run(limiter.acall(request, characters=3)) == b"audio"
+    assert limiter.throttled == 1
+
+
+def test_limiter_acall_releases_slot_when_cancelled() -> None:
+    """Test that cancelling acall() mid-request or while waiting for a slot leaks no slot."""
+    limiter = QuotaLimiter()
+
+    async def cancel_mid_request():
+        started = asyncio.Event()
+
+        async def request():
+            started.set()
+            await asyncio.sleep(60)
+
+        task = asyncio.create_task(limiter.acall(request, characters=3))
+        await started.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_mid_request())
+    assert limiter._in_flight == 0
+
+    async def request():
+        return b"audio"
+
+    async def cancel_while_waiting():
+        limiter.acquire(characters=3)  # hold the only slot
+        task = asyncio.create_task(limiter.acall(request, characters=3))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        limiter.release()  # the waiting thread now takes the slot and gives it back
+
+    asyncio.run(cancel_while_waiting())
+    assert limiter._in_flight == 0
@@ -0,0 +1,158 @@
+import asyncio
+import pytest
+import requests
+from google.api_core import exceptions as google_exceptions
+from anki_tts.retry import RetryPolicy, classify_error, format_retry_counts
+
+
+def _policy(**kwargs) -> RetryPolicy:
+    """Policy with no real sleeping and jitter pinned to the full backoff."""
+    sleeps = []
+    kwargs.setdefault("sleep", sleeps.append)
+    kwargs.setdefault("rng", lambda: 1.0)
+    policy = RetryPolicy(**kwargs)
+    policy.sleeps = sleeps
+    return policy
+
+
+def _failing(*errors, result=b"ok"):
+    """Return a callable that raises each error in turn, then returns result."""
+    remaining = list(errors)
+
+    def fn():
+        if remaining:
+            raise remaining.pop(0)
+        return result
+
+    return fn
+
+
+# =========================
+# classify_error
+# =========================
+@pytest.mark.parametrize("exc, category", [
+    (google_exceptions.ServiceUnavailable("down"), "unavailable"),
+    (google_exceptions.DeadlineExceeded("slow"), "deadline"),
+    (google_exceptions.InternalServerError("oops"), "server_error"),
+    (requests.ConnectionError("reset"), "connection"),
+    (ConnectionResetError("reset"), "connection"),
+    (requests.ReadTimeout("slow"), "deadline"),
+    (RuntimeError("AnkiConnect error: collection is not available"), "anki_busy"),
+])
+def test_classify_error_retryable(exc, category) -> None:
+    """Test that transient errors map to their retry category."""
+    assert classify_error(exc) == category
+
+
+@pytest.mark.parametrize("exc", [
+    google_exceptions.InvalidArgument("bad voice"),
+    google_exceptions.ResourceExhausted("quota"),  # handled by QuotaLimiter
+    RuntimeError("AnkiConnect error: note was not found"),
+    ValueError("bad input"),
+])
+def test_classify_error_fatal(exc) -> None:
+    """Test that permanent errors are not retried."""
+    assert classify_error(exc) is None
+
+
+# =========================
+# RetryPolicy
+# =========================
+def test_retry_policy_retries_until_success() -> None:
+    """Test that transient errors are retried and counted by category."""
+    policy = _policy(base_delay=1, max_delay=30)
+    fn = _failing(ConnectionResetError(), google_exceptions.ServiceUnavailable("down"))
+
+    assert policy.call(fn) == b"ok"
+    assert policy.sleeps == [1, 2]
+    assert policy.snapshot() == {"connection": 1, "unavailable": 1}
+
+
+def test_retry_policy_does_not_retry_fatal_errors() -> None:
+    """Test that a fatal error is raised straight away."""
+    policy = _policy()
+    with pytest.raises(ValueError):
+        policy.call(_failing(ValueError("bad input")))
+    assert policy.sleeps == []
+
+
+def test_retry_policy_gives_up_after_max_attempts() -> None:
+    """Test that the last transient error is raised once attempts run out."""
+    policy = _policy(max_attempts=3)
+    with pytest.raises(ConnectionResetError):
+        policy.call(_failing(*[ConnectionResetError()] * 5))
+    assert len(policy.sleeps) == 2
+
+
+def test_retry_policy_caps_delay() -> None:
+    """Test that the exponential backoff never exceeds max_delay."""
+    policy = _policy(max_attempts=10, base_delay=1, max_delay=4, time_budget=1000)
+    policy.call(_failing(*[ConnectionResetError()] * 6))
+    assert policy.sleeps == [1, 2, 4, 4, 4, 4]
+
+
+def test_retry_policy_applies_jitter() -> None:
+    """Test that the wait is scaled by the random jitter factor."""
+    policy = _policy(base_delay=2, rng=lambda: 0.25)
+    policy.call(_failing(ConnectionResetError()))
+    assert policy.sleeps == [0.5]
+
+
+def test_retry_policy_respects_time_budget() -> None:
+    """Test that no retry starts if its wait would exceed the time budget."""
+    now = [0.0]
+
+    def sleep(seconds):
+        now[0] += seconds
+
+    policy = _policy(base_delay=4, time_budget=10, clock=lambda: now[0], sleep=sleep)
+    with pytest.raises(ConnectionResetError):
+        policy.call(_failing(*[ConnectionResetError()] * 5))
+    assert now[0] == 4  # the next 8 s wait would pass the 10 s budget
+    assert policy.snapshot() == {"connection": 1}
+
+
+def test_retry_policy_acall_retries() -> None:
+    """Test that the async path retries transient errors too."""
+    policy = _policy(base_delay=0)
+    attempts = []
+
+    async def request():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise google_exceptions.DeadlineExceeded("slow")
+        return b"audio"
+
+    assert asyncio.run(policy.acall(request)) == b"audio"
+    assert policy.snapshot() == {"deadline": 2}
+
+
+def test_invalid_max_attempts_raises() -> None:
+    """Test that max_attempts below 1 raises ValueError."""
+    with pytest.raises(ValueError, match="max_attempts must be >= 1"):
+        RetryPolicy(max_attempts=0)
+
+
+def test_format_retry_counts() -> None:
+    """Test the one-line rendering of retry counts."""
+    assert format_retry_counts({"unavailable": 2, "connection": 1}) == "connection=1, unavailable=2"
+    assert format_retry_counts({}) == "none"
+
+
+def test_call_each_retries_only_transient_items() -> None:
+    """Test that items with fatal errors or successes are not sent again, and budgets still apply."""
+    busy = RuntimeError("AnkiConnect error: collection is not available")
+    missing = RuntimeError("AnkiConnect error: note was not found")
+    calls = []
+
+    def send(indices):
+        calls.append(list(indices))
+        return [busy if i == 1 and len(calls) < 3 else (missing if i == 2 else None) for i in indices]
+
+    policy = _policy()
+    errors = policy.call_each(send, 3)
+
+    assert errors == [None, None, missing]
+    assert calls == [[0, 1, 2], [1], [1]]
+    assert policy.snapshot() == {"anki_busy": 2}
+    assert _policy(max_attempts=2).call_each(lambda indices: [busy] * len(indices), 2) == [busy, busy]
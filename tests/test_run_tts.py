@@ -1,6 +1,21 @@
 import logging
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
 import pytest
-from scripts.run_tts import process_deck, build_audio_filename
+from anki_tts.audio_cache import AudioCache
+from anki_tts.journal import RunJournal
+from anki_tts.media_manifest import MediaManifest
+from anki_tts.metrics import Metrics
+from anki_tts.rate_limit import QuotaLimiter
+from anki_tts.retry import RetryPolicy
+from anki_tts.gcloud_tts import AudioSettings, audio_cache_key, build_audio_config
+from anki_tts.jobs import TTSJob
+from anki_tts.postprocess import AudioPostProcessor
+from anki_tts.tts_backend import BackendCapabilities, text_cache_keyer
+from scripts.run_tts import process_deck, build_audio_filename, build_content_filename, plan_deck, plan_jobs, run_jobs
 
 
 # =========================
@@ -56,6 +71,11 @@ def test_filename_sanitization_collision_is_known_limitation() -> None:
     assert build_audio_filename(1, "My Field") == build_audio_filename(1, "My_Field")
 
 
+def test_content_filename_is_shared_per_key() -> None:
+    """Content filenames depend only on the audio cache key."""
+    assert build_content_filename("ab" * 32) == "tts_" + "ab" * 16 + ".mp3"
+
+
 # =========================
 # Fixtures
 # =========================
@@ -89,7 +109,7 @@ def fake_notes() -> list[dict]:
 def mock_tqdm(mocker):
     # Patches the progress-bar wrapper rather than tqdm itself; tqdm uses a
     # context manager internally which a simple lambda cannot satisfy.
-    mocker.patch("scripts.run_tts.iter_notes_with_progress", side_effect=lambda notes, desc: iter(notes))
+    mocker.patch("scripts.run_tts.iter_notes_with_progress", side_effect=lambda notes, desc, total=None: iter(notes))
 
 # =========================
 # Tests
@@ -100,9 +120,9 @@ def test_audio_added_to_audio_field_only(mocker, fake_notes) -> None:
 
     mock_client = object()
     mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1])
-    mocker.patch("scripts.run_tts.get_note_info", return_value=[fake_notes[0]])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=[fake_notes[0]])
     mocker.patch("scripts.run_tts.init_tts_client", return_value=mock_client)
-    mocker.patch("scripts.run_tts.synthesize_audio", return_value=b"fakebytes")
+    mocker.patch("anki_tts.gcloud_tts.synthesize_audio", return_value=b"fakebytes")
 
     mock_add_audio = mocker.patch("scripts.run_tts.add_audio_to_note", return_value=True)
 
@@ -116,7 +136,7 @@ def test_skips_empty_text_field(mocker, fake_notes) -> None:
 
     mock_client = object()
     mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[2])
-    mocker.patch("scripts.run_tts.get_note_info", return_value=[fake_notes[1]])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=[fake_notes[1]])
     mocker.patch("scripts.run_tts.init_tts_client", return_value=mock_client)
 
     mock_add_audio = mocker.patch("scripts.run_tts.add_audio_to_note")
@@ -131,7 +151,7 @@ def test_skips_existing_audio_when_not_overwriting(mocker, fake_notes) -> None:
 
     mock_client = object()
     mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[3])
-    mocker.patch("scripts.run_tts.get_note_info", return_value=[fake_notes[2]])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=[fake_notes[2]])
     mocker.patch("scripts.run_tts.init_tts_client", return_value=mock_client)
 
     mock_add_audio = mocker.patch("scripts.run_tts.add_audio_to_note")
@@ -141,7 +161,7 @@ def test_skips_existing_audio_when_not_overwriting(mocker, fake_notes) -> None:
     mock_add_audio.assert_not_called()
 
     # Overwrite = True -> should add audio
-    mocker.patch("scripts.run_tts.synthesize_audio", return_value=b"newbytes")
+    mocker.patch("anki_tts.gcloud_tts.synthesize_audio", return_value=b"newbytes")
     process_deck("MyDeck", "Sentence", "Audio", overwrite=True)
     mock_add_audio.assert_called_once_with(3, "Audio", "3_Audio.mp3", b"newbytes")
 
@@ -156,7 +176,7 @@ def test_missing_required_fields(mocker) -> None:
 
     mock_client = object()
     mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[99])
-    mocker.patch("scripts.run_tts.get_note_info", return_value=[bad_note])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=[bad_note])
     mocker.patch("scripts.run_tts.init_tts_client", return_value=mock_client)
 
     mock_add_audio = mocker.patch("scripts.run_tts.add_audio_to_note")
@@ -176,14 +196,14 @@ def test_process_deck_skips_empty_notes(mocker) -> None:
     mock_client = object()
     mocker.patch("scripts.run_tts.init_tts_client", return_value=mock_client)
     mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1])
-    mocker.patch("scripts.run_tts.get_note_info", return_value=[{
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=[{
         "noteId": 1,
         "fields": {
             "Sentence": {"value": ""},   # Empty text field
             "Audio": {"value": ""},      # Audio field exists
         }
     }])
-    mock_tts = mocker.patch("scripts.run_tts.synthesize_audio")
+    mock_tts = mocker.patch("anki_tts.gcloud_tts.synthesize_audio")
     mock_add_audio = mocker.patch("scripts.run_tts.add_audio_to_note")
 
     process_deck("Test Deck", "Sentence", "Audio", language_code="ja-JP")
@@ -199,14 +219,14 @@ def test_process_deck_calls_tts_and_add_audio(mocker) -> None:
     mock_client = object()
     mocker.patch("scripts.run_tts.init_tts_client", return_value=mock_client)
     mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1])
-    mocker.patch("scripts.run_tts.get_note_info", return_value=[{
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=[{
         "noteId": 1,
         "fields": {
             "Sentence": {"value": "Hello"},  # Text field populated
             "Audio": {"value": ""},          # Audio field initially empty
         }
     }])
-    mocker.patch("scripts.run_tts.synthesize_audio", return_value=b"fake_audio")
+    mocker.patch("anki_tts.gcloud_tts.synthesize_audio", return_value=b"fake_audio")
     mock_add_audio = mocker.patch("scripts.run_tts.add_audio_to_note", return_value=True)
 
     process_deck("Test Deck", "Sentence", "Audio", language_code="ja-JP")
@@ -221,11 +241,11 @@ def test_process_deck_basic_flow(mocker) -> None:
     mock_client = object()
     mocker.patch("scripts.run_tts.init_tts_client", return_value=mock_client)
     mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1])
-    mocker.patch("scripts.run_tts.get_note_info", return_value=[{
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=[{
         "noteId": 1,
         "fields": {"Sentence": {"value": "Hello"}, "Audio": {"value": ""}}
     }])
-    mocker.patch("scripts.run_tts.synthesize_audio", return_value=b"audio")
+    mocker.patch("anki_tts.gcloud_tts.synthesize_audio", return_value=b"audio")
     mock_add_audio = mocker.patch("scripts.run_tts.add_audio_to_note")
 
     process_deck("Test Deck", "Sentence", "Audio")
@@ -247,8 +267,8 @@ def test_max_cards_limits_processing(mocker) -> None:
     mock_client = object()
     mocker.patch("scripts.run_tts.init_tts_client", return_value=mock_client)
     mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1, 2, 3])
-    mocker.patch("scripts.run_tts.get_note_info", return_value=three_eligible_notes)
-    mocker.patch("scripts.run_tts.synthesize_audio", return_value=b"audio")
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=three_eligible_notes)
+    mocker.patch("anki_tts.gcloud_tts.synthesize_audio", return_value=b"audio")
     mock_add_audio = mocker.patch("scripts.run_tts.add_audio_to_note")
 
     process_deck("MyDeck", "Sentence", "Audio", max_cards=2)
@@ -269,8 +289,8 @@ def test_max_cards_counts_only_additions_not_skips(mocker) -> None:
     mock_client = object()
     mocker.patch("scripts.run_tts.init_tts_client", return_value=mock_client)
     mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1, 2, 3, 4, 5])
-    mocker.patch("scripts.run_tts.get_note_info", return_value=notes)
-    mocker.patch("scripts.run_tts.synthesize_audio", return_value=b"audio")
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=notes)
+    mocker.patch("anki_tts.gcloud_tts.synthesize_audio", return_value=b"audio")
     mock_add_audio = mocker.patch("scripts.run_tts.add_audio_to_note")
 
     process_deck("MyDeck", "Sentence", "Audio", max_cards=2)
@@ -304,8 +324,8 @@ def test_max_cards_larger_than_deck(mocker) -> None:
     mock_client = object()
     mocker.patch("scripts.run_tts.init_tts_client", return_value=mock_client)
     mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1, 2])
-    mocker.patch("scripts.run_tts.get_note_info", return_value=two_notes)
-    mocker.patch("scripts.run_tts.synthesize_audio", return_value=b"audio")
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=two_notes)
+    mocker.patch("anki_tts.gcloud_tts.synthesize_audio", return_value=b"audio")
     mock_add_audio = mocker.patch("scripts.run_tts.add_audio_to_note")
 
     process_deck("MyDeck", "Sentence", "Audio", max_cards=100)
@@ -327,8 +347,8 @@ def test_aborts_after_max_consecutive_failures(mocker) -> None:
     mock_client = object()
     mocker.patch("scripts.run_tts.init_tts_client", return_value=mock_client)
     mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1, 2, 3, 4])
-    mocker.patch("scripts.run_tts.get_note_info", return_value=four_notes)
-    mock_tts = mocker.patch("scripts.run_tts.synthesize_audio", side_effect=Exception("API error"))
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=four_notes)
+    mock_tts = mocker.patch("anki_tts.gcloud_tts.synthesize_audio", side_effect=Exception("API error"))
     mocker.patch("scripts.run_tts.add_audio_to_note")
 
     result = process_deck("MyDeck", "Sentence", "Audio", max_consecutive_failures=2)
@@ -347,10 +367,10 @@ def test_consecutive_failure_counter_resets_on_success(mocker) -> None:
     mock_client = object()
     mocker.patch("scripts.run_tts.init_tts_client", return_value=mock_client)
     mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=list(range(1, 6)))
-    mocker.patch("scripts.run_tts.get_note_info", return_value=five_notes)
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=five_notes)
     # fail, fail, succeed, fail, fail — never 3 consecutive failures
     mocker.patch(
-        "scripts.run_tts.synthesize_audio",
+        "anki_tts.gcloud_tts.synthesize_audio",
         side_effect=[Exception("err"), Exception("err"), b"audio", Exception("err"), Exception("err")],
     )
     mock_add_audio = mocker.patch("scripts.run_tts.add_audio_to_note")
@@ -385,8 +405,8 @@ def test_abort_logs_clear_error_and_summary(mocker, caplog) -> None:
     mock_client = object()
     mocker.patch("scripts.run_tts.init_tts_client", return_value=mock_client)
     mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1, 2])
-    mocker.patch("scripts.run_tts.get_note_info", return_value=two_notes)
-    mocker.patch("scripts.run_tts.synthesize_audio", side_effect=Exception("quota exceeded"))
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=two_notes)
+    mocker.patch("anki_tts.gcloud_tts.synthesize_audio", side_effect=Exception("quota exceeded"))
     mocker.patch("scripts.run_tts.add_audio_to_note")
 
     with caplog.at_level(logging.INFO):
@@ -404,10 +424,10 @@ def test_failed_note_logs_error_with_icon(mocker, caplog) -> None:
     mock_client = object()
     mocker.patch("scripts.run_tts.init_tts_client", return_value=mock_client)
     mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1])
-    mocker.patch("scripts.run_tts.get_note_info", return_value=[
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=[
         {"noteId": 1, "fields": {"Sentence": {"value": "Hello"}, "Audio": {"value": ""}}}
     ])
-    mocker.patch("scripts.run_tts.synthesize_audio", side_effect=Exception("network error"))
+    mocker.patch("anki_tts.gcloud_tts.synthesize_audio", side_effect=Exception("network error"))
     mocker.patch("scripts.run_tts.add_audio_to_note")
 
     with caplog.at_level(logging.ERROR):
@@ -427,11 +447,11 @@ def test_summary_log_reports_cards_added(mocker, caplog) -> None:
     mock_client = object()
     mocker.patch("scripts.run_tts.init_tts_client", return_value=mock_client)
     mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1, 2])
-    mocker.patch("scripts.run_tts.get_note_info", return_value=[
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=[
         {"noteId": 1, "fields": {"Sentence": {"value": "Hello"}, "Audio": {"value": ""}}},
         {"noteId": 2, "fields": {"Sentence": {"value": "World"}, "Audio": {"value": ""}}},
     ])
-    mocker.patch("scripts.run_tts.synthesize_audio", return_value=b"audio")
+    mocker.patch("anki_tts.gcloud_tts.synthesize_audio", return_value=b"audio")
     mocker.patch("scripts.run_tts.add_audio_to_note")
 
     with caplog.at_level(logging.INFO):
@@ -446,16 +466,1322 @@ def test_progress_bar_desc_includes_max_cards(mocker) -> None:
     mock_client = object()
     mocker.patch("scripts.run_tts.init_tts_client", return_value=mock_client)
     mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1])
-    mocker.patch("scripts.run_tts.get_note_info", return_value=[
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=[
         {"noteId": 1, "fields": {"Sentence": {"value": "Hello"}, "Audio": {"value": ""}}}
     ])
-    mocker.patch("scripts.run_tts.synthesize_audio", return_value=b"audio")
+    mocker.patch("anki_tts.gcloud_tts.synthesize_audio", return_value=b"audio")
     mocker.patch("scripts.run_tts.add_audio_to_note")
     mock_iter = mocker.patch(
         "scripts.run_tts.iter_notes_with_progress",
-        side_effect=lambda notes, desc: iter(notes),
+        side_effect=lambda notes, desc, total=None: iter(notes),
     )
 
     process_deck("MyDeck", "Sentence", "Audio", max_cards=5)
 
     assert "max 5" in mock_iter.call_args.args[1]
+
+
+# =========================
+# concurrent workers
+# =========================
+
+def _eligible_notes(count: int) -> list[dict]:
+    return [
+        {"noteId": i, "fields": {"Sentence": {"value": f"text{i}"}, "Audio": {"value": ""}}}
+        for i in range(1, count + 1)
+    ]
+
+
+def test_workers_zero_raises() -> None:
+    """Ensure workers=0 raises ValueError — at least one worker is required."""
+
+    with pytest.raises(ValueError, match="workers must be >= 1"):
+        process_deck("MyDeck", "Sentence", "Audio", workers=0)
+
+
+def test_workers_synthesize_concurrently(mocker) -> None:
+    """Ensure several notes are synthesized at the same time when workers > 1."""
+
+    import threading
+
+    barrier = threading.Barrier(3, timeout=5)
+
+    def slow_synthesize(text, client, **kwargs):
+        barrier.wait()  # only released once three syntheses overlap
+        return text.encode()
+
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1, 2, 3])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=_eligible_notes(3))
+    mocker.patch("anki_tts.gcloud_tts.synthesize_audio", side_effect=slow_synthesize)
+    mock_add_audio = mocker.patch("scripts.run_tts.add_audio_to_note")
+
+    assert process_deck("MyDeck", "Sentence", "Audio", workers=3) is True
+    assert mock_add_audio.call_count == 3
+
+
+def test_workers_upload_in_deck_order(mocker) -> None:
+    """Ensure audio is added in deck order even when later notes finish first."""
+
+    import time
+
+    def staggered_synthesize(text, client, **kwargs):
+        # Earlier notes take longer, so workers complete in reverse order.
+        time.sleep(0.05 * (5 - int(text[len("text"):])))
+        return text.encode()
+
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1, 2, 3, 4])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=_eligible_notes(4))
+    mocker.patch("anki_tts.gcloud_tts.synthesize_audio", side_effect=staggered_synthesize)
+    mock_add_audio = mocker.patch("scripts.run_tts.add_audio_to_note")
+
+    process_deck("MyDeck", "Sentence", "Audio", workers=4)
+
+    assert [c.args[0] for c in mock_add_audio.call_args_list] == [1, 2, 3, 4]
+    mock_add_audio.assert_any_call(2, "Audio", "2_Audio.mp3", b"text2")
+
+
+def test_workers_never_synthesize_past_max_cards(mocker) -> None:
+    """Ensure in-flight work is capped so max_cards is never overshot by synthesis calls."""
+
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=list(range(1, 11)))
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=_eligible_notes(10))
+    mock_tts = mocker.patch("anki_tts.gcloud_tts.synthesize_audio", return_value=b"audio")
+    mock_add_audio = mocker.patch("scripts.run_tts.add_audio_to_note")
+
+    process_deck("MyDeck", "Sentence", "Audio", max_cards=3, workers=8)
+
+    assert mock_tts.call_count == 3
+    assert mock_add_audio.call_count == 3
+
+
+def test_workers_refill_cap_after_failure(mocker) -> None:
+    """Ensure a failed note frees its max_cards slot for the next eligible note."""
+
+    def synthesize(text, client, **kwargs):
+        if text == "text1":
+            raise Exception("network error")
+        return b"audio"
+
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1, 2, 3, 4])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=_eligible_notes(4))
+    mocker.patch("anki_tts.gcloud_tts.synthesize_audio", side_effect=synthesize)
+    mock_add_audio = mocker.patch("scripts.run_tts.add_audio_to_note")
+
+    process_deck("MyDeck", "Sentence", "Audio", max_cards=2, workers=4)
+
+    assert [c.args[0] for c in mock_add_audio.call_args_list] == [2, 3]
+
+
+def test_workers_abort_discards_in_flight_results(mocker) -> None:
+    """Ensure no audio is added for notes after the failure that aborted the run."""
+
+    def synthesize(text, client, **kwargs):
+        if text in ("text1", "text2"):
+            raise Exception("quota exceeded")
+        return b"audio"
+
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1, 2, 3, 4])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=_eligible_notes(4))
+    mocker.patch("anki_tts.gcloud_tts.synthesize_audio", side_effect=synthesize)
+    mock_add_audio = mocker.patch("scripts.run_tts.add_audio_to_note")
+
+    result = process_deck("MyDeck", "Sentence", "Audio", max_consecutive_failures=2, workers=4)
+
+    assert result is False
+    mock_add_audio.assert_not_called()
+
+
+# =========================
+# audio cache
+# =========================
+
+def test_duplicate_texts_synthesized_once(mocker, caplog) -> None:
+    """Ensure notes sharing a text reuse one synthesis and the report counts the hits."""
+
+    notes = [
+        {"noteId": i, "fields": {"Sentence": {"value": "同じ"}, "Audio": {"value": ""}}}
+        for i in range(1, 4)
+    ]
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1, 2, 3])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=notes)
+    mock_tts = mocker.patch("anki_tts.gcloud_tts.synthesize_audio", return_value=b"audio")
+    mock_add_audio = mocker.patch("scripts.run_tts.add_audio_to_note")
+
+    with caplog.at_level(logging.INFO):
+        process_deck("MyDeck", "Sentence", "Audio", workers=3)
+
+    assert mock_tts.call_count == 1
+    assert mock_add_audio.call_count == 3
+    mock_add_audio.assert_any_call(3, "Audio", "3_Audio.mp3", b"audio")
+    assert "Audio cache: 2 hit(s), 1 miss(es)." in caplog.text
+
+
+def test_persistent_cache_skips_synthesis_on_rerun(mocker, tmp_path) -> None:
+    """Ensure a second run with the same cache directory makes no TTS calls."""
+
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1, 2])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=_eligible_notes(2))
+    mock_tts = mocker.patch("anki_tts.gcloud_tts.synthesize_audio", return_value=b"audio")
+    mock_add_audio = mocker.patch("scripts.run_tts.add_audio_to_note")
+
+    process_deck("MyDeck", "Sentence", "Audio", cache=AudioCache(str(tmp_path)))
+    process_deck("MyDeck", "Sentence", "Audio", cache=AudioCache(str(tmp_path)))
+
+    assert mock_tts.call_count == 2
+    assert mock_add_audio.call_count == 4
+
+
+def test_failed_synthesis_is_not_cached(mocker) -> None:
+    """Ensure a failed synthesis leaves nothing in the cache."""
+
+    cache = AudioCache()
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=_eligible_notes(1))
+    mocker.patch("anki_tts.gcloud_tts.synthesize_audio", side_effect=Exception("API error"))
+    mocker.patch("scripts.run_tts.add_audio_to_note")
+
+    process_deck("MyDeck", "Sentence", "Audio", cache=cache)
+
+    assert len(cache) == 0
+
+
+# =========================
+# batched uploads
+# =========================
+
+def _multi_results(*errors):
+    return [{"result": None, "error": error} for error in errors]
+
+
+def test_batch_size_groups_updates_into_multi(mocker, caplog) -> None:
+    """Ensure batch_size sends updates through multi instead of one request per note."""
+
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1, 2, 3])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=_eligible_notes(3))
+    mocker.patch("anki_tts.gcloud_tts.synthesize_audio", side_effect=lambda text, client, **kwargs: text.encode())
+    mock_add_audio = mocker.patch("scripts.run_tts.add_audio_to_note")
+    mock_invoke = mocker.patch(
+        "anki_tts.anki_tools.invoke",
+        side_effect=lambda action, actions: _multi_results(*[None] * len(actions)),
+    )
+
+    with caplog.at_level(logging.INFO):
+        process_deck("MyDeck", "Sentence", "Audio", batch_size=2)
+
+    mock_add_audio.assert_not_called()
+    assert [len(c.kwargs["actions"]) for c in mock_invoke.call_args_list] == [2, 1]
+    assert "Added audio to 3 card(s)." in caplog.text
+
+
+def test_batch_item_errors_count_as_consecutive_failures(mocker) -> None:
+    """Ensure per-note errors inside a batch feed the consecutive failure counter in order."""
+
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1, 2, 3, 4])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=_eligible_notes(4))
+    mocker.patch("anki_tts.gcloud_tts.synthesize_audio", return_value=b"audio")
+    mock_invoke = mocker.patch(
+        "anki_tts.anki_tools.invoke",
+        return_value=_multi_results(None, "note was not found", "note was not found"),
+    )
+
+    result = process_deck("MyDeck", "Sentence", "Audio", batch_size=3, max_consecutive_failures=2)
+
+    assert result is False
+    mock_invoke.assert_called_once()  # note 4 is never sent after the abort
+
+
+def test_batch_flushed_before_synthesis_failure_is_counted(mocker) -> None:
+    """Ensure queued uploads settle before a later synthesis failure is counted."""
+
+    def synthesize(text, client, **kwargs):
+        if text == "text3":
+            raise Exception("API error")
+        return b"audio"
+
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1, 2, 3])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=_eligible_notes(3))
+    mocker.patch("anki_tts.gcloud_tts.synthesize_audio", side_effect=synthesize)
+    # Note 2's upload fails; together with note 3's synthesis failure that is
+    # two consecutive failures, but only if note 2 is counted first.
+    mocker.patch("anki_tts.anki_tools.invoke", return_value=_multi_results(None, "note was not found"))
+
+    result = process_deck("MyDeck", "Sentence", "Audio", batch_size=5, max_consecutive_failures=2)
+
+    assert result is False
+
+
+def test_batch_queue_counts_toward_max_cards(mocker) -> None:
+    """Ensure queued updates count toward max_cards so no extra notes are synthesized."""
+
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=list(range(1, 6)))
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=_eligible_notes(5))
+    mock_tts = mocker.patch("anki_tts.gcloud_tts.synthesize_audio", return_value=b"audio")
+    mock_invoke = mocker.patch(
+        "anki_tts.anki_tools.invoke",
+        side_effect=lambda action, actions: _multi_results(*[None] * len(actions)),
+    )
+
+    process_deck("MyDeck", "Sentence", "Audio", max_cards=2, batch_size=10, workers=4)
+
+    assert mock_tts.call_count == 2
+    assert len(mock_invoke.call_args.kwargs["actions"]) == 2
+
+
+# =========================
+# streamed notesInfo
+# =========================
+
+def test_notes_streamed_in_chunks(mocker) -> None:
+    """Ensure process_deck fetches notesInfo in chunks rather than all at once."""
+
+    notes = {note["noteId"]: note for note in _eligible_notes(5)}
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=list(notes))
+    mock_get = mocker.patch(
+        "anki_tts.anki_tools.get_note_info",
+        side_effect=lambda ids: [notes[i] for i in ids],
+    )
+    mocker.patch("anki_tts.gcloud_tts.synthesize_audio", return_value=b"audio")
+    mock_add_audio = mocker.patch("scripts.run_tts.add_audio_to_note")
+
+    process_deck("MyDeck", "Sentence", "Audio", notes_chunk_size=2)
+
+    assert [len(c.args[0]) for c in mock_get.call_args_list] == [2, 2, 1]
+    assert [c.args[0] for c in mock_add_audio.call_args_list] == [1, 2, 3, 4, 5]
+
+
+def test_max_cards_stops_fetching_remaining_chunks(mocker) -> None:
+    """Ensure an early stop at max_cards does not download the rest of the deck."""
+
+    notes = {note["noteId"]: note for note in _eligible_notes(100)}
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=list(notes))
+    mock_get = mocker.patch(
+        "anki_tts.anki_tools.get_note_info",
+        side_effect=lambda ids: [notes[i] for i in ids],
+    )
+    mocker.patch("anki_tts.gcloud_tts.synthesize_audio", return_value=b"audio")
+    mocker.patch("scripts.run_tts.add_audio_to_note")
+
+    process_deck("MyDeck", "Sentence", "Audio", max_cards=3, notes_chunk_size=10)
+
+    assert mock_get.call_count <= 2
+
+
+def test_notes_chunk_size_zero_raises() -> None:
+    """Ensure notes_chunk_size=0 raises ValueError."""
+
+    with pytest.raises(ValueError, match="notes_chunk_size must be >= 1"):
+        process_deck("MyDeck", "Sentence", "Audio", notes_chunk_size=0)
+
+
+# =========================
+# server-side filtering
+# =========================
+
+def test_filters_pushed_to_find_notes(mocker) -> None:
+    """Ensure process_deck asks Anki to filter by text, missing audio, tags and note types."""
+
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mock_find = mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[])
+
+    process_deck("MyDeck", "Sentence", "Audio", tags=["n5"], note_types=["Basic"])
+
+    mock_find.assert_called_once_with(
+        "MyDeck",
+        text_field="Sentence",
+        audio_field="Audio",
+        missing_audio_only=True,
+        tags=["n5"],
+        note_types=["Basic"],
+    )
+
+
+def test_overwrite_does_not_filter_existing_audio(mocker) -> None:
+    """Ensure --overwrite still asks Anki for notes that already have audio."""
+
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mock_find = mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[])
+
+    process_deck("MyDeck", "Sentence", "Audio", overwrite=True)
+
+    assert mock_find.call_args.kwargs["missing_audio_only"] is False
+
+
+def test_nothing_to_do_skips_notes_info(mocker, caplog) -> None:
+    """Ensure a fully processed deck makes no notesInfo request."""
+
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[])
+    mock_get = mocker.patch("anki_tts.anki_tools.get_note_info")
+
+    with caplog.at_level(logging.INFO):
+        assert process_deck("MyDeck", "Sentence", "Audio") is True
+
+    mock_get.assert_not_called()
+    assert "No notes in deck 'MyDeck' need audio." in caplog.text
+
+
+# =========================
+# async TTS driver
+# =========================
+
+def test_async_tts_uses_async_client(mocker) -> None:
+    """Ensure async_tts synthesizes through the async client and adds audio in deck order."""
+
+    import asyncio
+
+    class FakeAsyncClient:
+        async def synthesize_speech(self, input, voice, audio_config):
+            await asyncio.sleep(0.01)
+
+            class Response:
+                audio_content = input.text.encode()
+
+            return Response()
+
+    mock_sync_init = mocker.patch("scripts.run_tts.init_tts_client")
+    mocker.patch("scripts.run_tts.init_async_tts_client", return_value=FakeAsyncClient())
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1, 2, 3])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=_eligible_notes(3))
+    mock_tts = mocker.patch("anki_tts.gcloud_tts.synthesize_audio")
+    mock_add_audio = mocker.patch("scripts.run_tts.add_audio_to_note")
+
+    assert process_deck("MyDeck", "Sentence", "Audio", workers=50, async_tts=True) is True
+
+    mock_sync_init.assert_not_called()
+    mock_tts.assert_not_called()
+    assert [c.args for c in mock_add_audio.call_args_list] == [
+        (1, "Audio", "1_Audio.mp3", b"text1"),
+        (2, "Audio", "2_Audio.mp3", b"text2"),
+        (3, "Audio", "3_Audio.mp3", b"text3"),
+    ]
+
+
+# =========================
+# quota backoff
+# =========================
+
+def test_quota_errors_are_retried_not_counted_as_failures(mocker, caplog) -> None:
+    """Ensure RESOURCE_EXHAUSTED responses back off and retry instead of aborting the run."""
+
+    class ResourceExhausted(Exception):
+        code = 429
+
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1, 2])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=_eligible_notes(2))
+    mocker.patch(
+        "anki_tts.gcloud_tts.synthesize_audio",
+        side_effect=[ResourceExhausted("quota"), ResourceExhausted("quota"), b"a1", b"a2"],
+    )
+    mock_add_audio = mocker.patch("scripts.run_tts.add_audio_to_note")
+
+    with caplog.at_level(logging.INFO):
+        result = process_deck(
+            "MyDeck", "Sentence", "Audio",
+            max_consecutive_failures=1,
+            limiter=QuotaLimiter(sleep=lambda seconds: None),
+        )
+
+    assert result is True
+    assert mock_add_audio.call_count == 2
+    assert "Backed off 2 time(s)" in caplog.text
+
+
+# =========================
+# transient error retries
+# =========================
+
+def test_transient_errors_are_retried_not_counted_as_failures(mocker, caplog) -> None:
+    """Ensure UNAVAILABLE responses are retried with backoff and reported in the summary."""
+
+    class ServiceUnavailable(Exception):
+        code = 503
+
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1, 2])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=_eligible_notes(2))
+    mocker.patch(
+        "anki_tts.gcloud_tts.synthesize_audio",
+        side_effect=[ServiceUnavailable("unavailable"), b"a1", b"a2"],
+    )
+    mock_add_audio = mocker.patch("scripts.run_tts.add_audio_to_note")
+
+    with caplog.at_level(logging.INFO):
+        result = process_deck(
+            "MyDeck", "Sentence", "Audio",
+            max_consecutive_failures=1,
+            retry_policy=RetryPolicy(sleep=lambda seconds: None),
+        )
+
+    assert result is True
+    assert mock_add_audio.call_count == 2
+    assert "Retries — TTS: unavailable=1" in caplog.text
+
+
+# =========================
+# resume journal
+# =========================
+
+def test_journal_records_completed_notes(mocker, tmp_path) -> None:
+    """Ensure every note that receives audio is journaled, and failures are not."""
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1, 2, 3])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=_eligible_notes(3))
+    mocker.patch("anki_tts.gcloud_tts.synthesize_audio", side_effect=[b"a1", Exception("API error"), b"a3"])
+    mocker.patch("scripts.run_tts.add_audio_to_note")
+
+    path = str(tmp_path / "run.jsonl")
+    with RunJournal(path) as journal:
+        process_deck("MyDeck", "Sentence", "Audio", journal=journal)
+
+    resumed = RunJournal(path, resume=True)
+    assert [resumed.is_done(i, "Audio") for i in (1, 2, 3)] == [True, False, True]
+    resumed.close()
+
+
+def test_resume_skips_journaled_notes_before_fetching(mocker, tmp_path) -> None:
+    """Ensure a resumed run neither fetches nor re-synthesizes notes the journal lists."""
+    path = str(tmp_path / "run.jsonl")
+    with RunJournal(path) as journal:
+        journal.record(1, "Audio", "k1", "1_Audio.mp3")
+        journal.record(2, "Audio", "k2", "2_Audio.mp3")
+
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1, 2, 3])
+    mock_info = mocker.patch("anki_tts.anki_tools.get_note_info", return_value=_eligible_notes(3)[2:])
+    mock_synth = mocker.patch("anki_tts.gcloud_tts.synthesize_audio", return_value=b"a3")
+    mock_add_audio = mocker.patch("scripts.run_tts.add_audio_to_note")
+
+    with RunJournal(path, resume=True) as journal:
+        result = process_deck("MyDeck", "Sentence", "Audio", overwrite=True, journal=journal)
+
+    assert result is True
+    mock_info.assert_called_once_with([3])
+    assert mock_synth.call_count == 1
+    mock_add_audio.assert_called_once_with(3, "Audio", "3_Audio.mp3", b"a3")
+
+
+def test_journal_records_batched_uploads(mocker, tmp_path) -> None:
+    """Ensure notes uploaded through a batch are journaled once the batch succeeds."""
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1, 2])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=_eligible_notes(2))
+    mocker.patch("anki_tts.gcloud_tts.synthesize_audio", side_effect=[b"a1", b"a2"])
+    mocker.patch("anki_tts.anki_tools.invoke", return_value=[None, None])
+
+    path = str(tmp_path / "run.jsonl")
+    with RunJournal(path) as journal:
+        process_deck("MyDeck", "Sentence", "Audio", batch_size=5, journal=journal)
+
+    assert len(RunJournal(path, resume=True)) == 2
+
+
+# =========================
+# multi-deck jobs
+# =========================
+
+def test_run_jobs_shares_client_and_synthesizes_duplicates_once(mocker) -> None:
+    """Ensure jobs share one TTS client and texts recurring across decks are synthesized once."""
+    mock_init = mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mocker.patch("scripts.run_tts.get_notes_from_deck", side_effect=[[1, 2], [3]])
+    mocker.patch("anki_tts.anki_tools.get_note_info", side_effect=[
+        _eligible_notes(2),
+        [{"noteId": 3, "fields": {"Sentence": {"value": "text1"}, "Audio": {"value": ""}}}],
+    ])
+    mock_synth = mocker.patch("anki_tts.gcloud_tts.synthesize_audio", side_effect=[b"a1", b"a2"])
+    mock_add_audio = mocker.patch("scripts.run_tts.add_audio_to_note")
+
+    result = run_jobs([TTSJob("Deck A", "Sentence", "Audio"), TTSJob("Deck B", "Sentence", "Audio")], workers=2)
+
+    assert result is True
+    assert mock_init.call_count == 1
+    assert mock_synth.call_count == 2
+    assert mock_add_audio.call_args_list[-1].args == (3, "Audio", "3_Audio.mp3", b"a1")
+
+
+def test_run_jobs_groups_jobs_by_voice(mocker) -> None:
+    """Ensure jobs are run grouped by language and voice."""
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mock_find = mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[])
+
+    run_jobs([
+        TTSJob("A", "Sentence", "Audio"),
+        TTSJob("B", "Sentence", "Audio", language="fr-FR"),
+        TTSJob("C", "Sentence", "Audio"),
+    ])
+
+    assert [c.args[0] for c in mock_find.call_args_list] == ["A", "C", "B"]
+
+
+def test_run_jobs_stops_after_aborted_job(mocker) -> None:
+    """Ensure an aborted job stops the remaining jobs."""
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mock_find = mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=_eligible_notes(1))
+    mocker.patch("anki_tts.gcloud_tts.synthesize_audio", side_effect=Exception("API error"))
+    mocker.patch("scripts.run_tts.add_audio_to_note")
+
+    result = run_jobs(
+        [TTSJob("A", "Sentence", "Audio"), TTSJob("B", "Sentence", "Audio")],
+        max_consecutive_failures=1,
+    )
+
+    assert result is False
+    assert mock_find.call_count == 1
+
+
+# =========================
+# long texts
+# =========================
+
+def test_long_text_extra_requests_are_reported(mocker, caplog) -> None:
+    """Ensure the summary counts the extra requests needed to split long texts."""
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1, 2])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=[
+        {"noteId": 1, "fields": {"Sentence": {"value": "長い文です。" * 600}, "Audio": {"value": ""}}},
+        {"noteId": 2, "fields": {"Sentence": {"value": "短い"}, "Audio": {"value": ""}}},
+    ])
+    mocker.patch("anki_tts.gcloud_tts.synthesize_audio", return_value=b"audio")
+    mocker.patch("scripts.run_tts.add_audio_to_note")
+
+    with caplog.at_level(logging.INFO):
+        process_deck("MyDeck", "Sentence", "Audio")
+
+    assert "Google TTS requests: 4 sent, 0 saved by the cache, 2 extra to split long texts." in caplog.text
+
+
+# =========================
+# text normalization
+# =========================
+
+def test_markup_is_removed_before_synthesis_and_caching(mocker) -> None:
+    """Ensure the same text with different markup is synthesized once, as plain text."""
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1, 2, 3])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=[
+        {"noteId": 1, "fields": {"Sentence": {"value": "<b>猫[ねこ]</b>が好き"}, "Audio": {"value": ""}}},
+        {"noteId": 2, "fields": {"Sentence": {"value": "{{c1::猫}}が好き&nbsp;"}, "Audio": {"value": ""}}},
+        {"noteId": 3, "fields": {"Sentence": {"value": "<br>[sound:old.mp3]"}, "Audio": {"value": ""}}},
+    ])
+    mock_synth = mocker.patch("anki_tts.gcloud_tts.synthesize_audio", return_value=b"audio")
+    mock_add_audio = mocker.patch("scripts.run_tts.add_audio_to_note")
+
+    process_deck("MyDeck", "Sentence", "Audio")
+
+    assert mock_synth.call_count == 1
+    assert mock_synth.call_args.args[0] == "猫が好き"
+    assert [c.args[0] for c in mock_add_audio.call_args_list] == [1, 2]
+
+
+# =========================
+# metrics
+# =========================
+
+def test_process_deck_logs_stage_table(mocker, caplog) -> None:
+    """Ensure a run logs per-stage timings and the cards added."""
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1, 2])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=_eligible_notes(2))
+    mocker.patch("anki_tts.gcloud_tts.synthesize_audio", return_value=b"audio")
+    mocker.patch("scripts.run_tts.add_audio_to_note")
+
+    with caplog.at_level(logging.INFO):
+        process_deck("MyDeck", "Sentence", "Audio")
+
+    assert "p95 ms" in caplog.text
+    rows = {line.split()[0]: line.split() for line in caplog.messages if line[:1].isalpha()}
+    assert rows["filter"][1] == "2"
+    assert rows["normalize"][1] == "2"
+    assert "cards_added=2" in caplog.text
+
+
+def test_run_jobs_records_all_jobs_into_one_registry(mocker) -> None:
+    """Ensure a registry passed to run_jobs collects every job's stages."""
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mocker.patch("scripts.run_tts.get_notes_from_deck", side_effect=[[1], [2]])
+    mocker.patch("anki_tts.anki_tools.get_note_info", side_effect=[_eligible_notes(1), _eligible_notes(2)[1:]])
+    mocker.patch("anki_tts.gcloud_tts.synthesize_audio", return_value=b"audio")
+    mocker.patch("scripts.run_tts.add_audio_to_note")
+    metrics = Metrics()
+
+    run_jobs([TTSJob("A", "Sentence", "Audio"), TTSJob("B", "Sentence", "Audio")], metrics=metrics)
+
+    assert metrics.stages["normalize"].count == 2
+    assert metrics.counter("cards_added") == 2
+
+
+def test_process_deck_counts_outcomes_live(mocker) -> None:
+    """Ensure added, skipped and failed notes and uploaded bytes are counted."""
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1, 2, 3])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=[
+        {"noteId": 1, "fields": {"Sentence": {"value": "text1"}, "Audio": {"value": ""}}},
+        {"noteId": 2, "fields": {"Sentence": {"value": "text2"}, "Audio": {"value": "[sound:x.mp3]"}}},
+        {"noteId": 3, "fields": {"Sentence": {"value": "text3"}, "Audio": {"value": ""}}},
+    ])
+    mocker.patch("anki_tts.gcloud_tts.synthesize_audio", side_effect=[b"1234", Exception("API error")])
+    mocker.patch("scripts.run_tts.add_audio_to_note")
+    metrics = Metrics()
+
+    process_deck("MyDeck", "Sentence", "Audio", metrics=metrics)
+
+    assert metrics.counter("cards_added") == 1
+    assert metrics.counter("notes_skipped") == 1
+    assert metrics.counter("notes_failed") == 1
+    assert metrics.counter("bytes_uploaded") == 4
+
+
+# =========================
+# path uploads
+# =========================
+
+def test_path_upload_writes_file_and_removes_it(mocker, tmp_path) -> None:
+    """Ensure upload_mode 'path' hands Anki a file in media_dir and cleans it up afterwards."""
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=_eligible_notes(1))
+    mocker.patch("anki_tts.gcloud_tts.synthesize_audio", return_value=b"audio")
+    mock_add_audio = mocker.patch("scripts.run_tts.add_audio_to_note")
+    seen = {}
+    mock_add_file = mocker.patch(
+        "scripts.run_tts.add_audio_file_to_note",
+        side_effect=lambda note_id, field, filename, path: seen.update(data=open(path, "rb").read()),
+    )
+    media_dir = tmp_path / "media"
+
+    process_deck("MyDeck", "Sentence", "Audio", upload_mode="path", media_dir=str(media_dir))
+
+    mock_add_audio.assert_not_called()
+    assert mock_add_file.call_args.args == (1, "Audio", "1_Audio.mp3", str(media_dir / "1_Audio.mp3"))
+    assert seen["data"] == b"audio"
+    assert list(media_dir.iterdir()) == []
+
+
+def test_path_upload_reuses_persistent_cache_files(mocker, tmp_path) -> None:
+    """Ensure upload_mode 'path' without media_dir hands Anki a link to the cache entry."""
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=_eligible_notes(1))
+    mocker.patch("anki_tts.gcloud_tts.synthesize_audio", return_value=b"audio")
+    seen = {}
+    mock_add_file = mocker.patch(
+        "scripts.run_tts.add_audio_file_to_note",
+        side_effect=lambda note_id, field, filename, path: seen.update(data=open(path, "rb").read()),
+    )
+    cache = AudioCache(str(tmp_path / "cache"))
+
+    process_deck("MyDeck", "Sentence", "Audio", upload_mode="path", cache=cache)
+
+    path = mock_add_file.call_args.args[3]
+    assert path.startswith(str(tmp_path / "cache"))
+    assert seen["data"] == b"audio"
+    assert not os.path.exists(path)  # the staged link, not the cache entry
+    assert cache.path_for(audio_cache_key("text1", "ja-JP", None, build_audio_config())) is not None
+
+
+def test_path_upload_batches_store_then_update(mocker, tmp_path) -> None:
+    """Ensure batched path uploads store media in one multi and update fields in another."""
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1, 2])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=_eligible_notes(2))
+    mocker.patch("anki_tts.gcloud_tts.synthesize_audio", return_value=b"audio")
+    mock_invoke = mocker.patch(
+        "anki_tts.anki_tools.invoke",
+        side_effect=lambda action, actions: _multi_results(*[None] * len(actions)),
+    )
+
+    process_deck("MyDeck", "Sentence", "Audio", batch_size=2, upload_mode="path", media_dir=str(tmp_path))
+
+    calls = [[a["action"] for a in c.kwargs["actions"]] for c in mock_invoke.call_args_list]
+    assert calls == [["storeMediaFile"] * 2, ["updateNoteFields"] * 2]
+
+
+def test_batched_path_upload_survives_cache_eviction(mocker, tmp_path) -> None:
+    """Ensure queued uploads of cache files still send their audio after later puts evict the entries."""
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1, 2])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=_eligible_notes(2))
+    mocker.patch("anki_tts.gcloud_tts.synthesize_audio", side_effect=lambda text, *args, **kwargs: text.encode())
+    stored = {}
+
+    def invoke(action, actions):
+        for a in actions:
+            if a["action"] == "storeMediaFile":
+                stored[a["params"]["filename"]] = open(a["params"]["path"], "rb").read()
+        return _multi_results(*[None] * len(actions))
+
+    mocker.patch("anki_tts.anki_tools.invoke", side_effect=invoke)
+    cache = AudioCache(str(tmp_path / "cache"), max_bytes=5)  # room for one clip
+
+    process_deck("MyDeck", "Sentence", "Audio", batch_size=2, upload_mode="path", cache=cache)
+
+    assert stored == {"1_Audio.mp3": b"text1", "2_Audio.mp3": b"text2"}
+    assert [path.name for path in (tmp_path / "cache").iterdir() if path.name.startswith("staging-")] == []
+
+
+def test_unbatched_path_upload_survives_eviction_by_other_workers(mocker, tmp_path) -> None:
+    """Ensure a cache file handed to Anki stays readable while other workers' puts evict its entry."""
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1, 2, 3, 4])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=_eligible_notes(4))
+
+    def synthesize(text, *args, **kwargs):
+        if text != "text1":
+            time.sleep(0.1)  # finish after note 1's upload has started
+        return text.encode()
+
+    mocker.patch("anki_tts.gcloud_tts.synthesize_audio", side_effect=synthesize)
+    cache = AudioCache(str(tmp_path / "cache"), max_bytes=5)  # room for one of the 4 workers' clips
+    stored = {}
+
+    def store(note_id, field, filename, path):
+        time.sleep(0.2)  # the other workers' puts evict the entry meanwhile
+        stored[filename] = open(path, "rb").read()
+
+    mocker.patch("scripts.run_tts.add_audio_file_to_note", side_effect=store)
+    mocker.patch("scripts.run_tts.add_audio_to_note")
+    metrics = Metrics()
+
+    process_deck("MyDeck", "Sentence", "Audio", workers=4, upload_mode="path", cache=cache, metrics=metrics)
+
+    assert stored["1_Audio.mp3"] == b"text1"
+    assert metrics.counter("cards_added") == 4
+    assert metrics.counter("notes_failed") == 0
+
+
+def test_path_upload_removes_files_of_queued_uploads_when_run_stops(mocker, tmp_path) -> None:
+    """Ensure files staged for uploads still queued are deleted when a run stops early."""
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1, 2])
+
+    def notes(note_ids, chunk_size):
+        yield from _eligible_notes(2)
+        raise RuntimeError("connection lost")
+
+    mocker.patch("scripts.run_tts.iter_note_info", side_effect=notes)
+    mocker.patch("anki_tts.gcloud_tts.synthesize_audio", return_value=b"audio")
+    mock_invoke = mocker.patch("anki_tts.anki_tools.invoke")
+    media_dir = tmp_path / "media"
+
+    with pytest.raises(RuntimeError, match="connection lost"):
+        process_deck("MyDeck", "Sentence", "Audio", workers=1, batch_size=10, upload_mode="path", media_dir=str(media_dir))
+
+    mock_invoke.assert_not_called()
+    assert list(media_dir.iterdir()) == []
+
+
+def test_path_upload_needs_a_directory() -> None:
+    """Ensure upload_mode 'path' without media_dir or a persistent cache raises ValueError."""
+    with pytest.raises(ValueError, match="needs media_dir or a persistent cache"):
+        process_deck("MyDeck", "Sentence", "Audio", upload_mode="path")
+
+
+def test_unknown_upload_mode_raises() -> None:
+    """Ensure an unknown upload_mode raises ValueError."""
+    with pytest.raises(ValueError, match="upload_mode must be one of"):
+        process_deck("MyDeck", "Sentence", "Audio", upload_mode="ftp")
+
+
+# =========================
+# content-named files
+# =========================
+
+def _notes_with_texts(*texts: str) -> list[dict]:
+    return [
+        {"noteId": i, "fields": {"Sentence": {"value": text}, "Audio": {"value": ""}}}
+        for i, text in enumerate(texts, 1)
+    ]
+
+
+def test_content_filenames_store_each_text_once(mocker) -> None:
+    """Ensure notes sharing a text share one stored file and only get their field set."""
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1, 2, 3])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=_notes_with_texts("犬", "猫", "犬"))
+    mock_tts = mocker.patch("anki_tts.gcloud_tts.synthesize_audio", side_effect=lambda text, client, **kwargs: text.encode())
+    mock_add_audio = mocker.patch("scripts.run_tts.add_audio_to_note")
+    mock_store = mocker.patch("scripts.run_tts.add_audio_file_to_note")
+    mock_reference = mocker.patch("scripts.run_tts.set_audio_field")
+
+    assert process_deck("MyDeck", "Sentence", "Audio", filename_mode="content") is True
+
+    mock_add_audio.assert_not_called()
+    assert mock_tts.call_count == 2
+    stores = [(c.args, c.kwargs) for c in mock_store.call_args_list]
+    assert [args[0] for args, _ in stores] == [1, 2]
+    assert all(args[2].startswith("tts_") and args[2].endswith(".mp3") for args, _ in stores)
+    assert stores[0][1] == {"audio_data": "犬".encode()}
+    assert mock_reference.call_args.args == (3, "Audio", stores[0][0][2])
+
+
+def test_content_filenames_skip_synthesis_once_stored(mocker) -> None:
+    """Ensure a text whose file is already stored is not synthesized again, even if evicted from the cache."""
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1, 2])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=_notes_with_texts("犬", "犬"))
+    mock_tts = mocker.patch("anki_tts.gcloud_tts.synthesize_audio", return_value=b"audio")
+    mocker.patch("scripts.run_tts.add_audio_file_to_note")
+    mock_reference = mocker.patch("scripts.run_tts.set_audio_field")
+
+    process_deck("MyDeck", "Sentence", "Audio", filename_mode="content", cache=AudioCache(max_bytes=1))
+
+    assert mock_tts.call_count == 1
+    mock_reference.assert_called_once()
+
+
+def test_content_filenames_skip_synthesis_while_store_is_queued(mocker) -> None:
+    """Ensure a text whose store is still queued in a batch is referenced, not synthesized again."""
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1, 2])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=_notes_with_texts("犬", "犬"))
+    mock_tts = mocker.patch("anki_tts.gcloud_tts.synthesize_audio", return_value=b"audio")
+    mock_invoke = mocker.patch(
+        "anki_tts.anki_tools.invoke",
+        side_effect=lambda action, actions: _multi_results(*[None] * len(actions)),
+    )
+
+    process_deck(
+        "MyDeck", "Sentence", "Audio", workers=1, batch_size=10, filename_mode="content", cache=AudioCache(max_bytes=1)
+    )
+
+    assert mock_tts.call_count == 1
+    calls = [[a["action"] for a in c.kwargs["actions"]] for c in mock_invoke.call_args_list]
+    assert calls == [["storeMediaFile"], ["updateNoteFields"] * 2]
+
+
+def test_content_filenames_retry_store_after_failure(mocker) -> None:
+    """Ensure a failed store is not referenced; the next note with that text stores it again."""
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1, 2])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=_notes_with_texts("犬", "犬"))
+    mocker.patch("anki_tts.gcloud_tts.synthesize_audio", return_value=b"audio")
+    mock_store = mocker.patch("scripts.run_tts.add_audio_file_to_note", side_effect=[RuntimeError("busy"), None])
+    mock_reference = mocker.patch("scripts.run_tts.set_audio_field")
+
+    process_deck("MyDeck", "Sentence", "Audio", filename_mode="content")
+
+    assert [c.args[0] for c in mock_store.call_args_list] == [1, 2]
+    mock_reference.assert_not_called()
+
+
+def test_content_filenames_batch_references_with_the_store(mocker) -> None:
+    """Ensure a batch stores a shared file once and references it from the other notes."""
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1, 2])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=_notes_with_texts("犬", "犬"))
+    mocker.patch("anki_tts.gcloud_tts.synthesize_audio", return_value=b"audio")
+    mock_invoke = mocker.patch(
+        "anki_tts.anki_tools.invoke",
+        side_effect=lambda action, actions: _multi_results(*[None] * len(actions)),
+    )
+
+    process_deck("MyDeck", "Sentence", "Audio", batch_size=5, filename_mode="content")
+
+    calls = [[a["action"] for a in c.kwargs["actions"]] for c in mock_invoke.call_args_list]
+    assert calls == [["storeMediaFile"], ["updateNoteFields", "updateNoteFields"]]
+
+
+# =========================
+# reusing media already in Anki
+# =========================
+
+def test_reuse_media_sets_field_without_synthesis(mocker, tmp_path) -> None:
+    """Ensure a note-named file the manifest says holds the same audio is only referenced."""
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1, 2])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=_eligible_notes(2))
+    mock_names = mocker.patch("scripts.run_tts.get_media_file_names", return_value=["1_Audio.mp3", "2_Audio.mp3"])
+    mock_tts = mocker.patch("anki_tts.gcloud_tts.synthesize_audio", return_value=b"audio")
+    mock_add_audio = mocker.patch("scripts.run_tts.add_audio_to_note")
+    mock_reference = mocker.patch("scripts.run_tts.set_audio_field")
+    # Capture the key note 1's text maps to by running once without reuse.
+    manifest = MediaManifest(str(tmp_path / "media.jsonl"))
+    process_deck("MyDeck", "Sentence", "Audio", manifest=manifest)
+    manifest.record("2_Audio.mp3", "stale")
+    mock_tts.reset_mock()
+    mock_add_audio.reset_mock()
+
+    process_deck("MyDeck", "Sentence", "Audio", overwrite=True, manifest=manifest, reuse_media=True)
+
+    mock_names.assert_called_once_with("*_Audio.mp3")
+    mock_reference.assert_called_once_with(1, "Audio", "1_Audio.mp3")
+    # Note 2's file holds other audio, so it is synthesized and uploaded again.
+    assert mock_tts.call_count == 1
+    assert mock_add_audio.call_args.args[0] == 2
+    assert manifest.get("2_Audio.mp3") != "stale"
+    manifest.close()
+
+
+def test_reuse_media_skips_notes_already_playing_the_file(mocker) -> None:
+    """Ensure a note whose field already plays its matching file is left alone."""
+    filename = build_content_filename(audio_cache_key("犬", "ja-JP", None, build_audio_config()))
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=[{"noteId": 1, "fields": {
+        "Sentence": {"value": "犬"}, "Audio": {"value": f"[sound:{filename}]"},
+    }}])
+    mocker.patch("scripts.run_tts.get_media_file_names", return_value=[filename])
+    mock_tts = mocker.patch("anki_tts.gcloud_tts.synthesize_audio")
+    mock_store = mocker.patch("scripts.run_tts.add_audio_file_to_note")
+    mock_reference = mocker.patch("scripts.run_tts.set_audio_field")
+
+    process_deck("MyDeck", "Sentence", "Audio", overwrite=True, filename_mode="content", reuse_media=True)
+
+    mock_tts.assert_not_called()
+    mock_store.assert_not_called()
+    mock_reference.assert_not_called()
+
+
+# =========================
+# lazy TTS start-up
+# =========================
+
+def test_no_synthesis_needed_does_not_create_client(mocker) -> None:
+    """Ensure a run where every note is filtered out never initializes a TTS client."""
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=[{"noteId": 1, "fields": {
+        "Sentence": {"value": "犬"}, "Audio": {"value": "[sound:old.mp3]"},
+    }}])
+    mock_init = mocker.patch("scripts.run_tts.init_tts_client")
+
+    assert process_deck("MyDeck", "Sentence", "Audio")
+
+    mock_init.assert_not_called()
+
+
+def test_client_created_once_for_several_notes(mocker) -> None:
+    """Ensure the lazily created TTS client is shared by every synthesis."""
+    mock_client = object()
+    mock_init = mocker.patch("scripts.run_tts.init_tts_client", return_value=mock_client)
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1, 2, 3])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=_eligible_notes(3))
+    mock_tts = mocker.patch("anki_tts.gcloud_tts.synthesize_audio", return_value=b"audio")
+    mocker.patch("scripts.run_tts.add_audio_to_note")
+
+    process_deck("MyDeck", "Sentence", "Audio", workers=3)
+
+    mock_init.assert_called_once_with()
+    assert {c.args[1] for c in mock_tts.call_args_list} == {mock_client}
+
+
+@pytest.mark.parametrize("async_tts", [False, True])
+def test_client_error_stops_run(mocker, caplog, async_tts) -> None:
+    """Ensure a TTS client that cannot be created stops the run at the first synthesis, sync or async."""
+    mocker.patch("scripts.run_tts.init_tts_client", side_effect=EnvironmentError("no credentials"))
+    mocker.patch("scripts.run_tts.init_async_tts_client", side_effect=EnvironmentError("no credentials"))
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1, 2])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=_eligible_notes(2))
+    mock_add_audio = mocker.patch("scripts.run_tts.add_audio_to_note")
+    metrics = Metrics()
+
+    assert not process_deck("MyDeck", "Sentence", "Audio", async_tts=async_tts, metrics=metrics)
+    mock_add_audio.assert_not_called()
+    assert metrics.counter("notes_failed") == 0
+    assert "Run aborted — cannot synthesize audio: no credentials" in caplog.text
+
+
+_STARTUP_SCRIPT = """
+import runpy
+import sys
+import scripts.run_tts as run_tts
+run_tts.get_notes_from_deck = lambda *args, **kwargs: [1]
+run_tts.iter_note_info = lambda note_ids, chunk_size: (note for note in [
+    {"noteId": 1, "fields": {"Sentence": {"value": "x"}, "Audio": {"value": "[sound:old.mp3]"}}},
+])
+run_tts.process_deck("MyDeck", "Sentence", "Audio")
+from anki_tts import anki_tools
+from anki_tts.audio_cache import AudioCache
+from anki_tts.gcloud_tts import GoogleTTSBackend
+from anki_tts.tts_backend import text_cache_keyer
+actions = []
+anki_tools.invoke = lambda action, **params: actions.append(action)
+run_tts.iter_note_info = lambda note_ids, chunk_size: (note for note in [
+    {"noteId": 1, "fields": {"Sentence": {"value": "y"}, "Audio": {"value": ""}}},
+])
+cache = AudioCache()
+cache.put(text_cache_keyer(GoogleTTSBackend().cache_key_params("ja-JP", None))("y"), b"audio")
+assert run_tts.process_deck("MyDeck", "Sentence", "Audio", cache=cache)
+assert actions == ["updateNote"], actions
+sys.argv = ["run_tts", "--help"]
+try:
+    runpy.run_module("scripts.run_tts", run_name="__main__")
+except SystemExit:
+    pass
+print(",".join(m for m in sys.modules if m.split(".")[0] == "grpc" or m.startswith("google.cloud.texttospeech")))
+"""
+
+
+def test_startup_and_nothing_to_do_do_not_load_grpc() -> None:
+    """Ensure importing run_tts, --help and runs with nothing to synthesize never load grpc."""
+    result = subprocess.run(
+        [sys.executable, "-c", _STARTUP_SCRIPT],
+        cwd=Path(__file__).resolve().parent.parent,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.splitlines()[-1] == ""
+
+
+# =========================
+# planning
+# =========================
+
+def test_plan_deck_counts_without_synthesis_or_writes(mocker) -> None:
+    """Ensure plan_deck() filters and dedups like a run but never synthesizes or writes."""
+    notes = _notes_with_texts("犬", "<b>犬</b>", "猫", "", "鳥")
+    notes[4]["fields"]["Audio"]["value"] = "[sound:old.mp3]"
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1, 2, 3, 4, 5])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=notes)
+    mock_init = mocker.patch("scripts.run_tts.init_tts_client")
+    mock_invoke = mocker.patch("anki_tts.anki_tools.invoke")
+    cache = AudioCache()
+    cache.put(audio_cache_key("猫", "ja-JP", None, build_audio_config()), b"audio")
+
+    plan = plan_deck("MyDeck", "Sentence", "Audio", cache=cache)
+
+    assert (plan.notes_found, plan.notes_eligible, plan.notes_skipped) == (5, 3, 2)
+    assert (plan.unique_texts, plan.cache_hits, plan.tts_requests) == (2, 1, 1)
+    assert plan.characters_by_tier == {"WaveNet": 1}
+    assert (cache.hits, cache.misses) == (0, 0)
+    mock_init.assert_not_called()
+    mock_invoke.assert_not_called()
+
+
+def test_plan_deck_flags_long_texts_that_cannot_be_split(mocker) -> None:
+    """Ensure texts over the request limit are not planned as split requests for non-MP3 audio."""
+    long_text = "犬。" * 2000
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1, 2, 3])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=_notes_with_texts(long_text, long_text, "猫"))
+
+    mp3 = plan_deck("MyDeck", "Sentence", "Audio")
+    opus = plan_deck("MyDeck", "Sentence", "Audio", audio_settings=AudioSettings("OGG_OPUS"))
+
+    assert (mp3.notes_too_long, mp3.tts_requests) == (0, 4)  # 3 pieces + 1
+    assert (opus.notes_too_long, opus.unique_texts, opus.tts_requests) == (2, 1, 1)
+    assert opus.characters_by_tier == {"WaveNet": 1}
+    assert any(line.split() == ["Notes", "too", "long", "2"] for line in opus.format_table(concurrency=1))
+
+
+def test_plan_deck_respects_max_cards_and_journal(mocker, tmp_path) -> None:
+    """Ensure journaled notes are left out and max_cards caps the eligible notes."""
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1, 2, 3, 4])
+    mock_info = mocker.patch("anki_tts.anki_tools.get_note_info", side_effect=lambda ids: [
+        note for note in _eligible_notes(4) if note["noteId"] in ids
+    ])
+    journal = RunJournal(str(tmp_path / "run.jsonl"))
+    journal.record(1, "Audio", "k", "1_Audio.mp3")
+
+    plan = plan_deck("MyDeck", "Sentence", "Audio", journal=journal, max_cards=2)
+
+    assert mock_info.call_args.args[0] == [2, 3, 4]
+    assert (plan.notes_found, plan.notes_eligible, plan.unique_texts) == (3, 2, 2)
+    journal.close()
+
+
+def test_plan_jobs_counts_shared_texts_once(mocker) -> None:
+    """Ensure a text in several decks is billed once, as the shared cache would serve it."""
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1, 2])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=_notes_with_texts("犬", "猫"))
+    jobs = [TTSJob("A", "Sentence", "Audio"), TTSJob("B", "Sentence", "Audio")]
+
+    plan = plan_jobs(jobs)
+
+    assert (plan.notes_eligible, plan.unique_texts, plan.characters_billed) == (4, 2, 2)
+
+
+# =========================
+# TTS backends
+# =========================
+
+class _FakeBackend:
+    """Unbilled backend returning WAV-like audio, like a local engine."""
+
+    capabilities = BackendCapabilities(name="fake", audio_format="wav")
+
+    def __init__(self) -> None:
+        self.texts = []
+
+    def cache_key_params(self, language_code, voice_name):
+        return ("fake", language_code, voice_name or language_code)
+
+    def check(self) -> None:
+        pass
+
+    def synthesize(self, text, language_code, voice_name=None) -> bytes:
+        self.texts.append(text)
+        return b"RIFF" + text.encode()
+
+    def synthesize_many(self, texts, language_code, voice_name=None):
+        return [self.synthesize(text, language_code, voice_name) for text in texts]
+
+
+def test_backend_synthesizes_and_names_files_by_format(mocker) -> None:
+    """Ensure a backend replaces Google, its format sets the extension and it bypasses the quota limiter."""
+    mock_init = mocker.patch("scripts.run_tts.init_tts_client")
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1, 2])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=_notes_with_texts("犬", "犬"))
+    mock_add_audio = mocker.patch("scripts.run_tts.add_audio_to_note")
+    limiter = QuotaLimiter(max_concurrency=1)
+    mock_limit = mocker.patch.object(limiter, "call")
+    backend = _FakeBackend()
+
+    process_deck("MyDeck", "Sentence", "Audio", limiter=limiter, backend=backend)
+
+    assert backend.texts == ["犬"]
+    assert [c.args[2] for c in mock_add_audio.call_args_list] == ["1_Audio.wav", "2_Audio.wav"]
+    assert mock_add_audio.call_args.args[3] == "RIFF犬".encode()
+    mock_init.assert_not_called()
+    mock_limit.assert_not_called()
+
+
+def test_backend_content_filenames_use_its_format(mocker) -> None:
+    """Ensure content-named files and the reuse pattern use the backend's extension."""
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=_notes_with_texts("犬"))
+    mock_names = mocker.patch("scripts.run_tts.get_media_file_names", return_value=[])
+    mock_store = mocker.patch("scripts.run_tts.add_audio_file_to_note")
+
+    process_deck("MyDeck", "Sentence", "Audio", filename_mode="content", reuse_media=True, backend=_FakeBackend())
+
+    mock_names.assert_called_once_with("tts_*.wav")
+    assert mock_store.call_args.args[2].endswith(".wav")
+
+
+def test_async_tts_rejects_other_backends() -> None:
+    """Ensure async_tts, which drives the Google async client, refuses other backends."""
+    with pytest.raises(ValueError, match="async_tts only works with the Google backend"):
+        process_deck("MyDeck", "Sentence", "Audio", async_tts=True, backend=_FakeBackend())
+
+
+def test_run_jobs_picks_backend_per_job(mocker) -> None:
+    """Ensure jobs naming a backend use it while the others keep using Google."""
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mocker.patch("scripts.run_tts.get_notes_from_deck", side_effect=[[1], [2]])
+    mocker.patch("anki_tts.anki_tools.get_note_info", side_effect=[_notes_with_texts("犬"), _notes_with_texts("猫")])
+    mock_google = mocker.patch("anki_tts.gcloud_tts.synthesize_audio", return_value=b"mp3")
+    mock_add_audio = mocker.patch("scripts.run_tts.add_audio_to_note")
+    backend = _FakeBackend()
+
+    run_jobs(
+        [TTSJob("A", "Sentence", "Audio"), TTSJob("B", "Sentence", "Audio", backend="local")],
+        backends={"local": backend},
+    )
+
+    assert mock_google.call_args.args[0] == "犬"
+    assert backend.texts == ["猫"]
+    assert [c.args[2] for c in mock_add_audio.call_args_list] == ["1_Audio.mp3", "1_Audio.wav"]
+
+
+def test_run_jobs_unknown_backend_raises() -> None:
+    """Ensure a job naming a backend that was not provided fails before any deck is touched."""
+    with pytest.raises(ValueError, match="No TTS backend named 'piper'"):
+        run_jobs([TTSJob("A", "Sentence", "Audio", backend="piper")])
+
+
+# =========================
+# Post-processing
+# =========================
+
+class _FakePostProcessor:
+    """Post-processor "transcoding" to OGG in-process, recording what it was given."""
+
+    def __init__(self) -> None:
+        self.processed = []
+
+    def output_format(self, audio_format):
+        return "ogg"
+
+    def cache_key_params(self):
+        return ("postprocess", "fake")
+
+    def process(self, audio: bytes) -> bytes:
+        self.processed.append(audio)
+        return b"OggS" + audio
+
+
+def test_postprocessor_output_is_cached_and_uploaded(mocker) -> None:
+    """Ensure new audio is post-processed once, then cached and uploaded under the processed format."""
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1, 2])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=_notes_with_texts("犬", "犬"))
+    mock_add_audio = mocker.patch("scripts.run_tts.add_audio_to_note")
+    cache = AudioCache()
+    postprocessor = _FakePostProcessor()
+
+    process_deck("MyDeck", "Sentence", "Audio", cache=cache, backend=_FakeBackend(), postprocessor=postprocessor)
+
+    assert postprocessor.processed == ["RIFF犬".encode()]
+    assert [c.args[2] for c in mock_add_audio.call_args_list] == ["1_Audio.ogg", "2_Audio.ogg"]
+    assert mock_add_audio.call_args.args[3] == "OggSRIFF犬".encode()
+    key = text_cache_keyer(_FakeBackend().cache_key_params("ja-JP", None) + postprocessor.cache_key_params())("犬")
+    assert cache.get(key) == "OggSRIFF犬".encode()
+
+
+def test_postprocessor_rejects_backend_format() -> None:
+    """Ensure WAV-only steps cannot be combined with Google's MP3 audio."""
+    with pytest.raises(ValueError, match="'trim' needs wav audio, got mp3"):
+        process_deck("MyDeck", "Sentence", "Audio", postprocessor=AudioPostProcessor(["trim"]))
+
+
+# =========================
+# Audio settings
+# =========================
+
+def test_audio_settings_set_encoding_and_extension(mocker) -> None:
+    """Ensure Google is asked for the configured encoding and files get its extension."""
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=_notes_with_texts("犬"))
+    mock_tts = mocker.patch("anki_tts.gcloud_tts.synthesize_audio", return_value=b"OggS")
+    mock_add_audio = mocker.patch("scripts.run_tts.add_audio_to_note")
+
+    process_deck("MyDeck", "Sentence", "Audio", audio_settings=AudioSettings("OGG_OPUS", speaking_rate=0.9))
+
+    mock_add_audio.assert_called_once_with(1, "Audio", "1_Audio.ogg", b"OggS")
+    assert mock_tts.call_args.kwargs["audio_config"].speaking_rate == pytest.approx(0.9)
+
+
+def test_audio_settings_change_cache_keys(mocker) -> None:
+    """Ensure audio cached for one encoding is not served for another."""
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mocker.patch("scripts.run_tts.get_notes_from_deck", return_value=[1])
+    mocker.patch("anki_tts.anki_tools.get_note_info", return_value=_notes_with_texts("犬"))
+    mock_tts = mocker.patch("anki_tts.gcloud_tts.synthesize_audio", return_value=b"OggS")
+    mocker.patch("scripts.run_tts.add_audio_to_note")
+    cache = AudioCache()
+    cache.put(audio_cache_key("犬", "ja-JP", None, build_audio_config()), b"mp3")
+
+    process_deck("MyDeck", "Sentence", "Audio", cache=cache, audio_settings=AudioSettings("OGG_OPUS"))
+
+    mock_tts.assert_called_once()
+
+
+def test_run_reports_audio_produced(mocker, caplog) -> None:
+    """Ensure the run reports the files and bytes of audio it stored in Anki."""
+    mocker.patch("scripts.run_tts.init_tts_client", return_value=object())
+    mocker.patch("scripts.run_tts.get_notes_from_deck", side_effect=[[1, 2], [1]])
+    mocker.patch("anki_tts.anki_tools.get_note_info", side_effect=[_notes_with_texts("犬", "猫"), _notes_with_texts("鳥")])
+    mocker.patch("anki_tts.gcloud_tts.synthesize_audio", return_value=b"x" * 1536)
+    mocker.patch("scripts.run_tts.add_audio_to_note")
+
+    with caplog.at_level(logging.INFO):
+        run_jobs([TTSJob("A", "Sentence", "Audio"), TTSJob("B", "Sentence", "Audio", language="en-GB")])
+
+    assert "Audio produced (mp3): 2 file(s), 3.0 KB (1.5 KB per file)." in caplog.text
+    assert "Audio produced (mp3): 1 file(s), 1.5 KB (1.5 KB per file)." in caplog.text
+    assert "Audio produced by all jobs: 3 file(s), 4.5 KB (1.5 KB per file)." in caplog.text
@@ -0,0 +1,93 @@
+import pytest
+from anki_tts.text_normalize import (
+    TextNormalizer,
+    collapse_whitespace,
+    furigana_to_reading,
+    resolve_cloze,
+    strip_furigana,
+    strip_html,
+    strip_sound_tags,
+    unescape_entities,
+)
+
+
+# =========================
+# individual steps
+# =========================
+def test_strip_sound_tags() -> None:
+    """Test that [sound:] references are removed."""
+    assert strip_sound_tags("猫[sound:neko.mp3]です") == "猫です"
+
+
+def test_resolve_cloze() -> None:
+    """Test that cloze markers are replaced by their answers, with or without hints."""
+    assert resolve_cloze("{{c1::東京}}は{{c2::首都::capital}}です") == "東京は首都です"
+
+
+def test_strip_html() -> None:
+    """Test that tags are removed, line breaks kept and script/style content dropped."""
+    assert strip_html('<b>太字</b><br>次<div class="x">行</div><style>b{}</style>') == "太字\n次\n行\n"
+
+
+def test_unescape_entities() -> None:
+    """Test that entities are decoded and &nbsp; becomes a plain space."""
+    assert unescape_entities("A&amp;B&nbsp;C") == "A&B C"
+
+
+@pytest.mark.parametrize("text, kanji, reading", [
+    ("漢字[かんじ]", "漢字", "かんじ"),
+    ("今日は漢字[かんじ]を", "今日は漢字を", "今日はかんじを"),
+    ("私[わたし]は 学生[がくせい]です", "私は学生です", "わたしはがくせいです"),
+    (" 日本語[にほんご]", "日本語", "にほんご"),
+])
+def test_furigana(text, kanji, reading) -> None:
+    """Test that Anki furigana resolves to the kanji or to the reading."""
+    assert strip_furigana(text) == kanji
+    assert furigana_to_reading(text) == reading
+
+
+def test_collapse_whitespace() -> None:
+    """Test that spaces collapse, line breaks survive once and ends are trimmed."""
+    assert collapse_whitespace("  a \t b\n\n \n c  ") == "a b\nc"
+
+
+# =========================
+# TextNormalizer
+# =========================
+def test_normalizer_default_pipeline() -> None:
+    """Test that the default pipeline reduces a marked-up field to plain text."""
+    normalize = TextNormalizer()
+    field = "<div>{{c1::猫[ねこ]}}が&nbsp;好き</div>[sound:old.mp3]"
+    assert normalize(field) == "猫が 好き"
+
+
+def test_normalizer_markup_variants_match() -> None:
+    """Test that the same sentence with different markup normalizes identically."""
+    normalize = TextNormalizer()
+    assert normalize("<b>猫</b>が好き") == normalize("猫が好き&nbsp;") == normalize("{{c1::猫}}が好き")
+
+
+def test_normalizer_custom_steps() -> None:
+    """Test that steps can be named or given as callables, in order."""
+    normalize = TextNormalizer(["html", str.upper])
+    assert normalize("<i>hello</i>") == "HELLO"
+
+
+def test_normalizer_memoizes_results() -> None:
+    """Test that repeated inputs are served from the memo."""
+    calls = []
+
+    def step(text: str) -> str:
+        calls.append(text)
+        return text
+
+    normalize = TextNormalizer([step])
+    normalize("猫")
+    normalize("猫")
+    assert calls == ["猫"]
+
+
+def test_normalizer_rejects_unknown_step() -> None:
+    """Test that an unknown step name raises ValueError."""
+    with pytest.raises(ValueError, match="Unknown normalization step 'nope'"):
+        TextNormalizer(["nope"])
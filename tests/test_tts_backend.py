@@ -0,0 +1,64 @@
+import sys
+import time
+import pytest
+from anki_tts.metrics import Metrics, use_metrics
+from anki_tts.tts_backend import SubprocessBackend, text_cache_keyer
+
+# A stand-in engine: writes "RIFF", its first argument and the text it was given.
+_ECHO = [sys.executable, "-c", "import sys; sys.stdout.buffer.write(b'RIFF' + sys.argv[1].encode() + sys.stdin.buffer.read())"]
+
+
+def test_text_cache_keyer_normalizes_text() -> None:
+    """Test that keys ignore invisible text differences but not the backend parameters."""
+    key = text_cache_keyer(("local", "ja-JP"))
+    assert key(" 犬  が　走る ") == key("犬 が 走る")
+    assert key("犬") != key("猫")
+    assert key("犬") != text_cache_keyer(("local", "en-GB"))("犬")
+
+
+def test_subprocess_backend_reads_stdout() -> None:
+    """Test that the text goes to stdin and placeholders are filled in."""
+    backend = SubprocessBackend(_ECHO + ["{voice}"], processes=2)
+    metrics = Metrics()
+    with use_metrics(metrics):
+        audio = backend.synthesize("犬", "ja-JP", "ja")
+    assert audio == "RIFFja犬".encode()
+    assert backend.capabilities.audio_format == "wav"
+    assert not backend.capabilities.billed
+    assert metrics.counter("tts_requests") == 1
+    assert metrics.counter("characters_billed") == 0
+
+
+def test_subprocess_backend_reads_output_file(tmp_path) -> None:
+    """Test that an engine writing to {output} has that file read and removed."""
+    script = "import sys; open(sys.argv[1], 'wb').write(b'OggS' + sys.stdin.buffer.read())"
+    backend = SubprocessBackend([sys.executable, "-c", script, "{output}"], audio_format="ogg")
+    assert backend.synthesize("hello", "en-GB") == b"OggShello"
+
+
+def test_subprocess_backend_engine_failure_raises() -> None:
+    """Test that a failing engine raises RuntimeError with its error output."""
+    backend = SubprocessBackend([sys.executable, "-c", "import sys; sys.exit('no such voice')"])
+    with pytest.raises(RuntimeError, match="status 1: no such voice"):
+        backend.synthesize("hello", "en-GB")
+
+
+def test_subprocess_backend_missing_engine_raises() -> None:
+    """Test that an engine that is not installed is reported up front."""
+    with pytest.raises(FileNotFoundError, match="not-a-tts-engine"):
+        SubprocessBackend("not-a-tts-engine --stdout")
+    with pytest.raises(ValueError, match="processes must be >= 1"):
+        SubprocessBackend(_ECHO, processes=0)
+
+
+def test_subprocess_backend_synthesize_many_runs_engines_in_parallel() -> None:
+    """Test that synthesize_many keeps `processes` engines running at once."""
+    sleepy = [sys.executable, "-c", "import sys, time; time.sleep(0.3); sys.stdout.buffer.write(sys.stdin.buffer.read())"]
+    backend = SubprocessBackend(sleepy, processes=4)
+
+    start = time.perf_counter()
+    audio = backend.synthesize_many(["a", "b", "c", "d"], "en-GB")
+    elapsed = time.perf_counter() - start
+
+    assert audio == [b"a", b"b", b"c", b"d"]
+    assert elapsed < 1.0  # ~0.3 s in parallel, 1.2 s one at a time